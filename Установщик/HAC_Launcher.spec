@@ -5,7 +5,8 @@ a = Analysis(
     ['launcher.py'],
     pathex=[],
     binaries=[],
-    datas=[('hac.zip', '.')],
+    # hac.pak и hac.pak.sha256 кладутся рядом с EXE (см. build.bat), а не внутрь него
+    datas=[],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -22,7 +23,7 @@ exe = EXE(
     a.binaries,
     a.datas,
     [],
-    name='HAC_Launcher_Standalone',
+    name='HAC_Launcher',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
@@ -1,30 +1,54 @@
 @echo off
 echo Установка зависимостей...
-python -m pip install pyinstaller pywin32 winshell pythoncom
+rem Версия PyInstaller закреплена: от нее зависит загрузчик EXE и время его запуска
+python -m pip install pyinstaller==6.11.1 pywin32 winshell pythoncom zstandard
 
 echo.
-echo Проверка наличия архива hac.zip...
-if not exist "hac.zip" (
-    echo ОШИБКА: Не найден файл hac.zip!
-    echo Поместите архив с игрой hac.zip в папку с этим скриптом.
+echo Поиск файлов игры...
+rem Источник - папка game с файлами игры, а если ее нет - готовый архив hac.zip
+set GAME_SOURCE=game
+if not exist "game\" set GAME_SOURCE=hac.zip
+if not exist "%GAME_SOURCE%" (
+    echo ОШИБКА: Не найдены файлы игры!
+    echo Поместите папку game или архив hac.zip в папку с этим скриптом.
     pause
     exit /b 1
 )
 
 echo.
-echo Сборка лаунчера со встроенным архивом...
-python -m PyInstaller --onefile --windowed --name "HAC_Launcher_Standalone" ^
---add-data "hac.zip;." launcher.py
+echo Упаковка %GAME_SOURCE% в архив hac.pak и расчет контрольной суммы (SHA-256)...
+python hac_pack.py "%GAME_SOURCE%" -o hac.pak
+if errorlevel 1 (
+    echo ОШИБКА: Не удалось упаковать %GAME_SOURCE%!
+    pause
+    exit /b 1
+)
+
+echo.
+echo Сборка лаунчера...
+rem Лаунчер и hac.pak - два файла: архив в EXE читал бы загрузчик PyInstaller при каждом запуске
+python -m PyInstaller --onefile --windowed --name "HAC_Launcher" launcher.py
+
+echo.
+echo Копирование hac.pak рядом с EXE (лаунчер читает архив на месте, загрузчик EXE его не трогает)...
+copy /y hac.pak dist\ >nul && copy /y hac.pak.sha256 dist\ >nul
+if errorlevel 1 (
+    echo ОШИБКА: Не удалось скопировать hac.pak!
+    pause
+    exit /b 1
+)
 
 echo.
 echo ========================================
 echo Сборка завершена!
 echo.
-echo Создан единый EXE-файл со встроенной игрой:
-echo dist\HAC_Launcher_Standalone.exe
+echo Созданы лаунчер и архив с игрой (распространяются вместе, в одной папке):
+echo dist\HAC_Launcher.exe
+echo dist\hac.pak
+echo dist\hac.pak.sha256
 echo.
-echo Размер архива hac.zip: 
-dir hac.zip | find "hac.zip"
+echo Размер архива hac.pak: 
+dir hac.pak | find "hac.pak"
 echo ========================================
 echo.
 pause
\ No newline at end of file
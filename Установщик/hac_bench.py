@@ -0,0 +1,345 @@
+"""Бенчмарк конвейера установки на синтетических архивах.
+
+Генерирует архивы разной формы, прогоняет установку, проверку и удаление
+без интерфейса и сохраняет время, МБ/с, файлов/с и пиковую память в JSON:
+
+    python hac_bench.py --scale 0.1 --output bench.json --baseline old.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+import zlib
+from datetime import datetime
+
+import hac_core
+import hac_pack
+import hac_store
+
+# Формы архивов: (описание, функция-генератор списка (имя, размер, сжимаемый))
+SHAPES = {}
+
+# Папка для сгенерированных архивов и установок
+DEFAULT_WORK_DIR = os.path.join(os.path.expanduser("~"), "HAC_Launcher_Bench")
+
+PHASES = ("install", "reinstall", "verify", "verify_deep", "uninstall")
+
+
+def shape(name, description):
+    def register(func):
+        SHAPES[name] = (description, func)
+        return func
+    return register
+
+
+@shape("tiny", "много мелких файлов (1-8 КБ)")
+def shape_tiny(scale):
+    count = max(10, int(20000 * scale))
+    return [(f"data/{i % 100:02d}/file_{i}.txt", random.randint(1024, 8192), True)
+            for i in range(count)]
+
+
+@shape("huge", "несколько очень больших файлов")
+def shape_huge(scale):
+    size = max(1024 * 1024, int(512 * 1024 * 1024 * scale))
+    return [(f"paks/pak_{i}.pak", size, True) for i in range(4)]
+
+
+@shape("incompressible", "несжимаемые данные (медиа)")
+def shape_incompressible(scale):
+    count = max(4, int(400 * scale))
+    return [(f"media/clip_{i}.mp4", 1024 * 1024, False) for i in range(count)]
+
+
+@shape("deep", "глубокое дерево каталогов")
+def shape_deep(scale):
+    count = max(10, int(5000 * scale))
+    files = []
+    for i in range(count):
+        depth = 5 + i % 20
+        parts = [f"d{(i >> level) % 4}" for level in range(depth)]
+        files.append(("/".join(parts) + f"/f{i}.dat", random.randint(256, 4096), True))
+    return files
+
+
+def compressible_block(size, rng):
+    """Данные, похожие на игровые ресурсы: повторяющиеся строки со случайными вставками"""
+    words = [b"texture", b"mesh", b"sound", b"level", b"script", b"\x00\x00\x00\x01"]
+    chunks = []
+    total = 0
+    while total < size:
+        chunk = rng.choice(words) + rng.randbytes(4)
+        chunks.append(chunk)
+        total += len(chunk)
+    return b"".join(chunks)[:size]
+
+
+def generate_archive(path, files, seed=0):
+    """Пишем синтетический hac.zip; большие файлы пишутся потоково, блоками"""
+    rng = random.Random(seed)
+    block = compressible_block(hac_core.COPY_CHUNK_SIZE, rng)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zip_ref:
+        zip_ref.writestr("HAC.exe", b"MZ" + rng.randbytes(64 * 1024))
+        for name, size, compressible in files:
+            with zip_ref.open(name, 'w', force_zip64=size > 2 ** 31) as dst:
+                written = 0
+                while written < size:
+                    count = min(hac_core.COPY_CHUNK_SIZE, size - written)
+                    dst.write(block[:count] if compressible else rng.randbytes(count))
+                    written += count
+
+
+def peak_rss():
+    """Пиковый объем памяти процесса в байтах (None, если узнать нельзя)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    except Exception:
+        return None
+
+
+def run_phase(phase, archive_path, install_dir, workers):
+    """Один этап в текущем процессе, результат - словарь метрик"""
+    started = time.perf_counter()
+    extracted = None
+    if phase in ("install", "reinstall"):
+        result = hac_core.install_game(install_dir, workers=workers,
+                                       archive=hac_core.ArchiveSource(archive_path))
+        manifest = hac_core.InstallManifest.load(install_dir)
+        extracted = result.extracted
+        errors = len(result.errors)
+        if phase == "install":
+            files = result.extracted
+            processed = manifest.total_size
+        else:
+            # Повторная установка поверх - дифференциальная: данные почти не пишутся, а файлы
+            # только сравниваются с манифестом. МБ/с по объему игры тут ничего не значат
+            files = len(manifest)
+            processed = None
+    elif phase in ("verify", "verify_deep"):
+        manifest = hac_core.InstallManifest.load(install_dir)
+        report = hac_core.verify_installation(install_dir, manifest, deep=phase == "verify_deep",
+                                              workers=workers)
+        files = report.checked
+        processed = manifest.total_size
+        errors = len(report.missing) + len(report.corrupt)
+    elif phase == "uninstall":
+        manifest = hac_core.InstallManifest.load(install_dir)
+        files = len(manifest)
+        processed = manifest.total_size
+        hac_core.uninstall_game(install_dir, workers=workers)
+        errors = 0
+    else:
+        raise ValueError(f"Неизвестный этап: {phase}")
+    elapsed = time.perf_counter() - started
+
+    return {
+        'phase': phase,
+        'seconds': round(elapsed, 4),
+        'files': files,
+        'extracted': extracted,
+        'bytes': processed,
+        'mb_per_s': round(processed / elapsed / (1024 * 1024), 2) if elapsed and processed is not None else None,
+        'files_per_s': round(files / elapsed, 1) if elapsed else None,
+        'peak_rss': peak_rss(),
+        'errors': errors
+    }
+
+
+def run_phase_isolated(phase, archive_path, install_dir, workers):
+    """Этап в отдельном процессе, чтобы пиковая память относилась только к нему"""
+    command = [sys.executable, os.path.abspath(__file__), "--run-phase", phase,
+               "--archive", archive_path, "--target", install_dir]
+    if workers:
+        command += ["--workers", str(workers)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(shapes, scale, work_dir, workers, repeat, codec=None, created=None):
+    """Прогон всех форм; пути, которые бенчмарк создал сам, добавляются в created"""
+    created = created if created is not None else []
+    os.makedirs(work_dir, exist_ok=True)
+    store_dir = os.path.join(work_dir, hac_store.STORE_DIR_NAME)
+    if not os.path.exists(store_dir):
+        created.append(store_dir)
+    results = []
+    for name in shapes:
+        description, generator = SHAPES[name]
+        zip_path = os.path.join(work_dir, f"{name}_{scale:g}.zip")
+        if not os.path.exists(zip_path):
+            print(f"Генерация архива {name} ({description})...", file=sys.stderr)
+            random.seed(name)
+            generate_archive(zip_path, generator(scale), seed=zlib.crc32(name.encode()))
+            created.append(zip_path)
+
+        # Тот же набор файлов, перепакованный в hac.pak
+        archive_path = zip_path
+        if codec:
+            archive_path = os.path.join(work_dir, f"{name}_{scale:g}_{codec}.pak")
+            if not os.path.exists(archive_path):
+                hac_pack.pack(zip_path, archive_path, codec, workers=workers)
+                created.append(archive_path)
+
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            infos = zip_ref.infolist()
+        shape_info = {
+            'shape': name,
+            'format': f"pak/{codec}" if codec else "zip",
+            'description': description,
+            'archive_bytes': os.path.getsize(archive_path),
+            'members': len(infos),
+            'uncompressed_bytes': sum(info.file_size for info in infos),
+            'runs': []
+        }
+
+        install_dir = os.path.join(work_dir, f"install_{name}")
+        created.append(install_dir)
+        for run in range(repeat):
+            if os.path.exists(install_dir):
+                shutil.rmtree(install_dir)
+            phases = []
+            for phase in PHASES:
+                metrics = run_phase_isolated(phase, archive_path, install_dir, workers)
+                speed = f"{metrics['mb_per_s']:9.1f}" if metrics['mb_per_s'] is not None else f"{'-':>9s}"
+                print(f"{name:15s} {phase:12s} {metrics['seconds']:8.3f} с  "
+                      f"{speed} МБ/с  {metrics['files_per_s'] or 0:10.1f} файлов/с",
+                      file=sys.stderr)
+                phases.append(metrics)
+            shape_info['runs'].append(phases)
+        results.append(shape_info)
+    return results
+
+
+def remove_created(paths):
+    """Удаляем только то, что создал бенчмарк: чужие файлы в рабочей папке не трогаются"""
+    for path in paths:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def compare(results, baseline):
+    """Сравнение с прошлым прогоном: изменение времени каждого этапа в процентах"""
+    previous = {}
+    for shape_info in baseline.get('results', []):
+        for phase in shape_info['runs'][0]:
+            previous[(shape_info['shape'], phase['phase'])] = phase['seconds']
+
+    lines = []
+    for shape_info in results:
+        for phase in shape_info['runs'][0]:
+            old = previous.get((shape_info['shape'], phase['phase']))
+            if old:
+                change = (phase['seconds'] - old) / old * 100
+                lines.append(f"{shape_info['shape']:15s} {phase['phase']:12s} "
+                             f"{old:8.3f} -> {phase['seconds']:8.3f} с ({change:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк установки, проверки и удаления HAC")
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель размера архивов")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    # Настройки записи передаются этапам через переменные окружения (см. hac_core.get_io_settings)
+    parser.add_argument("--fsync", choices=hac_core.FSYNC_POLICIES, default=None)
+    parser.add_argument("--write-buffer-kb", type=int, default=None)
+    parser.add_argument("--no-preallocate", action="store_true")
+    # Повторы ставят игру заново в ту же папку - с общим хранилищем они мерили бы только копирование из него
+    parser.add_argument("--store", action="store_true", help="использовать общее хранилище версий")
+    parser.add_argument("--pack-codec", choices=hac_pack.available_codecs(), default=None,
+                        help="перепаковать архивы в hac.pak с этим кодеком")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--keep", action="store_true",
+                        help="не удалять сгенерированные архивы и установки (прочее в рабочей папке не трогается)")
+    # Служебные аргументы для запуска одного этапа в дочернем процессе
+    parser.add_argument("--run-phase", choices=PHASES, help=argparse.SUPPRESS)
+    parser.add_argument("--archive", help=argparse.SUPPRESS)
+    parser.add_argument("--target", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_phase:
+        print(json.dumps(run_phase(args.run_phase, args.archive, args.target, args.workers)))
+        return 0
+
+    if args.fsync:
+        os.environ["HAC_FSYNC"] = args.fsync
+    if args.write_buffer_kb:
+        os.environ["HAC_WRITE_BUFFER_KB"] = str(args.write_buffer_kb)
+    if args.no_preallocate:
+        os.environ["HAC_PREALLOCATE"] = "0"
+    if not args.store:
+        os.environ["HAC_STORE"] = "0"
+
+    created = []
+    made_work_dir = not os.path.isdir(args.work_dir)
+    results = run_benchmark(args.shapes, args.scale, args.work_dir, args.workers, args.repeat,
+                            args.pack_codec, created)
+    report = {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers or hac_core.get_extract_workers(),
+        'scale': args.scale,
+        'pack_codec': args.pack_codec,
+        'store': args.store,
+        'io': hac_core.IOBackend().describe(),
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены: {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            for line in compare(results, json.load(f)):
+                print(line)
+
+    if not args.keep:
+        remove_created(created)
+        if made_work_dir:
+            try:
+                # Рабочая папка создана бенчмарком - удаляется, только если в ней ничего не осталось
+                os.rmdir(args.work_dir)
+            except OSError:
+                pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""Консольный режим лаунчера: установка, удаление и проверка без графического интерфейса"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import hac_core
+import hac_patch
+import hac_store
+from hac_core import (InstallError, InstallManifest, ProgressChannel, find_game_exe,
+                      install_game, uninstall_game, verify_installation)
+from hac_log import span
+from hac_rules import InstallSelection
+
+# Минимальный интервал между строками прогресса (секунды)
+PRINT_INTERVAL = 0.25
+
+# Как часто проверять изменение файла ограничений скорости (секунды)
+THROTTLE_FILE_INTERVAL = 1.0
+
+# Коды завершения
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_VERIFY_FAILED = 2
+EXIT_NO_OUTPUT = 3
+
+
+def write_line(stream, text):
+    """Вывод строки; в сборке без консоли (--windowed) потоков вывода нет - см. --progress-file"""
+    if stream is not None:
+        stream.write(text + "\n")
+        stream.flush()
+
+
+class ConsoleProgress(ProgressChannel):
+    """Прогресс в консоль: текстом или строками JSON, не чаще PRINT_INTERVAL"""
+
+    def __init__(self, json_progress=False, quiet=False, output=None):
+        super().__init__()
+        self.json_progress = json_progress
+        self.quiet = quiet
+        # Консоль или файл --progress-file
+        self.output = output or sys.stdout
+        self._print_lock = threading.Lock()
+        self._last_print = 0
+        self._last_operation = None
+
+    def publish(self, value, status="", operation=""):
+        super().publish(value, status, operation)
+        # Смена этапа и завершение выводятся всегда, остальное - с ограничением частоты
+        self._emit(force=value >= 100 or bool(operation and operation != self._last_operation))
+
+    def _emit(self, force=False):
+        if self.quiet and not self.json_progress:
+            return
+        with self._print_lock:
+            now = time.monotonic()
+            if not force and now - self._last_print < PRINT_INTERVAL:
+                return
+            self._last_print = now
+            snapshot = self.snapshot()
+            self._last_operation = snapshot['operation']
+
+            if self.json_progress:
+                write_line(self.output, json.dumps({
+                    'event': 'progress',
+                    'value': round(snapshot['value'], 1),
+                    'status': snapshot['status'],
+                    'operation': snapshot['operation'],
+                    'rate': snapshot['rate'],
+                    'eta': snapshot['eta']
+                }, ensure_ascii=False))
+            else:
+                write_line(self.output, f"[{int(snapshot['value']):3d}%] {snapshot['status']}")
+
+
+class Console:
+    """Итоговые сообщения консольного режима"""
+
+    def __init__(self, json_progress=False, quiet=False, output=None):
+        self.json_progress = json_progress
+        self.quiet = quiet
+        self.output = output or sys.stdout
+
+    def result(self, ok, message, **details):
+        if self.json_progress:
+            record = {'event': 'result', 'ok': ok, 'message': message}
+            record.update(details)
+            write_line(self.output, json.dumps(record, ensure_ascii=False))
+        elif not ok:
+            write_line(sys.stderr, f"Ошибка: {message}")
+        elif not self.quiet:
+            write_line(self.output, message)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="HAC_Launcher",
+        description="HAC Game Manager - установка, удаление и проверка игры из командной строки")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--install", metavar="PATH", help="установить игру в папку PATH")
+    action.add_argument("--resume", action="store_true", help="продолжить прерванную установку")
+    action.add_argument("--uninstall", metavar="PATH", nargs="?", const="",
+                        help="удалить игру (по умолчанию - установленную)")
+    action.add_argument("--verify", metavar="PATH", nargs="?", const="",
+                        help="проверить файлы игры (по умолчанию - установленной)")
+    action.add_argument("--find-exe", metavar="PATH", help="найти исполняемый файл игры в папке PATH")
+    action.add_argument("--patch", metavar="FILE", nargs="?", const="",
+                        help="обновить игру патчем (по умолчанию - hac.patch рядом с лаунчером)")
+    action.add_argument("--list-components", action="store_true",
+                        help="показать компоненты игры в архиве hac.pak")
+    action.add_argument("--list-versions", action="store_true",
+                        help="показать установленные версии игры и общее хранилище файлов")
+    action.add_argument("--set-active", metavar="PATH",
+                        help="сделать текущей установленную версию из папки PATH")
+    parser.add_argument("--target", metavar="PATH", help="папка игры для --patch (по умолчанию - установленная)")
+    parser.add_argument("--deep", action="store_true", help="полная проверка CRC32 при --verify")
+    parser.add_argument("--components", metavar="ID,ID",
+                        help="устанавливаемые компоненты через запятую (пусто - только основная часть)")
+    parser.add_argument("--include", metavar="PATTERN", action="append", default=[],
+                        help="устанавливать только файлы по шаблону (можно повторять)")
+    parser.add_argument("--exclude", metavar="PATTERN", action="append", default=[],
+                        help="не устанавливать файлы по шаблону (можно повторять)")
+    parser.add_argument("--component", metavar="ID", action="append", default=[],
+                        help="проверить только этот компонент при --verify (core - основная часть)")
+    parser.add_argument("--workers", type=int, default=None, help="число потоков распаковки и проверки")
+    parser.add_argument("--fsync", choices=hac_core.FSYNC_POLICIES, default=None,
+                        help="сброс распакованных файлов на диск: none, batch или end")
+    parser.add_argument("--write-buffer", metavar="KB", type=int, default=None,
+                        help="размер буфера записи в КБ")
+    parser.add_argument("--no-preallocate", action="store_true",
+                        help="не резервировать место под файлы заранее")
+    parser.add_argument("--limit-mbps", metavar="MB", type=float, default=None,
+                        help="ограничить скорость распаковки (МБ/с), 0 - без ограничения")
+    parser.add_argument("--limit-files", metavar="N", type=float, default=None,
+                        help="ограничить число файлов в секунду при распаковке и удалении")
+    parser.add_argument("--low-priority", action="store_true",
+                        help="понизить приоритет процесса (процессор и диск)")
+    parser.add_argument("--throttle-file", metavar="FILE",
+                        help='JSON {"mb_per_s": ..., "files_per_s": ...}: ограничения меняются на лету')
+    store = parser.add_mutually_exclusive_group()
+    store.add_argument("--store", action="store_true",
+                       help="общее хранилище файлов версий рядом с папкой установки: "
+                            "файлы, которые уже есть у других версий, клонируются из него "
+                            "(только на томах с copy-on-write: ReFS, Btrfs, XFS, APFS)")
+    store.add_argument("--no-store", action="store_true",
+                       help="не использовать общее хранилище, даже если оно уже есть (распаковать все из архива)")
+    parser.add_argument("--no-shortcut", action="store_true", help="не создавать ярлык на рабочем столе")
+    parser.add_argument("--quiet", action="store_true", help="не выводить текстовый прогресс")
+    parser.add_argument("--json-progress", action="store_true", help="прогресс и результат строками JSON")
+    parser.add_argument("--progress-file", metavar="FILE",
+                        help="прогресс и результат строками JSON в файл FILE (в сборке лаунчера нет консоли)")
+    return parser
+
+
+def io_backend(args):
+    """Настройки записи из аргументов; не заданные берутся из переменных окружения"""
+    return hac_core.IOBackend(buffer_size=args.write_buffer * 1024 if args.write_buffer else None,
+                              preallocate=False if args.no_preallocate else None,
+                              fsync_policy=args.fsync)
+
+
+def install_selection(args):
+    """Выбор из аргументов; None - оставить выбор прошлой установки (или по умолчанию)"""
+    if args.components is None and not args.include and not args.exclude:
+        return None
+    components = None
+    if args.components is not None:
+        components = [c.strip() for c in args.components.split(",") if c.strip()]
+    return InstallSelection(components, args.include, args.exclude)
+
+
+def throttle(args):
+    """Ограничение скорости из аргументов; не заданные берутся из переменных окружения"""
+    limiter = hac_core.Throttle(args.limit_mbps, args.limit_files)
+    if args.throttle_file:
+        watch_throttle_file(limiter, args.throttle_file)
+    return limiter
+
+
+def watch_throttle_file(limiter, path):
+    """Перечитываем файл ограничений при изменении - скорость можно менять во время установки"""
+    def load():
+        with open(path, 'r', encoding='utf-8') as f:
+            limits = json.load(f)
+        limiter.set_limits(limits.get('mb_per_s', 0), limits.get('files_per_s', 0))
+        hac_core.log_event("info", "throttle", **limiter.describe())
+
+    def watch():
+        last = None
+        while True:
+            try:
+                mtime = os.stat(path).st_mtime
+                if mtime != last:
+                    last = mtime
+                    load()
+            except (OSError, ValueError, AttributeError):
+                pass
+            time.sleep(THROTTLE_FILE_INTERVAL)
+
+    try:
+        load()
+    except (OSError, ValueError, AttributeError) as e:
+        raise InstallError(f"Не удалось прочитать файл ограничений {path}: {str(e)}")
+    threading.Thread(target=watch, name="hac-throttle", daemon=True).start()
+
+
+def create_shortcut(args, install_dir, game_exe):
+    """Ярлык на рабочем столе; None - если не создан (ошибка записана в журнал)"""
+    if args.no_shortcut:
+        return None
+    try:
+        import hac_shortcut
+        with span("shortcut", exe_path=game_exe) as phase:
+            shortcut_path = hac_shortcut.create_shortcut(install_dir, game_exe)
+            phase.set(shortcut_path=shortcut_path)
+        return shortcut_path
+    except Exception as e:
+        hac_core.log_error("Ошибка при создании ярлыка", e)
+    return None
+
+
+def run_install(args, progress, console):
+    result = install_game(args.install, progress, workers=args.workers, io_backend=io_backend(args),
+                          selection=install_selection(args), throttle=throttle(args))
+
+    shortcut_path = create_shortcut(args, result.install_dir, result.game_exe)
+
+    hac_core.write_installation_info(result.install_dir)
+    progress.publish(100, "Установка завершена успешно!", "Завершено")
+    console.result(True, "Установка завершена успешно!",
+                   install_dir=result.install_dir, game_exe=result.game_exe,
+                   extracted=result.extracted, linked=result.linked, removed=result.removed,
+                   skipped=[file for file, error in result.errors],
+                   shortcut=shortcut_path)
+    return EXIT_OK
+
+
+def run_resume(args, progress, console):
+    args.install = hac_core.read_pending_install()
+    if not args.install:
+        raise InstallError("Нет прерванной установки")
+    return run_install(args, progress, console)
+
+
+def run_uninstall(args, progress, console):
+    install_dir = args.uninstall or hac_core.read_installation_info()
+    uninstall_game(install_dir, progress, workers=args.workers, throttle=throttle(args))
+
+    try:
+        import hac_shortcut
+        hac_shortcut.delete_shortcut()
+    except Exception as e:
+        hac_core.log_error("Ошибка при удалении ярлыка", e)
+
+    # Текущей становится другая установленная версия, если она есть; ярлык запускает ее
+    active = hac_core.clear_installation_info(install_dir)
+    if active and os.path.isdir(active):
+        game_exe = find_game_exe(active)
+        if game_exe:
+            create_shortcut(args, active, game_exe)
+    progress.publish(100, "Удаление завершено успешно!", "Завершено")
+    console.result(True, "Удаление завершено успешно!", install_dir=install_dir, active=active)
+    return EXIT_OK
+
+
+def run_verify(args, progress, console):
+    install_dir = args.verify or hac_core.read_installation_info()
+    if not install_dir or not os.path.exists(install_dir):
+        raise InstallError("Не найдена установленная игра!")
+    manifest = InstallManifest.load(install_dir)
+    if manifest is None:
+        raise InstallError("Не найден манифест установки. Переустановите игру.")
+
+    def on_progress(done_files, total_files, done_bytes, total_bytes):
+        progress.update_transfer(done_bytes)
+        progress.publish(done_bytes / total_bytes * 100 if total_bytes else done_files / total_files * 100,
+                         f"Проверка: {done_files}/{total_files} файлов...", "Проверка")
+
+    only = None
+    if args.component:
+        selection = manifest.selection
+        if selection is None:
+            raise InstallError("Игра установлена без компонентов")
+        unknown = set(args.component) - set(selection.catalog.ids()) - {"core"}
+        if unknown:
+            raise InstallError(f"Неизвестные компоненты: {', '.join(sorted(unknown))}")
+        only = selection.component_filter(args.component)
+
+    progress.begin_transfer(manifest.total_size)
+    report = verify_installation(install_dir, manifest, deep=args.deep, workers=args.workers,
+                                 progress_callback=on_progress, only=only)
+    progress.end_transfer()
+
+    console.result(report.ok, report.summary(), install_dir=install_dir, checked=report.checked,
+                   missing=report.missing, corrupt=report.corrupt, extra=report.extra)
+    return EXIT_OK if report.ok else EXIT_VERIFY_FAILED
+
+
+def run_patch(args, progress, console):
+    install_dir = args.target or hac_core.read_installation_info()
+    if not install_dir or not os.path.exists(install_dir):
+        raise InstallError("Не найдена установленная игра!")
+    patch = hac_core.ArchiveSource(args.patch) if args.patch else None
+    result = hac_patch.apply_patch(install_dir, patch, progress, workers=args.workers,
+                                   io_backend=io_backend(args), throttle=throttle(args))
+
+    hac_core.write_installation_info(result.install_dir)
+    progress.publish(100, "Обновление установлено!", "Завершено")
+    console.result(True, "Обновление установлено!", install_dir=result.install_dir,
+                   game_exe=result.game_exe, changed=result.extracted, removed=result.removed,
+                   skipped=[file for file, error in result.errors])
+    return EXIT_OK
+
+
+def run_list_components(args, progress, console):
+    archive = hac_core.find_embedded_archive()
+    if not archive:
+        raise InstallError("Не найден архив с игрой (hac.pak рядом с лаунчером)!")
+    catalog, sizes = hac_core.read_components(archive)
+    lines = [f"core: основная часть игры ({hac_core.format_size(sizes[None])})"]
+    components = []
+    for component in catalog:
+        mark = " [по умолчанию]" if component.default else ""
+        lines.append(f"{component.id}: {component.name} ({hac_core.format_size(sizes[component.id])}){mark}")
+        components.append(dict(component.to_dict(), size=sizes[component.id]))
+    console.result(True, "\n".join(lines), core_size=sizes[None], components=components)
+    return EXIT_OK
+
+
+def run_list_versions(args, progress, console):
+    registry = hac_core.load_registry()
+    lines, versions, stores = [], [], {}
+    for entry in registry.versions:
+        path = entry['path']
+        active = path == registry.active
+        installed = os.path.isdir(path)
+        lines.append(f"{entry.get('name') or path}: {path}{' [текущая]' if active else ''}"
+                     f"{'' if installed else ' (папка не найдена)'}")
+        versions.append(dict(entry, active=active, installed=installed))
+        store = hac_store.ContentStore.for_install(path)
+        if store is not None and store.root not in stores and store.exists():
+            stores[store.root] = store.stats()
+    for root, stats in stores.items():
+        lines.append(f"Общее хранилище {root}: файлов {stats['objects']}, "
+                     f"{hac_core.format_size(stats['bytes'])}, версий {stats['versions']}")
+    console.result(True, "\n".join(lines) or "Нет установленных версий", active=registry.active,
+                   versions=versions, stores=[dict(stats, root=root) for root, stats in stores.items()])
+    return EXIT_OK
+
+
+def run_set_active(args, progress, console):
+    install_dir = args.set_active
+    if not os.path.isdir(install_dir):
+        raise InstallError(f"Не найдена папка с игрой: {install_dir}")
+    game_exe = find_game_exe(install_dir)
+    if not game_exe:
+        raise InstallError("Не найден исполняемый файл игры!")
+    hac_core.set_active_version(install_dir)
+    # Ярлык на рабочем столе запускает текущую версию
+    shortcut_path = create_shortcut(args, install_dir, game_exe)
+    console.result(True, f"Текущая версия: {install_dir}", install_dir=install_dir, game_exe=game_exe,
+                   shortcut=shortcut_path)
+    return EXIT_OK
+
+
+def run_find_exe(args, progress, console):
+    game_exe = find_game_exe(args.find_exe)
+    if not game_exe:
+        raise InstallError("Не найден исполняемый файл игры!")
+    console.result(True, game_exe, game_exe=game_exe)
+    return EXIT_OK
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.progress_file:
+        try:
+            output = open(args.progress_file, 'w', encoding='utf-8')
+        except OSError as e:
+            write_line(sys.stderr, f"Ошибка: не удалось открыть {args.progress_file}: {str(e)}")
+            return EXIT_NO_OUTPUT
+        json_progress = True
+    else:
+        output = sys.stdout
+        json_progress = args.json_progress
+        if output is None and (json_progress or not args.quiet):
+            # Сборка без консоли (--windowed): выводить некуда - не работаем молча
+            hac_core.log_error("Консольный режим без консоли: используйте --progress-file FILE или --quiet")
+            return EXIT_NO_OUTPUT
+    try:
+        return run_action(args, ConsoleProgress(json_progress=json_progress, quiet=args.quiet, output=output),
+                   Console(json_progress=json_progress, quiet=args.quiet, output=output))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def run_action(args, progress, console):
+    if args.low_priority or hac_core.get_throttle_settings()['low_priority']:
+        hac_core.set_background_priority(True)
+    if args.store or args.no_store:
+        os.environ["HAC_STORE"] = "1" if args.store else "0"
+
+    if args.install is not None:
+        action = run_install
+    elif args.resume:
+        action = run_resume
+    elif args.uninstall is not None:
+        action = run_uninstall
+    elif args.verify is not None:
+        action = run_verify
+    elif args.patch is not None:
+        action = run_patch
+    elif args.list_components:
+        action = run_list_components
+    elif args.list_versions:
+        action = run_list_versions
+    elif args.set_active is not None:
+        action = run_set_active
+    else:
+        action = run_find_exe
+
+    try:
+        return action(args, progress, console)
+    except InstallError as e:
+        console.result(False, str(e))
+        return EXIT_ERROR
+    except Exception as e:
+        log_file = hac_core.log_error("Ошибка в консольном режиме", e)
+        console.result(False, f"Произошла ошибка: {str(e)}", log_file=log_file)
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
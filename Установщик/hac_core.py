@@ -0,0 +1,2300 @@
+"""Ядро установщика HAC: распаковка, манифест, проверка и удаление без GUI и pywin32"""
+import os
+import sys
+import json
+import zipfile
+import shutil
+import stat
+import threading
+import time
+import hashlib
+import sqlite3
+import zlib
+from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import hac_pack
+from hac_log import LOG_DIR, LOG_FILE, log_event, log_exception, span
+from hac_rules import ComponentCatalog, InstallSelection, RuleSet, DEFAULT_EXCLUDE
+from hac_store import ContentStore, VersionRegistry, clone_file, is_storable
+
+# Имя архива с игрой, встраиваемого в лаунчер
+ARCHIVE_NAME = "hac.zip"
+
+# Блочный архив hac.pak (см. hac_pack) - ищется первым, hac.zip поддерживается как раньше
+PACK_ARCHIVE_NAME = "hac.pak"
+
+# Размер буфера чтения архива (1 МБ)
+ARCHIVE_BUFFER_SIZE = 1024 * 1024
+
+# Контрольная сумма архива: файл hac.zip.sha256 создается при сборке и встраивается рядом с архивом
+DIGEST_SUFFIX = ".sha256"
+
+# Архив проверяется блоками, чтобы повреждение обнаруживалось сразу, а не в конце (4 МБ).
+# Мелкие блоки чаще целиком попадают в данные, которые читает один поток распаковки
+DIGEST_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Куски блоков, прочитанные потоками распаковки не по порядку, ждут проверки в памяти не больше этого
+VERIFY_PENDING_LIMIT = 64 * 1024 * 1024
+
+# Файлы больше этого размера распаковываются отдельными задачами (8 МБ)
+LARGE_FILE_THRESHOLD = 8 * 1024 * 1024
+
+# Мелкие файлы объединяются в пакеты, чтобы не плодить задачи
+SMALL_BATCH_FILES = 64
+SMALL_BATCH_BYTES = 16 * 1024 * 1024
+
+# Число потоков распаковки по умолчанию (можно задать через HAC_EXTRACT_WORKERS)
+DEFAULT_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Размер блока при потоковой распаковке файла (1 МБ)
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Символы, недопустимые в именах файлов Windows
+WINDOWS_ILLEGAL_CHARS = ':<>|"?*'
+WINDOWS_ILLEGAL_TABLE = str.maketrans(WINDOWS_ILLEGAL_CHARS, '_' * len(WINDOWS_ILLEGAL_CHARS))
+
+# Манифест установки (SQLite): распакованные файлы с размером, CRC32 и датой
+MANIFEST_NAME = ".hac_manifest.db"
+MANIFEST_VERSION = 1
+
+# Размер блока чтения при проверке CRC32 установленных файлов (4 МБ)
+VERIFY_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Допустимое расхождение времени изменения файла (точность даты в ZIP - 2 секунды)
+MTIME_TOLERANCE = 2
+
+# Прежний файл с путем единственной установки - переносится в реестр версий (hac_store)
+INSTALL_INFO_FILE = os.path.join(LOG_DIR, "installation_info.txt")
+# Ошибки пишутся в общий журнал вместе с замерами этапов
+ERROR_LOG_FILE = LOG_FILE
+
+# Встроенные правила исключения (см. hac_rules.DEFAULT_EXCLUDE)
+DEFAULT_RULES = RuleSet(DEFAULT_EXCLUDE)
+
+# Известные имена исполняемого файла игры, по убыванию приоритета (регистр не учитывается)
+GAME_EXE_NAMES = [
+    "HAC.exe",
+    "Офисный_Хакер.exe",
+    "game.exe"
+]
+
+# Служебные программы, которые не бывают исполняемым файлом игры
+EXE_SKIP_WORDS = ("unins", "setup", "redist", "crash", "dxweb", "update")
+
+# Размер файла, начиная с которого он больше не добавляет баллов кандидату
+EXE_SIZE_CAP = 256 * 1024 * 1024
+
+# Число попыток удаления заблокированных файлов и начальная пауза между ними (удваивается)
+UNINSTALL_ATTEMPTS = 5
+UNINSTALL_RETRY_DELAY = 0.25
+
+# Файлы удаляются пакетами, чтобы не плодить задачи
+DELETE_BATCH_FILES = 256
+
+# Поэтапная установка: новая версия распаковывается рядом и подменяет старую переименованием
+STAGING_SUFFIX = ".hac_staging"
+BACKUP_SUFFIX = ".hac_old"
+
+# Буфер записи распакованных файлов: данные пишутся на диск кусками ровно такого размера
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Файлы от этого размера резервируются на диске целиком до записи (меньше фрагментация)
+PREALLOCATE_MIN_SIZE = 1024 * 1024
+
+# Запас свободного места сверх размера файлов: манифест, журнал, папки, служебные данные ФС
+DISK_SPACE_RESERVE = 64 * 1024 * 1024
+
+# Размер кластера, если узнать его у файловой системы не удалось
+DEFAULT_CLUSTER_SIZE = 4096
+
+# Фоновый режим установки: ограничение скорости по умолчанию (МБ/с и файлов/с)
+BACKGROUND_MB_PER_S = 20
+BACKGROUND_FILES_PER_S = 200
+
+# Запас "токенов" ограничителя скорости - сколько секунд работы можно выполнить без пауз
+THROTTLE_BURST_SECONDS = 0.25
+
+# Снижение приоритета процесса в фоновом режиме (nice на Linux и macOS)
+BACKGROUND_NICE = 10
+
+# Политика сброса на диск: без fsync, после каждого пакета файлов или один раз в конце
+FSYNC_NONE = "none"
+FSYNC_BATCH = "batch"
+FSYNC_END = "end"
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_BATCH, FSYNC_END)
+
+# Журнал установки: по строке на каждый полностью записанный файл, удаляется после манифеста
+JOURNAL_NAME = ".hac_journal"
+
+# Путь незавершенной установки - чтобы при следующем запуске предложить продолжить
+PENDING_INSTALL_FILE = os.path.join(LOG_DIR, "pending_install.txt")
+
+# Период фоновой проверки состояния установки (секунды)
+STATE_REFRESH_INTERVAL = 5.0
+
+
+class ArchiveSource:
+    """Архив с игрой (hac.pak или hac.zip рядом с лаунчером), открываемый на месте без копирования в память"""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.expected_digest = load_archive_digest(path)
+        # Проверка SHA-256, которой потоки архива передают прочитанные данные (start_verifier)
+        self.verifier = None
+        with self.open() as stream:
+            self.is_pack = hac_pack.is_pack(stream)
+
+    def open(self, buffering=ARCHIVE_BUFFER_SIZE):
+        """Открываем архив как поток с произвольным доступом"""
+        stream = open(self.path, 'rb', buffering=buffering)
+        verifier = self.verifier
+        if verifier is not None:
+            return VerifyingStream(stream, verifier)
+        return stream
+
+    def reader(self, stream):
+        """Чтение содержимого: PackFile для hac.pak, ZipFile для zip (интерфейс общий)"""
+        if self.is_pack:
+            return hac_pack.PackFile(stream)
+        return zipfile.ZipFile(stream, 'r')
+
+    def fingerprint(self, zip_ref):
+        """Отпечаток архива: SHA-256 размера и центрального каталога (без чтения данных)"""
+        digest = hashlib.sha256(str(self.size).encode('ascii'))
+        with self.open() as stream:
+            stream.seek(zip_ref.start_dir)
+            while True:
+                chunk = stream.read(ARCHIVE_BUFFER_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def check_size(self):
+        """Мгновенная проверка на обрезанный архив - по размеру из контрольной суммы"""
+        if self.expected_digest and self.expected_digest['size'] != self.size:
+            raise ArchiveIntegrityError(
+                f"Архив с игрой {os.path.basename(self.path)} поврежден: размер {self.size} байт вместо "
+                f"{self.expected_digest['size']}. Скачайте игру заново.")
+
+    def start_verifier(self):
+        """Включаем проверку SHA-256 читаемых данных; None, если контрольной суммы нет (режим разработки).
+
+        Проверяются потоки, открытые после вызова, - включать ее нужно до чтения архива.
+        """
+        if not self.expected_digest:
+            return None
+        self.verifier = ArchiveVerifier(self)
+        return self.verifier
+
+    @contextmanager
+    def open_zip(self):
+        """Открываем архив для распаковки, поток закрывается вместе с ZipFile"""
+        stream = self.open()
+        try:
+            with self.reader(stream) as zip_ref:
+                yield zip_ref
+        finally:
+            stream.close()
+
+
+def compute_archive_digest(path, block_size=DIGEST_BLOCK_SIZE):
+    """SHA-256 архива целиком и по блокам"""
+    total = hashlib.sha256()
+    blocks = []
+    with open(path, 'rb') as f:
+        while True:
+            block = hashlib.sha256()
+            remaining = block_size
+            while remaining:
+                chunk = f.read(min(VERIFY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                block.update(chunk)
+                total.update(chunk)
+                remaining -= len(chunk)
+            if remaining == block_size:
+                break
+            blocks.append(block.hexdigest())
+            if remaining:
+                break
+    return {
+        'algorithm': 'sha256',
+        'size': os.path.getsize(path),
+        'block_size': block_size,
+        'digest': total.hexdigest(),
+        'blocks': blocks
+    }
+
+
+def write_archive_digest(path):
+    """Записываем контрольную сумму рядом с архивом (вызывается при сборке)"""
+    digest_path = path + DIGEST_SUFFIX
+    with open(digest_path, 'w', encoding='utf-8') as f:
+        json.dump(compute_archive_digest(path), f, indent=1)
+    return digest_path
+
+
+def load_archive_digest(path):
+    """Читаем контрольную сумму архива, None - если ее нет"""
+    try:
+        with open(path + DIGEST_SUFFIX, 'r', encoding='utf-8') as f:
+            digest = json.load(f)
+        if digest.get('algorithm') == 'sha256':
+            return digest
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class BlockHash:
+    """Состояние проверки одного блока контрольной суммы"""
+
+    def __init__(self, start, end):
+        self.lock = threading.Lock()
+        self.hash = hashlib.sha256()
+        self.next = start
+        self.end = end
+        # Куски, прочитанные раньше предыдущих данных блока: смещение -> данные
+        self.pending = {}
+        self.done = False
+
+
+class ArchiveVerifier:
+    """Проверка SHA-256 архива по данным, которые читает распаковка, - без отдельного прохода по архиву.
+
+    Потоки архива (VerifyingStream) передают сюда прочитанные байты, блоки
+    контрольной суммы хешируются по мере чтения. При первом же несовпадающем
+    блоке выставляется failed, и распаковка останавливается. Блоки, прочитанные
+    не целиком, дочитываются с диска в wait(); блоки, которые распаковка
+    не читала совсем, в установку не попали и не проверяются.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.expected = archive.expected_digest
+        self.block_size = self.expected['block_size']
+        self.failed = threading.Event()
+        self.error = None
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._verified = set()
+        self._pending_bytes = 0
+
+    def fail(self, message):
+        if self.error is None:
+            self.error = message
+        self.failed.set()
+
+    def fail_block(self, index):
+        self.fail(f"Архив с игрой поврежден (блок {index + 1}, смещение {index * self.block_size} байт). "
+                  "Скачайте игру заново.")
+
+    def feed(self, position, data):
+        """Данные, прочитанные потоком архива с позиции position"""
+        view = memoryview(data).cast('B')
+        while view:
+            index = position // self.block_size
+            size = min(len(view), (index + 1) * self.block_size - position)
+            self._feed_block(index, position, view[:size])
+            position += size
+            view = view[size:]
+
+    def _feed_block(self, index, position, data):
+        with self._lock:
+            if index in self._verified or index >= len(self.expected['blocks']):
+                return
+            block = self._blocks.get(index)
+            if block is None:
+                start = index * self.block_size
+                block = self._blocks[index] = BlockHash(start, min(start + self.block_size, self.archive.size))
+        with block.lock:
+            if block.done:
+                return
+            if position > block.next:
+                # Начало блока читает другой поток - кусок ждет в памяти, если для него есть место
+                if position not in block.pending and self._reserve(len(data)):
+                    block.pending[position] = bytes(data)
+                return
+            if position + len(data) > block.next:
+                block.hash.update(data[block.next - position:])
+                block.next = position + len(data)
+            while block.pending:
+                offset = min(block.pending)
+                if offset > block.next:
+                    break
+                part = block.pending.pop(offset)
+                self._release(len(part))
+                if offset + len(part) > block.next:
+                    block.hash.update(part[block.next - offset:])
+                    block.next = offset + len(part)
+            if block.next >= block.end:
+                self._finish_block(index, block)
+
+    def _finish_block(self, index, block):
+        block.done = True
+        for part in block.pending.values():
+            self._release(len(part))
+        block.pending.clear()
+        with self._lock:
+            del self._blocks[index]
+            self._verified.add(index)
+        if block.hash.hexdigest() != self.expected['blocks'][index]:
+            self.fail_block(index)
+
+    def _reserve(self, size):
+        with self._lock:
+            if self._pending_bytes + size > VERIFY_PENDING_LIMIT:
+                return False
+            self._pending_bytes += size
+            return True
+
+    def _release(self, size):
+        with self._lock:
+            self._pending_bytes -= size
+
+    def check(self):
+        if self.error:
+            raise ArchiveIntegrityError(self.error)
+
+    def close(self):
+        """Отключаем проверку от архива: новые потоки открываются без нее"""
+        if self.archive.verifier is self:
+            self.archive.verifier = None
+
+    def wait(self):
+        """Дочитываем блоки, прочитанные не целиком, и поднимаем ошибку, если архив поврежден"""
+        self.close()
+        with self._lock:
+            partial = sorted(self._blocks)
+        with span("hash", verified=len(self._verified), reread=len(partial)) as phase:
+            try:
+                with open(self.archive.path, 'rb', buffering=0) as f:
+                    for index in partial:
+                        if self.failed.is_set():
+                            break
+                        f.seek(index * self.block_size)
+                        if hashlib.sha256(f.read(self.block_size)).hexdigest() != self.expected['blocks'][index]:
+                            self.fail_block(index)
+            except OSError as e:
+                self.fail(f"Не удалось проверить архив с игрой: {str(e)}")
+            phase.set(corrupt=bool(self.error))
+        self.check()
+
+
+class VerifyingStream:
+    """Поток архива, который передает прочитанные данные проверке SHA-256 (ArchiveVerifier)"""
+
+    def __init__(self, raw, verifier):
+        self.raw = raw
+        self.verifier = verifier
+        self.position = 0
+
+    def read(self, size=-1):
+        position = self.position
+        data = self.raw.read(size)
+        self.position += len(data)
+        if data:
+            self.verifier.feed(position, data)
+        return data
+
+    def readinto(self, buffer):
+        position = self.position
+        count = self.raw.readinto(buffer) or 0
+        self.position += count
+        if count:
+            self.verifier.feed(position, memoryview(buffer).cast('B')[:count])
+        return count
+
+    def seek(self, position, whence=os.SEEK_SET):
+        self.position = self.raw.seek(position, whence)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def find_embedded_file(names):
+    """Ищем файл рядом с лаунчером: _MEIPASS, папка EXE, текущая папка или папка скрипта"""
+    if getattr(sys, 'frozen', False):
+        # PyInstaller создает временную папку _MEIPASS
+        search_dirs = [
+            getattr(sys, '_MEIPASS', ''),
+            os.path.dirname(sys.executable),
+            os.getcwd()
+        ]
+    else:
+        # Для режима разработки - ищем рядом со скриптом
+        search_dirs = [os.path.dirname(os.path.abspath(__file__))]
+
+    for base_dir in search_dirs:
+        for name in names:
+            path = os.path.join(base_dir, name)
+            if base_dir and os.path.isfile(path):
+                return path
+    return None
+
+
+def find_embedded_archive():
+    """Архив с игрой: hac.pak, а если его нет - hac.zip.
+
+    В сборке архив лежит рядом с EXE лаунчера, а не внутри него: загрузчик
+    PyInstaller при каждом запуске ищет свои данные с конца EXE и прочитал бы
+    весь дописанный архив, а --add-data распаковывает его во временную папку.
+    """
+    path = find_embedded_file((PACK_ARCHIVE_NAME, ARCHIVE_NAME))
+    return ArchiveSource(path) if path else None
+
+
+def format_size(size):
+    """Размер в человекочитаемом виде"""
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.1f} {unit}" if unit != "Б" else f"{int(size)} {unit}"
+        size /= 1024
+
+
+def format_eta(seconds):
+    """Оставшееся время в формате Ч:ММ:СС или ММ:СС"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def member_target_path(install_dir, name):
+    """Безопасный путь распаковки элемента архива (как в ZipFile.extract)"""
+    arcname = name.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    # Убираем букву диска, "." и ".." - защита от выхода за папку установки
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_parts = ('', os.path.curdir, os.path.pardir)
+    parts = [x for x in arcname.split(os.path.sep) if x not in invalid_parts]
+    if os.path.sep == '\\':
+        parts = [x.translate(WINDOWS_ILLEGAL_TABLE).rstrip('.') for x in parts]
+        parts = [x for x in parts if x]
+    return os.path.join(install_dir, *parts)
+
+
+def dos_time(date_time):
+    """Дата элемента архива в упакованном формате DOS (одно целое число)"""
+    year, month, day, hour, minute, second = date_time
+    return ((year - 1980) << 25 | month << 21 | day << 16 |
+            hour << 11 | minute << 5 | second // 2)
+
+
+def dos_to_timestamp(value):
+    """Упакованная дата DOS в локальный timestamp"""
+    date_time = ((value >> 25) + 1980, (value >> 21) & 0xF, (value >> 16) & 0x1F,
+                 (value >> 11) & 0x1F, (value >> 5) & 0x3F, (value & 0x1F) * 2)
+    return time.mktime(date_time + (0, 0, -1))
+
+
+def member_timestamp(member):
+    """Дата элемента архива как локальный timestamp"""
+    return time.mktime(member.date_time + (0, 0, -1))
+
+
+def member_record(member):
+    """Запись манифеста для элемента архива: размер, CRC32, дата изменения"""
+    return (member.file_size, member.CRC, dos_time(member.date_time))
+
+
+class InstallManifest:
+    """Версионированный манифест установки: индекс файлов и отпечаток архива"""
+
+    def __init__(self, files=None, meta=None):
+        self.files = files or {}
+        self.meta = meta or {}
+
+    @classmethod
+    def from_members(cls, members, fingerprint=None, selection=None, game_exe=None):
+        """Манифест по списку распакованных элементов архива"""
+        files = {m.filename: member_record(m) for m in members if not m.is_dir()}
+        meta = {
+            'format_version': str(MANIFEST_VERSION),
+            'archive_fingerprint': fingerprint or '',
+            'installed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if selection is not None:
+            meta['selection'] = selection.to_json()
+        if game_exe:
+            meta['game_exe'] = game_exe
+        return cls(files, meta)
+
+    @staticmethod
+    def path(install_dir):
+        return os.path.join(install_dir, MANIFEST_NAME)
+
+    @classmethod
+    def exists(cls, install_dir):
+        return os.path.isfile(cls.path(install_dir))
+
+    @classmethod
+    def load(cls, install_dir):
+        """Читаем манифест, None - если его нет, он поврежден или другой версии"""
+        path = cls.path(install_dir)
+        if not os.path.isfile(path):
+            return None
+        try:
+            conn = sqlite3.connect(path)
+            try:
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                if meta.get('format_version') != str(MANIFEST_VERSION):
+                    return None
+                files = {row[0]: tuple(row[1:])
+                         for row in conn.execute("SELECT path, size, crc, mtime FROM files")}
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return cls(files, meta)
+
+    @classmethod
+    def read_meta(cls, install_dir, key):
+        """Одно значение из манифеста без чтения списка файлов; None - если его нет"""
+        path = cls.path(install_dir)
+        if not os.path.isfile(path):
+            return None
+        try:
+            conn = sqlite3.connect(path)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def save(self, install_dir):
+        """Записываем манифест атомарно: во временный файл и переименование"""
+        path = self.path(install_dir)
+        temp_path = path + ".tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        conn = sqlite3.connect(temp_path)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+                conn.execute("CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER, "
+                             "crc INTEGER, mtime INTEGER) WITHOUT ROWID")
+                conn.executemany("INSERT INTO meta VALUES (?, ?)", self.meta.items())
+                conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?)",
+                                 ((name,) + record for name, record in self.files.items()))
+        finally:
+            conn.close()
+        os.replace(temp_path, path)
+
+    @property
+    def fingerprint(self):
+        return self.meta.get('archive_fingerprint', '')
+
+    @property
+    def selection(self):
+        """Выбор компонентов и шаблонов при установке, None - если не сохранялся"""
+        try:
+            return InstallSelection.from_json(self.meta.get('selection'))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @property
+    def game_exe(self):
+        """Имя исполняемого файла игры в архиве, выбранное при установке"""
+        return self.meta.get('game_exe') or None
+
+    @property
+    def total_size(self):
+        return sum(record[0] for record in self.files.values())
+
+    def get(self, name):
+        return self.files.get(name)
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+
+def plan_differential(install_dir, members, manifest, force=()):
+    """Сравниваем архив с манифестом: что распаковать заново и что удалить"""
+    to_extract = []
+    for member in members:
+        target = member_target_path(install_dir, member.filename)
+        if member.is_dir():
+            if not os.path.isdir(target):
+                to_extract.append(member)
+            continue
+        # force - файлы, которые проверка признала поврежденными
+        if member.filename in force or manifest.get(member.filename) != member_record(member):
+            to_extract.append(member)
+            continue
+        # Запись совпала - проверяем только наличие и размер файла на диске
+        try:
+            if os.stat(target).st_size != member.file_size:
+                to_extract.append(member)
+        except OSError:
+            to_extract.append(member)
+
+    names = {m.filename for m in members}
+    orphans = [name for name in manifest if name not in names]
+    return to_extract, orphans
+
+
+def existing_parent(path):
+    """Ближайшая существующая папка на пути (папки установки может еще не быть)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def cluster_size(path):
+    """Размер кластера тома, на котором лежит path"""
+    path = existing_parent(path)
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            sectors, sector_size = ctypes.c_ulong(), ctypes.c_ulong()
+            root = os.path.splitdrive(path)[0] + "\\"
+            if ctypes.windll.kernel32.GetDiskFreeSpaceW(root, ctypes.byref(sectors), ctypes.byref(sector_size),
+                                                         None, None):
+                return sectors.value * sector_size.value or DEFAULT_CLUSTER_SIZE
+            return DEFAULT_CLUSTER_SIZE
+        return os.statvfs(path).f_frsize or DEFAULT_CLUSTER_SIZE
+    except (OSError, AttributeError):
+        return DEFAULT_CLUSTER_SIZE
+
+
+def on_disk_size(size, cluster):
+    """Место, которое файл займет на диске: размер, округленный вверх до кластера"""
+    return -(-size // cluster) * cluster
+
+
+def space_needed(target_dir, members, in_place=False, cluster=None):
+    """Место под распаковку элементов по оглавлению архива, без чтения данных.
+
+    Дубликаты из hac.pak считаются как обычные файлы: это отдельные копии. in_place -
+    распаковка поверх установленных файлов: место заменяемых файлов освобождается.
+    """
+    cluster = cluster or cluster_size(target_dir)
+    needed = 0
+    for member in members:
+        if member.is_dir():
+            continue
+        needed += on_disk_size(member.file_size, cluster)
+        if in_place:
+            try:
+                needed -= on_disk_size(os.stat(member_target_path(target_dir, member.filename)).st_size, cluster)
+            except OSError:
+                pass
+    return needed
+
+
+def check_disk_space(path, needed):
+    """Предварительная проверка свободного места; InstallError с точными цифрами, если его мало"""
+    volume = existing_parent(path)
+    free = shutil.disk_usage(volume).free
+    log_event("info", "disk_space", path=path, needed=needed, free=free, reserve=DISK_SPACE_RESERVE)
+    if needed + DISK_SPACE_RESERVE > free:
+        shortage = needed + DISK_SPACE_RESERVE - free
+        raise InstallError(f"Недостаточно места на диске ({volume}).\n"
+                           f"Нужно: {format_size(needed + DISK_SPACE_RESERVE)} ({needed + DISK_SPACE_RESERVE} байт), "
+                           f"свободно: {format_size(free)} ({free} байт).\n"
+                           f"Освободите еще {format_size(shortage)} или выберите другую папку.")
+
+
+def remove_orphans(install_dir, orphans):
+    """Удаляем файлы, которых больше нет в архиве, и опустевшие папки"""
+    removed = 0
+    parents = set()
+    for name in orphans:
+        target = member_target_path(install_dir, name)
+        try:
+            os.remove(target)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        parents.add(os.path.dirname(target))
+
+    root = os.path.normpath(install_dir)
+    # Удаляем папки снизу вверх, os.rmdir не трогает непустые
+    for parent in sorted(parents, key=len, reverse=True):
+        parent = os.path.normpath(parent)
+        while parent != root and parent.startswith(root):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+    return removed
+
+
+class VerifyReport:
+    """Результат проверки установки: отсутствующие, поврежденные и лишние файлы"""
+
+    def __init__(self):
+        self.checked = 0
+        self.missing = []
+        self.corrupt = []
+        self.extra = []
+
+    @property
+    def ok(self):
+        return not (self.missing or self.corrupt or self.extra)
+
+    def summary(self):
+        return (f"Проверено файлов: {self.checked}\n"
+                f"Отсутствует: {len(self.missing)}\n"
+                f"Повреждено: {len(self.corrupt)}\n"
+                f"Лишних: {len(self.extra)}")
+
+
+def file_crc32(path):
+    """CRC32 файла, читаем крупными блоками в один переиспользуемый буфер"""
+    crc = 0
+    buffer = bytearray(VERIFY_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            crc = zlib.crc32(view[:size], crc)
+    return crc & 0xFFFFFFFF
+
+
+def verify_installation(install_dir, manifest, deep=False, workers=None, progress_callback=None,
+                        only=None):
+    """Проверяем установленные файлы по манифесту.
+
+    Быстрый режим сравнивает размер и дату изменения и считает CRC32 только
+    для файлов с отличающейся датой; deep=True считает CRC32 для всех файлов.
+    only - отбор части файлов по имени (например, одного компонента); лишние
+    файлы тогда не ищутся.
+    """
+    report = VerifyReport()
+    expected = {}
+    for name, record in manifest.files.items():
+        if only is not None and not only(name):
+            continue
+        target = os.path.normpath(member_target_path(install_dir, name))
+        expected[os.path.normcase(target)] = (name, target, record)
+
+    def check(item):
+        name, target, (size, crc, mtime) = item
+        try:
+            stat = os.stat(target)
+        except OSError:
+            return name, 'missing', size
+        if stat.st_size != size:
+            return name, 'corrupt', size
+        if not deep and abs(stat.st_mtime - dos_to_timestamp(mtime)) <= MTIME_TOLERANCE:
+            return name, 'ok', size
+        try:
+            return name, ('ok' if file_crc32(target) == crc else 'corrupt'), size
+        except OSError:
+            return name, 'corrupt', size
+
+    total_files = len(expected)
+    total_bytes = sum(record[0] for name, target, record in expected.values())
+    done_files = done_bytes = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers or get_extract_workers())) as pool:
+        for name, status, size in pool.map(check, expected.values()):
+            report.checked += 1
+            if status == 'missing':
+                report.missing.append(name)
+            elif status == 'corrupt':
+                report.corrupt.append(name)
+            done_files += 1
+            done_bytes += size
+            if progress_callback:
+                progress_callback(done_files, total_files, done_bytes, total_bytes)
+
+    if only is not None:
+        return report
+
+    # Лишние файлы - все, чего нет в манифесте (кроме самого манифеста)
+    service_files = {MANIFEST_NAME, MANIFEST_NAME + ".tmp", JOURNAL_NAME}
+    root_dir = os.path.normpath(install_dir)
+    for root, dirs, files in os.walk(root_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            if root == root_dir and file in service_files:
+                continue
+            if os.path.normcase(path) not in expected:
+                report.extra.append(os.path.relpath(path, root_dir).replace(os.path.sep, '/'))
+    return report
+
+
+def fsync_file(path):
+    """Принудительная запись файла на диск"""
+    fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def unlink_hardlink(path):
+    """Файл с несколькими жесткими ссылками удаляем перед перезаписью, иначе изменятся и дубликаты"""
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def staging_path(install_dir):
+    return os.path.normpath(install_dir) + STAGING_SUFFIX
+
+
+def backup_path(install_dir):
+    return os.path.normpath(install_dir) + BACKUP_SUFFIX
+
+
+class InstallJournal:
+    """Журнал установки (JSON-строки): дописывается после каждого записанного пакета файлов.
+
+    По нему следующая установка после сбоя пропускает уже готовые файлы.
+    """
+
+    def __init__(self, target_dir):
+        self.path = os.path.join(target_dir, JOURNAL_NAME)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        """Готовые файлы: имя -> (размер, CRC32); оборванная при сбое последняя строка пропускается"""
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        name, size, crc = json.loads(line)
+                    except ValueError:
+                        continue
+                    entries[name] = (size, crc)
+        except OSError:
+            pass
+        return entries
+
+    def record(self, members, sync=False):
+        lines = "".join(json.dumps([m.filename, m.file_size, m.CRC], ensure_ascii=False) + "\n"
+                        for m in members)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(lines)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def plan_resume(target_dir, members, journaled):
+    """Что осталось распаковать после сбоя: файлы из журнала с тем же размером и CRC32 пропускаем.
+
+    Файлы из журнала, которых нет в текущем архиве (другая версия), удаляются.
+    """
+    remaining = []
+    names = set()
+    for member in members:
+        names.add(member.filename)
+        if member.is_dir():
+            remaining.append(member)
+            continue
+        if journaled.get(member.filename) == (member.file_size, member.CRC):
+            try:
+                target = member_target_path(target_dir, member.filename)
+                if os.stat(target).st_size == member.file_size:
+                    continue
+            except OSError:
+                pass
+        remaining.append(member)
+
+    stale = [name for name in journaled if name not in names]
+    remove_orphans(target_dir, stale)
+    return remaining
+
+
+def store_key(member):
+    """Ключ файла в хранилище - SHA-256 из индекса hac.pak; у zip и старых архивов его нет"""
+    return getattr(member, 'sha256', None)
+
+
+def is_store_member(member):
+    """Файл, который берется из хранилища и кладется в него.
+
+    Дубликаты из hac.pak (source) - нет: их делает из оригинала распаковка (_extract_link),
+    отдельные клоны из хранилища разбили бы единственную копию внутри версии.
+    """
+    return not member.is_dir() and not getattr(member, 'source', None) and is_storable(member.file_size)
+
+
+def link_from_store(store, plan, members, journal=None, workers=None):
+    """Файлы, которые уже есть в хранилище, - клонами из него вместо распаковки.
+
+    Возвращаем (полученные, неудачные): неудачные распакуем из архива.
+    """
+    for path in plan.directories(members):
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            pass
+
+    def checkout(member):
+        target = plan.target(member)
+        try:
+            if not store.checkout(store_key(member), target):
+                return False
+            os.utime(target, (time.time(), member_timestamp(member)))
+        except OSError:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, workers or get_extract_workers())) as pool:
+        results = list(pool.map(checkout, members))
+    linked = [m for m, ok in zip(members, results) if ok]
+    failed = [m for m, ok in zip(members, results) if not ok]
+    if journal is not None and linked:
+        journal.record(linked)
+    return linked, failed
+
+
+def update_store(store, install_dir, manifest, members, linked=()):
+    """Записанные файлы - в хранилище, состав версии - по манифесту, ненужные файлы хранилища удаляются.
+
+    linked - файлы, полученные из хранилища. Хранилище лишь ускоряет установку,
+    его ошибки только записываются в журнал.
+    """
+    if store is None:
+        return
+    try:
+        with span("store") as phase:
+            added = store.add_files(install_dir, ((m.filename, member_target_path(install_dir, m.filename),
+                                                   store_key(m))
+                                                  for m in members if is_store_member(m)))
+            store.add_refs(install_dir, ((m.filename, store_key(m)) for m in linked))
+            store.retain_refs(install_dir, manifest.files)
+            collected, freed = store.collect(live=InstallManifest.exists)
+            phase.set(added=added, collected=collected, freed=freed)
+    except (OSError, sqlite3.Error) as e:
+        log_event("warning", "store_error", root=store.root, error=str(e))
+
+
+def release_from_store(install_dir):
+    """Версия удалена: снимаем ее ссылки и удаляем файлы хранилища, которые больше никому не нужны"""
+    store = ContentStore.for_install(install_dir)
+    if store is None:
+        return
+    try:
+        store.release(install_dir)
+        store.collect(live=InstallManifest.exists)
+    except (OSError, sqlite3.Error) as e:
+        log_event("warning", "store_error", root=store.root, error=str(e))
+
+
+def read_pending_install():
+    """Путь незавершенной установки или None"""
+    try:
+        with open(PENDING_INSTALL_FILE, 'r', encoding='utf-8') as f:
+            path = f.read().strip()
+    except OSError:
+        return None
+    if path and (os.path.exists(staging_path(path)) or InstallJournal(path).exists()):
+        return path
+    return None
+
+
+def write_pending_install(path):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with open(PENDING_INSTALL_FILE, 'w', encoding='utf-8') as f:
+        f.write(path)
+
+
+def clear_pending_install():
+    if os.path.exists(PENDING_INSTALL_FILE):
+        os.remove(PENDING_INSTALL_FILE)
+
+
+def recover_interrupted_install(install_dir, workers=None):
+    """Доводим до конца или откатываем замену папки, прерванную между переименованиями"""
+    backup = backup_path(install_dir)
+    if not os.path.exists(backup):
+        return
+    if not os.path.exists(install_dir):
+        staging = staging_path(install_dir)
+        if InstallManifest.exists(staging):
+            # Новая версия полностью готова - завершаем замену
+            os.rename(staging, install_dir)
+        else:
+            # Откат: возвращаем старую версию на место
+            os.rename(backup, install_dir)
+            return
+    # Замена выполнена, осталось удалить старую версию
+    DeletionEngine(backup, workers=workers).run()
+
+
+def swap_into_place(staging, install_dir, workers=None):
+    """Подменяем папку установки готовой промежуточной папкой с откатом при ошибке"""
+    backup = backup_path(install_dir)
+    had_old = os.path.exists(install_dir)
+    if had_old:
+        try:
+            os.rename(install_dir, backup)
+        except OSError as e:
+            raise InstallError(f"Не удалось заменить папку с игрой: {str(e)}\n"
+                               "Закройте игру и все программы, использующие эту папку.")
+    try:
+        os.rename(staging, install_dir)
+    except OSError as e:
+        if had_old:
+            os.rename(backup, install_dir)
+        raise InstallError(f"Не удалось переместить новую версию игры на место: {str(e)}")
+    if had_old:
+        # Не удаленные сейчас остатки старой версии уберет следующий запуск
+        DeletionEngine(backup, workers=workers).run()
+
+
+def discard_failed_install(install_dir, target_dir, staged, workers=None):
+    """Установка из поврежденного архива: продолжать при следующем запуске нечего.
+
+    Промежуточная папка удаляется, при обновлении на месте - журнал (файлы
+    сверятся с прежним манифестом заново); метка незавершенной установки снимается.
+    """
+    try:
+        if staged:
+            DeletionEngine(target_dir, workers=workers).run()
+        else:
+            InstallJournal(target_dir).remove()
+        clear_pending_install()
+    except OSError as e:
+        log_event("warning", "discard_failed", path=target_dir, error=str(e))
+
+
+class ProgressChannel:
+    """Канал прогресса: рабочие потоки публикуют состояние, интерфейс забирает снимок по таймеру"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._value = 0
+        self._status = ""
+        self._operation = ""
+        self._done_bytes = 0
+        self._total_bytes = 0
+        self._started = None
+
+    def publish(self, value, status="", operation=""):
+        """Публикуем процент и подписи (пустые подписи не меняются)"""
+        with self._lock:
+            self._value = value
+            if status:
+                self._status = status
+            if operation:
+                self._operation = operation
+            self._version += 1
+
+    def begin_transfer(self, total_bytes):
+        """Начало этапа с подсчетом байтов - для скорости и оставшегося времени"""
+        with self._lock:
+            self._done_bytes = 0
+            self._total_bytes = total_bytes
+            self._started = time.monotonic()
+            self._version += 1
+
+    def update_transfer(self, done_bytes):
+        with self._lock:
+            self._done_bytes = done_bytes
+            self._version += 1
+
+    def end_transfer(self):
+        with self._lock:
+            self._started = None
+            self._version += 1
+
+    def snapshot(self, since_version=-1):
+        """Текущее состояние или None, если с прошлого снимка ничего не изменилось"""
+        with self._lock:
+            if self._version == since_version:
+                return None
+            rate = eta = None
+            if self._started is not None and self._done_bytes:
+                elapsed = time.monotonic() - self._started
+                if elapsed > 0:
+                    rate = self._done_bytes / elapsed
+                    eta = max(0, self._total_bytes - self._done_bytes) / rate
+            return {
+                'version': self._version,
+                'value': self._value,
+                'status': self._status,
+                'operation': self._operation,
+                'rate': rate,
+                'eta': eta
+            }
+
+
+def get_extract_workers():
+    """Число потоков распаковки из переменной окружения или по умолчанию"""
+    try:
+        workers = int(os.environ.get("HAC_EXTRACT_WORKERS", "0"))
+    except ValueError:
+        workers = 0
+    return workers if workers > 0 else DEFAULT_EXTRACT_WORKERS
+
+
+def get_io_settings():
+    """Настройки записи из переменных окружения: HAC_WRITE_BUFFER_KB, HAC_PREALLOCATE, HAC_FSYNC"""
+    try:
+        buffer_size = int(os.environ.get("HAC_WRITE_BUFFER_KB", "0")) * 1024
+    except ValueError:
+        buffer_size = 0
+    fsync_policy = os.environ.get("HAC_FSYNC", "").lower()
+    return {
+        'buffer_size': buffer_size if buffer_size > 0 else WRITE_BUFFER_SIZE,
+        'preallocate': os.environ.get("HAC_PREALLOCATE", "1") != "0",
+        'fsync_policy': fsync_policy if fsync_policy in FSYNC_POLICIES else None
+    }
+
+
+def get_throttle_settings():
+    """Ограничение скорости из переменных окружения: HAC_LIMIT_MBPS, HAC_LIMIT_FILES, HAC_LOW_PRIORITY"""
+    def number(name):
+        try:
+            return max(0.0, float(os.environ.get(name, "0")))
+        except ValueError:
+            return 0.0
+
+    return {
+        'mb_per_s': number("HAC_LIMIT_MBPS"),
+        'files_per_s': number("HAC_LIMIT_FILES"),
+        'low_priority': os.environ.get("HAC_LOW_PRIORITY", "0") == "1"
+    }
+
+
+def open_store(install_dir):
+    """Общее хранилище файлов для папки установки или None.
+
+    Хранилище включается явно (HAC_STORE=1, --store); если рядом с папкой оно
+    уже есть, используется и дальше, чтобы состав версий в нем оставался верным.
+    HAC_STORE=0 отключает его совсем. На томе без клонов copy-on-write хранилище
+    не ведется (прежнее, с обычными копиями, удаляется): оно только заняло бы место.
+    """
+    setting = os.environ.get("HAC_STORE", "")
+    if setting == "0":
+        return None
+    store = ContentStore.for_install(install_dir)
+    if store is None or (setting != "1" and not store.exists()):
+        return None
+    try:
+        if store.can_clone():
+            return store
+        if store.exists():
+            store.remove()
+    except OSError as e:
+        log_event("warning", "store_error", root=store.root, error=str(e))
+    return None
+
+
+class Throttle:
+    """Ограничение скорости распаковки и удаления: общие для всех потоков "ведра токенов"
+    по байтам и по файлам. 0 - без ограничения; лимиты можно менять во время работы.
+    """
+
+    def __init__(self, mb_per_s=None, files_per_s=None):
+        settings = get_throttle_settings()
+        self._lock = threading.Lock()
+        self.set_limits(settings['mb_per_s'] if mb_per_s is None else mb_per_s,
+                        settings['files_per_s'] if files_per_s is None else files_per_s)
+
+    def set_limits(self, mb_per_s=0, files_per_s=0):
+        with self._lock:
+            self.bytes_rate = (mb_per_s or 0) * 1024 * 1024
+            self.files_rate = files_per_s or 0
+            self._bytes_tokens = self.bytes_rate * THROTTLE_BURST_SECONDS
+            self._files_tokens = self.files_rate * THROTTLE_BURST_SECONDS
+            self._updated = time.monotonic()
+            self.enabled = bool(self.bytes_rate or self.files_rate)
+
+    def describe(self):
+        return {
+            'mb_per_s': self.bytes_rate / (1024 * 1024),
+            'files_per_s': self.files_rate
+        }
+
+    def consume(self, nbytes=0, files=0, stop_event=None):
+        """Списываем байты и файлы; если лимит исчерпан - ждем, пока он накопится"""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            wait = 0
+            # Токены уходят в минус сразу, а пауза отрабатывает долг - потоки не обгоняют друг друга
+            if self.bytes_rate:
+                self._bytes_tokens = min(self.bytes_rate * THROTTLE_BURST_SECONDS,
+                                         self._bytes_tokens + elapsed * self.bytes_rate) - nbytes
+                wait = max(wait, -self._bytes_tokens / self.bytes_rate)
+            if self.files_rate:
+                self._files_tokens = min(self.files_rate * THROTTLE_BURST_SECONDS,
+                                         self._files_tokens + elapsed * self.files_rate) - files
+                wait = max(wait, -self._files_tokens / self.files_rate)
+        if wait > 0:
+            if stop_event is not None:
+                stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+_background_priority = {'nice': False}
+
+
+def set_background_priority(enabled):
+    """Снижаем (или возвращаем) приоритет процесса по процессору и диску.
+
+    В Windows - фоновый режим процесса (ниже приоритет CPU, ввода-вывода и памяти),
+    в других системах - только nice, вернуть который без прав администратора нельзя.
+    Возвращаем True, если приоритет изменен.
+    """
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            # PROCESS_MODE_BACKGROUND_BEGIN / PROCESS_MODE_BACKGROUND_END
+            mode = 0x00100000 if enabled else 0x00200000
+            return bool(kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), mode))
+        except (OSError, AttributeError):
+            return False
+    if not enabled or _background_priority['nice']:
+        return False
+    try:
+        os.nice(BACKGROUND_NICE)
+    except (OSError, AttributeError):
+        return False
+    _background_priority['nice'] = True
+    return True
+
+
+def preallocate_file(fd, size):
+    """Резервируем место под файл целиком: posix_fallocate или установка размера (Windows)"""
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    except OSError:
+        # Файловая система не поддерживает резервирование - пишем как обычно
+        pass
+
+
+class OutputFile:
+    """Распаковываемый файл: запись через буфер потока кусками по buffer_size байт"""
+
+    def __init__(self, backend, path, size):
+        self.backend = backend
+        # Права как у open() и ZipFile.extract: 0o666 с учетом umask, без бита исполнения
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        if backend.preallocate and size >= PREALLOCATE_MIN_SIZE:
+            preallocate_file(self.fd, size)
+        self.buffer = backend.get_buffer()
+        self.view = memoryview(self.buffer)
+        self.used = 0
+
+    def write(self, data):
+        data = memoryview(data)
+        if not self.used and len(data) >= len(self.buffer):
+            # Крупный кусок при пустом буфере пишем напрямую, целым числом буферов
+            whole = len(data) - len(data) % len(self.buffer)
+            self._write_all(data[:whole])
+            data = data[whole:]
+        while data:
+            count = min(len(data), len(self.buffer) - self.used)
+            self.view[self.used:self.used + count] = data[:count]
+            self.used += count
+            data = data[count:]
+            if self.used == len(self.buffer):
+                self._flush()
+
+    def _write_all(self, data):
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def _flush(self):
+        self._write_all(self.view[:self.used])
+        self.used = 0
+
+    def close(self):
+        if self.fd is None:
+            return
+        try:
+            self._flush()
+        finally:
+            os.close(self.fd)
+            self.fd = None
+            self.view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IOBackend:
+    """Запись распакованных файлов: крупный буфер на поток, резервирование места,
+    кэш созданных папок и политика fsync (none / batch / end).
+
+    Параметры по умолчанию берутся из переменных окружения (см. get_io_settings),
+    чтобы их можно было подобрать под диск (HDD или SSD) без пересборки.
+    """
+
+    def __init__(self, buffer_size=None, preallocate=None, fsync_policy=None):
+        settings = get_io_settings()
+        self.buffer_size = buffer_size or settings['buffer_size']
+        self.preallocate = settings['preallocate'] if preallocate is None else preallocate
+        # None - по ситуации: поэтапная установка сбрасывает каждый пакет, обновление на месте - нет
+        self.fsync_policy = fsync_policy or settings['fsync_policy']
+        self._dirs = set()
+        self._local = threading.local()
+
+    def describe(self):
+        return {
+            'buffer_size': self.buffer_size,
+            'preallocate': self.preallocate,
+            'fsync_policy': self.fsync_policy or "auto"
+        }
+
+    def get_buffer(self):
+        """Буфер текущего потока, выделяется один раз"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(self.buffer_size)
+        return buffer
+
+    def makedirs(self, path):
+        """Создаем папку; уже созданные запоминаются, чтобы не обращаться к диску повторно"""
+        if path in self._dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._dirs.add(path)
+
+    def forget_dirs(self):
+        self._dirs.clear()
+
+    def create(self, path, size):
+        """Открываем файл на запись (папка должна существовать)"""
+        return OutputFile(self, path, size)
+
+
+class ExtractionPlan:
+    """План распаковки, который строится один раз по списку элементов архива.
+
+    Для каждого элемента заранее считаются путь распаковки и решение о пропуске,
+    так что в цикле распаковки остается только копирование данных.
+    """
+
+    def __init__(self, install_dir, members, selection=None):
+        self.install_dir = install_dir
+        self.members = []
+        self.skipped = []
+        self.targets = {}
+        root = os.path.normpath(install_dir)
+        prefix = os.path.join(root, '')
+        is_selected = selection.is_selected if selection is not None else \
+            (lambda name: not is_skipped_member(name))
+        for member in members:
+            name = member.filename
+            if not is_selected(name):
+                self.skipped.append(member)
+                continue
+            target = member_target_path(install_dir, name)
+            # Защита от выхода за папку установки; элементы, указывающие на саму папку, не нужны
+            if not os.path.normpath(target).startswith(prefix):
+                self.skipped.append(member)
+                continue
+            self.targets[name] = target
+            self.members.append(member)
+
+    def target(self, member):
+        return self.targets[member.filename]
+
+    def directories(self, members):
+        """Папки, которые нужно создать до распаковки members (родительские раньше вложенных)"""
+        dirs = set()
+        for member in members:
+            target = self.targets[member.filename]
+            dirs.add(target if member.is_dir() else os.path.dirname(target))
+        return sorted(dirs)
+
+
+class ExtractionEngine:
+    """Параллельная распаковка архива: у каждого потока свой ZipFile (или PackFile)"""
+
+    def __init__(self, archive, install_dir, workers=None, progress_callback=None, stop_event=None,
+                 fsync_policy=FSYNC_NONE, journal=None, io_backend=None, plan=None, throttle=None):
+        self.archive = archive
+        self.install_dir = install_dir
+        self.workers = max(1, workers or get_extract_workers())
+        self.progress_callback = progress_callback
+        self.io = io_backend or IOBackend()
+        # Ограничение скорости (фоновый режим); без лимитов проверка ничего не стоит
+        self.throttle = throttle or Throttle()
+        # План распаковки; если не передан - строится по списку элементов в run()
+        self.plan = plan
+        # Когда сбрасывать распакованные файлы на диск (fsync): none, batch или end
+        self.fsync_policy = fsync_policy
+        self._written_paths = []
+        # Журнал, куда записываются полностью распакованные файлы
+        self.journal = journal
+        # Событие остановки: например, проверка архива обнаружила повреждение
+        self.stop_event = stop_event
+        self.errors = []
+
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+        self._done_files = 0
+        self._done_bytes = 0
+        self._total_files = 0
+        self._total_bytes = 0
+        self._failed = set()
+
+    def _get_zip(self):
+        """ZipFile текущего потока, открывается при первом обращении"""
+        zip_ref = getattr(self._local, 'zip_ref', None)
+        if zip_ref is None:
+            stream = self.archive.open()
+            zip_ref = self.archive.reader(stream)
+            self._local.zip_ref = zip_ref
+            with self._lock:
+                self._handles.append((zip_ref, stream))
+        return zip_ref
+
+    def _close_handles(self):
+        """Закрываем все ZipFile рабочих потоков"""
+        for zip_ref, stream in self._handles:
+            try:
+                zip_ref.close()
+                stream.close()
+            except Exception:
+                pass
+        self._handles = []
+
+    def _plan_tasks(self, members):
+        """Крупные файлы - отдельные задачи по убыванию размера, мелкие - пакетами.
+
+        В hac.pak пакет заканчивается только перед файлом, который начинается
+        в новом блоке: каждый поток кэширует один распакованный блок, и блок,
+        разрезанный между пакетами, распаковывался бы в каждом из них. Файл,
+        переходящий через границу блоков, читает начало следующего блока - этот
+        блок распаковывается дважды, но не больше одного лишнего блока на пакет.
+        """
+        large = sorted((m for m in members if m.file_size >= LARGE_FILE_THRESHOLD),
+                       key=lambda m: m.file_size, reverse=True)
+        tasks = [[m] for m in large]
+
+        small = [m for m in members if m.file_size < LARGE_FILE_THRESHOLD]
+        blocks = self._get_zip().blocks if self.archive.is_pack else None
+        if blocks is not None:
+            small.sort(key=lambda m: (m.block, m.offset))
+        batch, batch_bytes = [], 0
+        for member in small:
+            full = len(batch) >= SMALL_BATCH_FILES or batch_bytes >= SMALL_BATCH_BYTES
+            if full and (blocks is None or member.block > batch[-1].block):
+                tasks.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(member)
+            batch_bytes += member.file_size
+        if batch:
+            tasks.append(batch)
+        return tasks
+
+    def _extract_member(self, zip_ref, member):
+        """Потоковая распаковка одного элемента с побайтовым прогрессом (папки созданы заранее)"""
+        if member.is_dir():
+            return 0
+
+        target = self.plan.target(member)
+        unlink_hardlink(target)
+        written = 0
+        with zip_ref.open(member) as src, self.io.create(target, member.file_size) as dst:
+            while True:
+                if self.stopped:
+                    raise ExtractionStopped(member.filename)
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                written += len(chunk)
+                self._add_bytes(len(chunk))
+                self.throttle.consume(len(chunk), stop_event=self.stop_event)
+        # Дата файла как в архиве - по ней работает быстрая проверка установки
+        # и продолжение прерванной установки (дата ставится только целому файлу)
+        timestamp = member_timestamp(member)
+        os.utime(target, (timestamp, timestamp))
+        return written
+
+    def _extract_link(self, zip_ref, member):
+        """Дубликат из hac.pak: клон (copy-on-write) или копия уже распакованного оригинала.
+
+        Не жесткая ссылка: игра может менять свои файлы на месте, и изменился бы второй файл.
+        """
+        source = member_target_path(self.install_dir, member.source)
+        if member.source in self._failed or not os.path.isfile(source):
+            # Оригинал пропущен или не распаковался - данные дубликата есть в архиве
+            return self._extract_member(zip_ref, member)
+
+        target = self.plan.target(member)
+        if os.path.lexists(target):
+            os.remove(target)
+        if not clone_file(source, target):
+            shutil.copyfile(source, target)
+        timestamp = member_timestamp(member)
+        os.utime(target, (timestamp, timestamp))
+        return member.file_size
+
+    def _extract_batch(self, batch):
+        """Распаковка пакета файлов в текущем потоке"""
+        zip_ref = self._get_zip()
+        written_members = []
+        for member in batch:
+            if self.stopped:
+                break
+            written = 0
+            self.throttle.consume(files=1, stop_event=self.stop_event)
+            try:
+                if getattr(member, 'source', None):
+                    written = self._extract_link(zip_ref, member)
+                else:
+                    written = self._extract_member(zip_ref, member)
+                written_members.append(member)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((member.filename, e))
+            self._report(member, written)
+
+        # Сброс на диск всего пакета разом: система успевает записать файлы параллельно
+        written_files = [m for m in written_members if not m.is_dir()]
+        if self.fsync_policy == FSYNC_BATCH:
+            written_files = self._fsync_members(written_files)
+        elif self.fsync_policy == FSYNC_END:
+            with self._lock:
+                self._written_paths.extend(written_files)
+
+        # В журнал попадают только файлы, записанные целиком (CRC32 проверен при чтении из архива)
+        if self.journal is not None and written_files:
+            try:
+                self.journal.record(written_files, sync=self.fsync_policy == FSYNC_BATCH)
+            except OSError:
+                pass
+
+    def _fsync_members(self, members):
+        """fsync файлов, возвращаем успешно сброшенные"""
+        synced = []
+        for member in members:
+            try:
+                fsync_file(member_target_path(self.install_dir, member.filename))
+                synced.append(member)
+            except OSError as e:
+                with self._lock:
+                    self.errors.append((member.filename, e))
+        return synced
+
+    @property
+    def stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _add_bytes(self, count):
+        with self._lock:
+            self._done_bytes += count
+            self._notify()
+
+    def _report(self, member, written):
+        """Файл обработан: досчитываем непрочитанные байты (ошибка или пропуск)"""
+        with self._lock:
+            self._done_files += 1
+            self._done_bytes += max(0, member.file_size - written)
+            self._notify()
+
+    def _notify(self):
+        if self.progress_callback:
+            self.progress_callback(self._done_files, self._total_files,
+                                   self._done_bytes, self._total_bytes)
+
+    def run(self, members):
+        """Распаковываем список ZipInfo, возвращаем число успешно извлеченных файлов"""
+        members = list(members)
+        if self.plan is None:
+            self.plan = ExtractionPlan(self.install_dir, members)
+        members = [m for m in members if m.filename in self.plan.targets]
+        self._total_files = len(members)
+        self._total_bytes = sum(m.file_size for m in members)
+
+        # Все папки создаем заранее в одном потоке; кэш папок - только на эту распаковку
+        self.io.forget_dirs()
+        for path in self.plan.directories(members):
+            try:
+                self.io.makedirs(path)
+            except OSError:
+                # Ошибка достанется файлам этой папки
+                pass
+
+        # Дубликаты распаковываются после всех оригиналов
+        dirs = [m for m in members if m.is_dir()]
+        links = [m for m in members if not m.is_dir() and getattr(m, 'source', None)]
+        files = [m for m in members if not m.is_dir() and not getattr(m, 'source', None)]
+        if dirs:
+            self._extract_batch(dirs)
+
+        try:
+            if self.workers == 1:
+                for batch in self._plan_tasks(files):
+                    self._extract_batch(batch)
+            else:
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    futures = [pool.submit(self._extract_batch, batch)
+                               for batch in self._plan_tasks(files)]
+                    for future in as_completed(futures):
+                        future.result()
+            if links:
+                self._failed = {name for name, error in self.errors}
+                self._extract_batch(links)
+            if self._written_paths:
+                # Политика end: все файлы сбрасываются на диск один раз, после распаковки
+                self._fsync_members(self._written_paths)
+                self._written_paths = []
+        finally:
+            self._close_handles()
+
+        return self._total_files - len(self.errors)
+
+
+class DeletionEngine:
+    """Параллельное удаление дерева файлов: один обход os.scandir, повтор только для заблокированных"""
+
+    def __init__(self, root_dir, workers=None, progress_callback=None, retry_callback=None, throttle=None):
+        self.root_dir = root_dir
+        self.workers = max(1, workers or get_extract_workers())
+        self.progress_callback = progress_callback
+        self.retry_callback = retry_callback
+        # Удаление ограничивается только по числу файлов: объем данных при удалении не пишется
+        self.throttle = throttle or Throttle()
+        self.failed = []
+
+        self._lock = threading.Lock()
+        self._done_files = 0
+        self._done_bytes = 0
+        self._total_files = 0
+        self._total_bytes = 0
+
+    def scan(self):
+        """Файлы с размерами и папки в порядке обхода (родитель раньше детей)"""
+        files, dirs = [], [self.root_dir]
+        stack = [self.root_dir]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                        stack.append(entry.path)
+                    else:
+                        try:
+                            size = entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            size = 0
+                        files.append((entry.path, size))
+        return files, dirs
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Файлы "только для чтения" Windows не дает удалить - снимаем атрибут
+            os.chmod(path, stat.S_IWRITE)
+            os.remove(path)
+
+    def _delete_batch(self, batch):
+        """Удаляем пакет файлов, возвращаем не удаленные (path, size, ошибка)"""
+        failed = []
+        for path, size in batch:
+            self.throttle.consume(files=1)
+            try:
+                self._unlink(path)
+            except OSError as e:
+                failed.append((path, size, e))
+                continue
+            with self._lock:
+                self._done_files += 1
+                self._done_bytes += size
+                if self.progress_callback:
+                    self.progress_callback(self._done_files, self._total_files,
+                                           self._done_bytes, self._total_bytes)
+        return failed
+
+    def _delete_files(self, files):
+        if self.workers == 1 or len(files) <= DELETE_BATCH_FILES:
+            return self._delete_batch(files)
+        batches = [files[i:i + DELETE_BATCH_FILES] for i in range(0, len(files), DELETE_BATCH_FILES)]
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for result in pool.map(self._delete_batch, batches):
+                failed.extend(result)
+        return failed
+
+    @staticmethod
+    def _depth(path):
+        return os.path.normpath(path).count(os.sep)
+
+    def _delete_dirs(self, dirs):
+        """Удаляем папки снизу вверх (сначала самые глубокие), возвращаем не удаленные"""
+        failed = []
+        for path in sorted(dirs, key=self._depth, reverse=True):
+            try:
+                os.rmdir(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failed.append((path, 0, e))
+        return failed
+
+    def run(self, files=None, dirs=None):
+        """Удаляем все дерево; self.failed - то, что не удалось удалить за все попытки"""
+        if files is None:
+            files, dirs = self.scan()
+        self._total_files = len(files)
+        self._total_bytes = sum(size for path, size in files)
+
+        pending_files = files
+        pending_dirs = dirs
+        for attempt in range(UNINSTALL_ATTEMPTS):
+            failed_files = self._delete_files(pending_files)
+            failed_dirs = self._delete_dirs(pending_dirs)
+            self.failed = failed_files + failed_dirs
+            if not self.failed:
+                break
+            if attempt < UNINSTALL_ATTEMPTS - 1:
+                # Повторяем только заблокированные файлы, а не весь обход с начала
+                if self.retry_callback:
+                    self.retry_callback(attempt + 1, len(failed_files))
+                time.sleep(UNINSTALL_RETRY_DELAY * 2 ** attempt)
+                pending_files = [(path, size) for path, size, error in failed_files]
+                pending_dirs = [path for path, size, error in failed_dirs]
+        return self.failed
+
+
+class InstallError(Exception):
+    """Ошибка установки или удаления с сообщением для пользователя"""
+
+
+class ArchiveIntegrityError(InstallError):
+    """Архив с игрой поврежден или обрезан"""
+
+
+class ExtractionStopped(Exception):
+    """Распаковка остановлена по событию stop_event"""
+
+
+class InstallResult:
+    """Итог установки: папка, исполняемый файл и пропущенные файлы"""
+
+    def __init__(self, install_dir, game_exe, extracted, removed, errors, linked=0):
+        self.install_dir = install_dir
+        self.game_exe = game_exe
+        self.extracted = extracted
+        self.removed = removed
+        self.errors = errors
+        # Файлы, взятые из общего хранилища (от других версий) без распаковки
+        self.linked = linked
+
+
+def log_error(error_message, exception=None):
+    """Запись ошибок в журнал (hac_log), возвращаем путь к файлу журнала"""
+    return log_exception(error_message, exception)
+
+
+def load_registry():
+    """Реестр установленных версий; путь из старого installation_info.txt переносится в него"""
+    registry = VersionRegistry.load()
+    if os.path.exists(INSTALL_INFO_FILE):
+        with open(INSTALL_INFO_FILE, 'r', encoding='utf-8') as f:
+            path = f.read().strip()
+        if path and registry.find(path) is None:
+            registry.add(path, fingerprint=InstallManifest.read_meta(path, 'archive_fingerprint'))
+            registry.save()
+        os.remove(INSTALL_INFO_FILE)
+    return registry
+
+
+def read_installation_info():
+    """Путь текущей версии игры или None"""
+    return load_registry().active
+
+
+def write_installation_info(path):
+    """Записываем версию в реестр (или обновляем) и делаем ее текущей"""
+    registry = load_registry()
+    registry.add(path, fingerprint=InstallManifest.read_meta(path, 'archive_fingerprint'))
+    registry.save()
+
+
+def clear_installation_info(path=None):
+    """Убираем версию из реестра (по умолчанию - текущую); возвращаем путь новой текущей"""
+    registry = load_registry()
+    if path is None:
+        path = registry.active
+    if path:
+        registry.remove(path)
+        registry.save()
+    return registry.active
+
+
+def set_active_version(path):
+    """Делаем текущей одну из установленных версий"""
+    registry = load_registry()
+    try:
+        registry.set_active(path)
+    except KeyError:
+        raise InstallError(f"Версия не установлена: {path}")
+    registry.save()
+
+
+class InstallationState:
+    """Состояние установки для интерфейса: диск опрашивается при загрузке,
+    по явным событиям и фоновым потоком, а не при каждом обращении.
+
+    version растет при каждом изменении - интерфейс перерисовывается только тогда.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.version = 0
+        self.path = None
+        self.installed = False
+        self.pending = None
+        # Пути всех установленных версий (path - текущая из них)
+        self.versions = ()
+
+    def refresh(self):
+        """Перечитываем состояние с диска; True - если оно изменилось"""
+        registry = load_registry()
+        path = registry.active
+        installed = bool(path) and os.path.isdir(path)
+        pending = None if path else read_pending_install()
+        return self._set(path, installed, pending, tuple(registry.paths()))
+
+    def set_installed(self, path):
+        """Игра установлена в path (после установки или обновления, без опроса диска)"""
+        return self._set(path, True, None, tuple(load_registry().paths()))
+
+    def set_uninstalled(self):
+        return self._set(None, False, None, ())
+
+    def _set(self, path, installed, pending, versions):
+        with self._lock:
+            if (self.path, self.installed, self.pending, self.versions) == (path, installed, pending, versions):
+                return False
+            self.path, self.installed, self.pending, self.versions = path, installed, pending, versions
+            self.version += 1
+            return True
+
+    def start_watcher(self, interval=STATE_REFRESH_INTERVAL):
+        """Фоновая проверка: замечает удаление папки игры или установку другим экземпляром"""
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except OSError:
+                    pass
+
+        self._watcher = threading.Thread(target=watch, name="hac-state", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+
+def is_skipped_member(name):
+    """Пропускаем проблемные папки если нужно (встроенные правила исключения)"""
+    return DEFAULT_RULES.matches(name)
+
+
+def read_components(archive):
+    """Компоненты игры в архиве и их размеры: (ComponentCatalog, {id: байт})"""
+    with archive.open_zip() as zip_ref:
+        catalog = ComponentCatalog.from_archive(zip_ref)
+        return catalog, catalog.sizes(zip_ref.infolist())
+
+
+def score_game_exe(name, size):
+    """Оценка кандидата в исполняемые файлы игры: корень папки, известное имя, размер"""
+    base = name.rsplit("/", 1)[-1].lower()
+    score = -10 * name.count("/")
+    known = [exe.lower() for exe in GAME_EXE_NAMES]
+    if base in known:
+        score += 100 + len(known) - known.index(base)
+    if any(word in base for word in EXE_SKIP_WORDS):
+        score -= 200
+    return score + min(size, EXE_SIZE_CAP) / EXE_SIZE_CAP * 20
+
+
+def pick_game_exe(candidates):
+    """Исполняемый файл игры из пар (имя в архиве, размер); при равенстве - по имени"""
+    exes = [(name, size) for name, size in candidates if name.lower().endswith('.exe')]
+    if not exes:
+        return None
+    return min(exes, key=lambda exe: (-score_game_exe(*exe), exe[0]))[0]
+
+
+def find_game_exe(install_dir):
+    """Поиск исполняемого файла игры"""
+    # Файл, выбранный по оглавлению архива при установке, - без обхода диска
+    name = InstallManifest.read_meta(install_dir, 'game_exe')
+    if name:
+        exe_path = member_target_path(install_dir, name)
+        if os.path.isfile(exe_path):
+            return exe_path
+
+    # Установка без записи в манифесте: оцениваем все .exe в папке
+    candidates = []
+    for root, dirs, files in os.walk(install_dir):
+        for file in files:
+            if file.lower().endswith('.exe'):
+                path = os.path.join(root, file)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                candidates.append((os.path.relpath(path, install_dir).replace(os.sep, "/"), size))
+    name = pick_game_exe(candidates)
+    return member_target_path(install_dir, name) if name else None
+
+
+def install_game(install_dir, progress=None, workers=None, force=(), archive=None, io_backend=None,
+                 selection=None, throttle=None):
+    """Установка игры из архива рядом с лаунчером (hac.pak).
+
+    Прогресс публикуется в ProgressChannel (0-85%), ошибки, после которых
+    продолжать нельзя, поднимаются как InstallError. Ярлык и запись
+    в реестр версий остаются за вызывающим кодом. selection - выбор
+    компонентов и шаблонов (InstallSelection); по умолчанию - сохраненный
+    в манифесте прошлой установки. throttle - ограничение скорости (Throttle).
+    Файлы, которые уже есть в общем хранилище (hac_store), не распаковываются.
+    """
+    progress = progress or ProgressChannel()
+    progress.publish(5, "Подготовка к установке...", "Начало установки")
+
+    if not install_dir or install_dir.isspace():
+        raise InstallError("Неверный путь установки!")
+
+    progress.publish(10, "Открытие архива с игрой...", "Открытие архива")
+
+    started = time.perf_counter()
+    with span("open_archive") as phase:
+        # Открываем архив на месте, без копирования во временную папку
+        archive = archive or find_embedded_archive()
+        if not archive:
+            raise InstallError("Не найден архив с игрой (hac.pak рядом с лаунчером)!")
+
+        # Обрезанный архив отсекаем до того, как трогать папку установки
+        archive.check_size()
+        phase.set(archive=os.path.basename(archive.path), bytes=archive.size)
+
+    # SHA-256 архива сверяется по данным, которые читает сама установка, - с первого же чтения
+    verifier = archive.start_verifier()
+    stop_event = verifier.failed if verifier else None
+
+    progress.publish(20, "Проверка существующей установки...", "Проверка")
+
+    try:
+        recover_interrupted_install(install_dir, workers)
+    except OSError as e:
+        raise InstallError(f"Не удалось восстановить прерванную установку: {str(e)}")
+
+    # Если есть манифест - обновляем установку выборочно на месте. Иначе новая
+    # версия распаковывается в промежуточную папку, а старая остается рабочей
+    # до мгновенной замены переименованием
+    manifest = InstallManifest.load(install_dir) if os.path.exists(install_dir) else None
+    staged = manifest is None
+    target_dir = staging_path(install_dir) if staged else install_dir
+    if selection is None:
+        selection = (manifest.selection if manifest is not None else None) or InstallSelection()
+
+    # Журнал прошлой, прерванной установки в эту же папку
+    journal = InstallJournal(target_dir)
+    journaled = journal.load()
+
+    progress.publish(25, "Проверка свободного места...", "Проверка")
+
+    # План распаковки и проверка места - только по оглавлению архива, до любых изменений на диске
+    try:
+        with span("plan") as phase, archive.open_zip() as zip_ref:
+            # Пути, пропуски и проверки путей считаются один раз для всего архива
+            selection.bind(ComponentCatalog.from_archive(zip_ref))
+            plan = ExtractionPlan(target_dir, zip_ref.infolist(), selection)
+            members = plan.members
+            fingerprint = archive.fingerprint(zip_ref)
+            phase.set(members=len(members), skipped=len(plan.skipped))
+    except InstallError:
+        raise
+    except Exception as e:
+        raise InstallError(f"Ошибка чтения архива: {str(e)}")
+
+    # Исполняемый файл выбирается по оглавлению архива, до распаковки, и записывается в манифест
+    game_exe_name = pick_game_exe((m.filename, m.file_size) for m in members if not m.is_dir())
+
+    installed = members
+    orphans = []
+    if manifest is not None:
+        # Дифференциальная переустановка: только новые и измененные файлы
+        members, orphans = plan_differential(install_dir, installed, manifest, force)
+
+    staged_manifest = InstallManifest.load(target_dir) if staged else None
+    if staged_manifest is not None and staged_manifest.fingerprint == fingerprint:
+        # Промежуточная папка уже полностью готова - осталось ее переместить
+        members = []
+    elif journaled:
+        # Прерванная установка: продолжаем с места остановки по журналу
+        members = plan_resume(target_dir, members, journaled)
+
+    # Файлы, которые уже есть в хранилище от других версий, клонируются из него, а не распаковываются
+    store = open_store(install_dir)
+    linked = []
+    if store is not None and members:
+        with span("store_lookup") as phase:
+            storable = [m for m in members if is_store_member(m) and store_key(m)]
+            available = store.available(store_key(m) for m in storable)
+            linked = [m for m in storable if store_key(m) in available]
+            linked_names = {m.filename for m in linked}
+            members = [m for m in members if m.filename not in linked_names]
+            phase.set(linked=len(linked), extract=len(members))
+
+    # Поэтапная установка занимает место целиком (старая версия удаляется только после замены),
+    # обновление на месте - только разницу между новыми и заменяемыми или удаляемыми файлами
+    with span("preflight") as phase:
+        cluster = cluster_size(target_dir)
+        needed = space_needed(target_dir, members, in_place=not staged, cluster=cluster)
+        needed -= sum(on_disk_size(manifest.get(name)[0], cluster) for name in orphans)
+        phase.set(needed=needed, cluster=cluster)
+        check_disk_space(target_dir, max(0, needed))
+
+    try:
+        os.makedirs(target_dir, exist_ok=True)
+        write_pending_install(install_dir)
+    except Exception as e:
+        raise InstallError(f"Не удалось создать папку: {str(e)}")
+
+    if linked:
+        progress.publish(28, f"Файлы из других версий: {len(linked)}...", "Распаковка")
+        with span("link", files=len(linked)) as phase:
+            linked, unlinked = link_from_store(store, plan, linked, journal, workers)
+            phase.set(failed=len(unlinked))
+        # Не полученные (файл хранилища удален вручную или поврежден) распакуем
+        members = members + unlinked
+
+    if verifier and not members:
+        # Распаковывать нечего - и проверять тоже
+        verifier.close()
+        verifier = stop_event = None
+
+    progress.publish(30, "Распаковка файлов игры...", "Распаковка")
+
+    # Распаковка архива
+    try:
+        removed = remove_orphans(install_dir, orphans) if orphans else 0
+        if manifest is not None:
+            progress.publish(30, f"Обновление: {len(members) + len(linked)} файлов изменено, {removed} удалено",
+                             "Распаковка")
+        elif journaled:
+            progress.publish(30, f"Продолжение установки: осталось {len(members)} из {len(installed)} файлов",
+                             "Распаковка")
+
+        def on_progress(done_files, total_files, done_bytes, total_bytes):
+            # Прогресс считается по байтам, а не по числу файлов
+            if total_bytes:
+                value = 30 + (done_bytes / total_bytes) * 50
+            else:
+                value = 30 + (done_files / total_files) * 50
+            progress.update_transfer(done_bytes)
+            progress.publish(value,
+                             f"Распаковка: {done_files}/{total_files} файлов, "
+                             f"{format_size(done_bytes)} из {format_size(total_bytes)}",
+                             "Распаковка")
+
+        # Поэтапная установка по умолчанию сбрасывает каждый пакет на диск до подмены папки
+        io_backend = io_backend or IOBackend()
+        fsync_policy = io_backend.fsync_policy or (FSYNC_BATCH if staged else FSYNC_NONE)
+
+        # Распаковываем файлы параллельно с обработкой ошибок
+        engine = ExtractionEngine(archive, target_dir, workers=workers,
+                                  progress_callback=on_progress, stop_event=stop_event,
+                                  fsync_policy=fsync_policy, journal=journal, io_backend=io_backend,
+                                  plan=plan, throttle=throttle)
+        total_bytes = sum(m.file_size for m in members)
+        progress.begin_transfer(total_bytes)
+        try:
+            with span("extract", files=len(members), bytes=total_bytes, workers=engine.workers,
+                      staged=staged, io=io_backend.describe(), throttle=engine.throttle.describe()) as phase:
+                extracted = engine.run(members)
+                phase.set(errors=len(engine.errors))
+        finally:
+            progress.end_transfer()
+            journal.close()
+
+        # Манифест пишется только после проверки прочитанных данных архива
+        if verifier:
+            progress.publish(80, "Проверка целостности архива...", "Проверка архива")
+            with span("verify_archive"):
+                verifier.wait()
+
+        # Файлы с ошибками не попадают в манифест - следующий запуск их распакует заново
+        failed = {file for file, error in engine.errors}
+        new_manifest = InstallManifest.from_members([m for m in installed if m.filename not in failed],
+                                                    fingerprint, selection, game_exe_name)
+        new_manifest.save(target_dir)
+        # Манифест записан - журнал больше не нужен
+        journal.remove()
+
+    except Exception as e:
+        if verifier:
+            verifier.close()
+        # Ошибка чтения поврежденного архива - сообщаем о повреждении, если проверка его нашла
+        if isinstance(e, ArchiveIntegrityError) or (verifier and verifier.error):
+            discard_failed_install(install_dir, target_dir, staged, workers)
+            if isinstance(e, ArchiveIntegrityError):
+                raise
+            verifier.check()
+        raise InstallError(f"Ошибка при распаковке: {str(e)}")
+
+    if staged:
+        progress.publish(82, "Замена файлов игры...", "Замена")
+        with span("swap"):
+            swap_into_place(target_dir, install_dir, workers)
+
+    # Распакованные файлы - в общее хранилище: следующая версия возьмет их оттуда
+    update_store(store, install_dir, new_manifest, [m for m in members if m.filename not in failed], linked)
+
+    progress.publish(85, "Поиск исполняемого файла...", "Поиск EXE")
+
+    clear_pending_install()
+
+    # Поиск exe-файла игры
+    with span("exe_lookup"):
+        game_exe = find_game_exe(install_dir)
+    if not game_exe:
+        raise InstallError("Не найден исполняемый файл игры!")
+
+    for file, error in engine.errors:
+        log_event("warning", "skipped_file", file=file, error=str(error))
+    log_event("info", "install", install_dir=install_dir, seconds=round(time.perf_counter() - started, 4),
+              extracted=extracted, linked=len(linked), removed=removed, errors=len(engine.errors))
+    return InstallResult(install_dir, game_exe, extracted, removed, engine.errors, len(linked))
+
+
+def uninstall_game(install_dir, progress=None, workers=None, throttle=None):
+    """Удаление папки с игрой (прогресс 5-70%); ярлык и реестр версий - за вызывающим кодом.
+
+    Файлы общего хранилища, которые не нужны другим версиям, удаляются вместе с папкой.
+    """
+    progress = progress or ProgressChannel()
+    progress.publish(5, "Подготовка к удалению...", "Начало удаления")
+
+    if not install_dir or not os.path.exists(install_dir):
+        raise InstallError("Не найдена установленная игра!")
+
+    progress.publish(20, "Удаление файлов игры...", "Удаление файлов")
+
+    def on_progress(done_files, total_files, done_bytes, total_bytes):
+        if total_bytes:
+            value = 20 + (done_bytes / total_bytes) * 50
+        else:
+            value = 20 + (done_files / total_files) * 50
+        progress.update_transfer(done_bytes)
+        progress.publish(value,
+                         f"Удаление: {done_files}/{total_files} файлов, "
+                         f"{format_size(done_bytes)} из {format_size(total_bytes)}",
+                         "Удаление файлов")
+
+    def on_retry(attempt, locked):
+        progress.publish(20, f"Повторная попытка удаления ({attempt}/{UNINSTALL_ATTEMPTS - 1}): "
+                             f"заблокировано файлов - {locked}...", "Удаление файлов")
+
+    # Удаление файлов параллельно, заблокированные файлы - с повторными попытками
+    engine = DeletionEngine(install_dir, workers=workers, progress_callback=on_progress,
+                            retry_callback=on_retry, throttle=throttle)
+    files, dirs = engine.scan()
+    total_bytes = sum(size for path, size in files)
+    progress.begin_transfer(total_bytes)
+    try:
+        with span("delete", files=len(files), bytes=total_bytes) as phase:
+            failed = engine.run(files, dirs)
+            phase.set(failed=len(failed))
+    finally:
+        progress.end_transfer()
+    if failed:
+        path, size, error = failed[0]
+        raise InstallError(f"Не удалось удалить файлов и папок: {len(failed)}\n"
+                           f"Например: {path}: {str(error)}\n"
+                           "Возможно, файлы используются другим процессом.")
+
+    # Остатки прерванной поэтапной установки
+    for leftover in (staging_path(install_dir), backup_path(install_dir)):
+        if os.path.exists(leftover):
+            DeletionEngine(leftover, workers=workers).run()
+
+    with span("store_release"):
+        release_from_store(install_dir)
+
+    progress.publish(70, "Удаление ярлыка...", "Удаление ярлыка")
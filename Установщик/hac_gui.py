@@ -0,0 +1,879 @@
+import os
+import queue
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+import webbrowser
+import threading
+from datetime import datetime
+
+import hac_core
+import hac_patch
+import hac_store
+from hac_log import span
+from hac_rules import InstallSelection
+from hac_core import (InstallError, InstallManifest, InstallationState, ProgressChannel, Throttle,
+                      format_size, format_eta, get_extract_workers, install_game, uninstall_game,
+                      verify_installation)
+
+# Период перерисовки прогресса в интерфейсе (мс)
+PROGRESS_FRAME_MS = 50
+
+
+class ModernGameLauncher:
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Sikorsky's Incorporated - HAC Game Manager")
+        self.root.geometry("600x550")
+        self.root.resizable(False, False)
+        
+        # Создаем папку для логов
+        self.log_dir = hac_core.LOG_DIR
+        os.makedirs(self.log_dir, exist_ok=True)
+        
+        # Число потоков распаковки
+        self.extract_workers = get_extract_workers()
+        
+        # Ограничение скорости установки и удаления; меняется флажком "Фоновый режим" в любой момент
+        self.throttle = Throttle()
+        
+        # Центрирование окна
+        self.center_window()
+        
+        # Цветовая схема
+        self.colors = {
+            "primary": "#2C3E50",
+            "secondary": "#3498DB",
+            "accent": "#E74C3C",
+            "success": "#27AE60",
+            "warning": "#F39C12",
+            "background": "#ECF0F1",
+            "text": "#2C3E50"
+        }
+        
+        # Настройка фона
+        self.root.configure(bg=self.colors['background'])
+        
+        # Проверяем, установлена ли игра (и есть ли прерванная установка) - один раз при запуске,
+        # дальше интерфейс читает закэшированное состояние
+        self.state = InstallationState()
+        self.get_installation_info()
+        self.state_version = self.state.version
+        
+        # Создание интерфейса
+        self.create_widgets()
+        
+        # Прогресс публикуется рабочими потоками, интерфейс перерисовывается по таймеру
+        self.progress = ProgressChannel()
+        self.progress_version = 0
+        # Сообщения и состояние кнопок от рабочих потоков: Tk трогается только из потока интерфейса
+        self.ui_calls = queue.Queue()
+        self.poll_progress()
+        
+        # Изменения на диске (папку игры удалили вручную и т.п.) замечает фоновая проверка
+        self.state.start_watcher()
+        
+        # Если рядом с лаунчером есть обновление для установленной игры - предлагаем его
+        if self.installation_path:
+            self.root.after(500, self.offer_update)
+        
+    def center_window(self):
+        self.root.update_idletasks()
+        width = self.root.winfo_width()
+        height = self.root.winfo_height()
+        x = (self.root.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.root.winfo_screenheight() // 2) - (height // 2)
+        self.root.geometry(f'{width}x{height}+{x}+{y}')
+        
+    @property
+    def installation_path(self):
+        return self.state.path
+        
+    @property
+    def pending_install(self):
+        return self.state.pending
+        
+    def get_installation_info(self):
+        """Получаем информацию об установленной игре"""
+        try:
+            self.state.refresh()
+        except Exception as e:
+            self.log_error("Ошибка чтения информации об установке", e)
+        return self.state.path
+        
+    def save_installation_info(self, path):
+        """Сохраняем информацию об установленной игре"""
+        try:
+            hac_core.write_installation_info(path)
+            self.state.set_installed(path)
+        except Exception as e:
+            self.log_error("Ошибка сохранения информации об установке", e)
+            
+    def clear_installation_info(self):
+        """Удаляем версию из реестра; текущей становится другая установленная версия, если она есть"""
+        try:
+            hac_core.clear_installation_info(self.installation_path)
+            self.state.refresh()
+        except Exception as e:
+            self.log_error("Ошибка удаления информации об установке", e)
+        
+    def log_error(self, error_message, exception=None):
+        """Запись ошибок в лог-файл"""
+        try:
+            return hac_core.log_error(error_message, exception)
+        except Exception as e:
+            self.run_in_ui(messagebox.showerror, "Критическая ошибка", f"Не удалось записать лог: {str(e)}")
+            return None
+
+    def run_in_ui(self, func, *args):
+        """Вызов в потоке интерфейса (из любого потока): выполнится в ближайшем кадре poll_progress"""
+        self.ui_calls.put((func, args))
+        
+    def create_widgets(self):
+        # Основной фрейм
+        main_frame = tk.Frame(self.root, bg=self.colors['background'], padx=20, pady=20)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Заголовок с логотипом
+        header_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        header_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        # Логотип компании
+        logo_label = tk.Label(header_frame, 
+                              text="Sikorsky's Incorporated",
+                              font=('Arial', 18, 'bold'),
+                              fg=self.colors['primary'],
+                              bg=self.colors['background'])
+        logo_label.pack(pady=(0, 5))
+        
+        subtitle_label = tk.Label(header_frame,
+                                  text="HAC Game Manager",
+                                  font=('Arial', 10),
+                                  fg=self.colors['text'],
+                                  bg=self.colors['background'])
+        subtitle_label.pack()
+        
+        # Статус установки
+        status_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        status_frame.pack(fill=tk.X, pady=10)
+        
+        # Текст и цвет задает render_state
+        self.status_label = tk.Label(status_frame,
+                                    font=('Arial', 10, 'bold'),
+                                    bg=self.colors['background'])
+        self.status_label.pack(anchor=tk.W)
+        
+        # Информация о версии
+        version_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        version_frame.pack(fill=tk.X, pady=5)
+        
+        version_label = tk.Label(version_frame,
+                                text="Версия: 1.0 | Файлы игры - в архиве hac.pak рядом с лаунчером",
+                                font=('Arial', 9),
+                                fg='green',
+                                bg=self.colors['background'])
+        version_label.pack(anchor=tk.W)
+        
+        # Выбор текущей версии - показывается, когда рядом установлено несколько версий
+        self.versions_frame = tk.Frame(version_frame, bg=self.colors['background'])
+        tk.Label(self.versions_frame,
+                 text="Текущая версия:",
+                 font=('Arial', 9),
+                 fg=self.colors['text'],
+                 bg=self.colors['background']).pack(side=tk.LEFT)
+        self.version_var = tk.StringVar()
+        self.version_combo = ttk.Combobox(self.versions_frame,
+                                          textvariable=self.version_var,
+                                          state='readonly',
+                                          font=('Arial', 9),
+                                          width=55)
+        self.version_combo.pack(side=tk.LEFT, padx=(5, 0))
+        self.version_combo.bind("<<ComboboxSelected>>", self.select_version)
+        
+        # Фрейм пути установки
+        path_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        path_frame.pack(fill=tk.X, pady=10)
+        
+        path_label = tk.Label(path_frame, 
+                             text="Путь установки:", 
+                             font=('Arial', 11, 'bold'),
+                             fg=self.colors['text'],
+                             bg=self.colors['background'])
+        path_label.pack(anchor=tk.W)
+        
+        path_input_frame = tk.Frame(path_frame, bg=self.colors['background'])
+        path_input_frame.pack(fill=tk.X, pady=5)
+        
+        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+        self.install_path = tk.StringVar(value=self.pending_install or self.installation_path or
+                                         os.path.join(desktop_path, "HAC Game"))
+        
+        self.path_entry = tk.Entry(path_input_frame, 
+                                  textvariable=self.install_path, 
+                                  font=('Arial', 10),
+                                  width=50)
+        self.path_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        
+        self.browse_btn = tk.Button(path_input_frame, 
+                                   text="Обзор", 
+                                   command=self.select_path,
+                                   font=('Arial', 10, 'bold'),
+                                   bg=self.colors['primary'],
+                                   fg='white',
+                                   relief=tk.FLAT,
+                                   padx=15)
+        self.browse_btn.pack(side=tk.RIGHT)
+        
+        # Фрейм кнопок
+        button_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        button_frame.pack(fill=tk.X, pady=20)
+        
+        # Кнопка установки или удаления - в зависимости от статуса установки (см. render_state)
+        self.install_btn = tk.Button(button_frame, 
+                                    font=('Arial', 10, 'bold'),
+                                    fg='white',
+                                    relief=tk.FLAT,
+                                    padx=20,
+                                    pady=10)
+        self.install_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.verify_btn = tk.Button(button_frame, 
+                                   text="Проверить файлы", 
+                                   command=self.start_verification,
+                                   font=('Arial', 10, 'bold'),
+                                   bg=self.colors['secondary'],
+                                   fg='white',
+                                   relief=tk.FLAT,
+                                   padx=20,
+                                   pady=10)
+        self.verify_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.cancel_btn = tk.Button(button_frame, 
+                                   text="Выход", 
+                                   command=self.root.quit,
+                                   font=('Arial', 10, 'bold'),
+                                   bg=self.colors['primary'],
+                                   fg='white',
+                                   relief=tk.FLAT,
+                                   padx=20,
+                                   pady=10)
+        self.cancel_btn.pack(side=tk.LEFT)
+        
+        # Фоновый режим: ограничение скорости и пониженный приоритет
+        self.background_mode = tk.BooleanVar(value=self.throttle.enabled or
+                                             hac_core.get_throttle_settings()['low_priority'])
+        background_check = tk.Checkbutton(main_frame,
+                                          text="Фоновый режим (меньше нагрузка на диск и процессор)",
+                                          variable=self.background_mode,
+                                          command=self.toggle_background_mode,
+                                          font=('Arial', 9),
+                                          fg=self.colors['text'],
+                                          bg=self.colors['background'])
+        background_check.pack(anchor=tk.W)
+        if self.background_mode.get():
+            self.toggle_background_mode()
+        
+        # Прогресс-бар
+        self.progress_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        self.progress_frame.pack(fill=tk.X, pady=10)
+        
+        self.progress_label = tk.Label(self.progress_frame, 
+                                      text="Готов к работе", 
+                                      font=('Arial', 10),
+                                      fg=self.colors['text'],
+                                      bg=self.colors['background'])
+        self.progress_label.pack(anchor=tk.W)
+        
+        # Создаем кастомный прогресс-бар с использованием Canvas
+        self.progress_canvas = tk.Canvas(self.progress_frame, 
+                                        height=25, 
+                                        bg='white',
+                                        highlightthickness=1,
+                                        highlightbackground=self.colors['secondary'])
+        self.progress_canvas.pack(fill=tk.X, pady=5)
+        
+        self.progress_bar = self.progress_canvas.create_rectangle(0, 0, 0, 25, 
+                                                                fill=self.colors['secondary'],
+                                                                outline='')
+        
+        self.progress_text = self.progress_canvas.create_text(300, 12.5, 
+                                                             text="0%",
+                                                             font=('Arial', 10, 'bold'),
+                                                             fill='white')
+        
+        # Статус операции
+        self.operation_label = tk.Label(self.progress_frame, 
+                                       text="", 
+                                       font=('Arial', 9),
+                                       fg=self.colors['text'],
+                                       bg=self.colors['background'])
+        self.operation_label.pack(anchor=tk.W)
+        
+        # Ссылка на поддержку
+        support_frame = tk.Frame(main_frame, bg=self.colors['background'])
+        support_frame.pack(fill=tk.X, pady=(30, 0))
+        
+        support_label = tk.Label(support_frame, 
+                                text="Техническая поддержка: ", 
+                                font=('Arial', 9),
+                                fg=self.colors['text'],
+                                bg=self.colors['background'])
+        support_label.pack(side=tk.LEFT)
+        
+        # Кликабельная ссылка
+        self.support_link = tk.Label(support_frame, 
+                                    text="https://sikorsky-support-center.netlify.app/",
+                                    font=('Arial', 9, 'underline'), 
+                                    fg='blue', 
+                                    bg=self.colors['background'],
+                                    cursor='hand2')
+        self.support_link.pack(side=tk.LEFT)
+        self.support_link.bind("<Button-1>", self.open_support_site)
+        
+        # Информация о компании
+        footer_label = tk.Label(main_frame, 
+                                text="© 2024-2025 Sikorsky's Incorporated. Все права защищены.",
+                                font=('Arial', 8),
+                                fg='gray',
+                                bg=self.colors['background'])
+        footer_label.pack(side=tk.BOTTOM, pady=(20, 0))
+        
+        # Назначаем обработчики событий для кнопок
+        self.render_state()
+        self.setup_button_hover()
+
+    def render_state(self):
+        """Статус и кнопка установки/удаления по закэшированному состоянию"""
+        self.rendered_path = self.install_path.get()
+        self.render_versions()
+        # Папка в поле пути - текущая версия: кнопка ее удаляет; другая папка - установка рядом
+        self.uninstall_mode = self.state.installed and self.rendered_path.strip() != "" and \
+            hac_store.version_id(self.rendered_path) == hac_store.version_id(self.state.path)
+        if self.state.installed:
+            self.status_label.config(text=f"✓ Игра установлена: {self.state.path}", fg=self.colors['success'])
+            if self.uninstall_mode:
+                self.install_btn.config(text="Удалить игру", command=self.start_uninstallation,
+                                        bg=self.colors['warning'])
+            else:
+                self.install_btn.config(text="Установить версию", command=self.start_installation,
+                                        bg=self.colors['accent'])
+        else:
+            if self.state.pending:
+                self.status_label.config(text="◐ Установка прервана - нажмите «Установить игру», чтобы продолжить",
+                                         fg=self.colors['warning'])
+            else:
+                self.status_label.config(text="○ Игра не установлена", fg=self.colors['text'])
+            # Если игра не установлена - показываем кнопку установки
+            self.install_btn.config(text="Установить игру", command=self.start_installation,
+                                    bg=self.colors['accent'])
+
+    def render_versions(self):
+        """Список установленных версий; при одной версии выбирать нечего - список скрыт"""
+        if len(self.state.versions) > 1:
+            self.version_combo.config(values=list(self.state.versions))
+            self.version_var.set(self.state.path or "")
+            self.versions_frame.pack(anchor=tk.W, pady=(5, 0))
+        else:
+            self.versions_frame.pack_forget()
+
+    def select_version(self, event=None):
+        """Делаем текущей выбранную версию; ярлык на рабочем столе переключается на нее"""
+        path = self.version_var.get()
+        try:
+            hac_core.set_active_version(path)
+            self.state.refresh()
+            self.install_path.set(path)
+            game_exe = hac_core.find_game_exe(path)
+        except Exception as e:
+            self.log_error("Ошибка выбора версии", e)
+            messagebox.showerror("Ошибка", f"Не удалось выбрать версию: {str(e)}")
+            return
+        if game_exe:
+            self.create_shortcut(path, game_exe)
+
+    def setup_button_hover(self):
+        # Обработчики hover эффектов для кнопок
+        def on_enter_install(e):
+            if self.uninstall_mode:
+                self.install_btn.config(bg='#E67E22')
+            else:
+                self.install_btn.config(bg='#C0392B')
+        
+        def on_leave_install(e):
+            if self.uninstall_mode:
+                self.install_btn.config(bg=self.colors['warning'])
+            else:
+                self.install_btn.config(bg=self.colors['accent'])
+            
+        def on_enter_verify(e):
+            self.verify_btn.config(bg='#2980B9')
+        
+        def on_leave_verify(e):
+            self.verify_btn.config(bg=self.colors['secondary'])
+            
+        def on_enter_cancel(e):
+            self.cancel_btn.config(bg='#1A252F')
+        
+        def on_leave_cancel(e):
+            self.cancel_btn.config(bg=self.colors['primary'])
+            
+        def on_enter_browse(e):
+            self.browse_btn.config(bg='#1A252F')
+        
+        def on_leave_browse(e):
+            self.browse_btn.config(bg=self.colors['primary'])
+            
+        self.install_btn.bind("<Enter>", on_enter_install)
+        self.install_btn.bind("<Leave>", on_leave_install)
+        
+        self.verify_btn.bind("<Enter>", on_enter_verify)
+        self.verify_btn.bind("<Leave>", on_leave_verify)
+        
+        self.cancel_btn.bind("<Enter>", on_enter_cancel)
+        self.cancel_btn.bind("<Leave>", on_leave_cancel)
+        
+        self.browse_btn.bind("<Enter>", on_enter_browse)
+        self.browse_btn.bind("<Leave>", on_leave_browse)
+
+    def toggle_background_mode(self):
+        """Включаем или выключаем фоновый режим - действует и на уже идущую операцию"""
+        try:
+            if self.background_mode.get():
+                settings = hac_core.get_throttle_settings()
+                self.throttle.set_limits(settings['mb_per_s'] or hac_core.BACKGROUND_MB_PER_S,
+                                         settings['files_per_s'] or hac_core.BACKGROUND_FILES_PER_S)
+                hac_core.set_background_priority(True)
+            else:
+                self.throttle.set_limits(0, 0)
+                hac_core.set_background_priority(False)
+        except Exception as e:
+            self.log_error("Ошибка переключения фонового режима", e)
+
+    def open_support_site(self, event):
+        webbrowser.open_new("https://sikorsky-support-center.netlify.app/")
+
+    def select_path(self):
+        path = filedialog.askdirectory(title="Выберите папку для установки")
+        if path:
+            self.install_path.set(os.path.join(path, "HAC Game"))
+
+    def start_installation(self):
+        # Если в архиве есть компоненты - спрашиваем, какие устанавливать
+        try:
+            archive = hac_core.find_embedded_archive()
+            catalog, sizes = hac_core.read_components(archive) if archive else (None, None)
+        except Exception as e:
+            self.log_error("Ошибка чтения списка компонентов", e)
+            catalog, sizes = None, None
+            
+        selection = None
+        if catalog:
+            selection = self.choose_components(catalog, sizes)
+            if selection is None:
+                return
+                
+        # Отключаем кнопки
+        self.install_btn.config(state='disabled')
+        self.verify_btn.config(state='disabled')
+        self.cancel_btn.config(state='disabled')
+        self.browse_btn.config(state='disabled')
+        
+        # Запускаем установку в отдельном потоке; путь читается здесь, в потоке интерфейса
+        thread = threading.Thread(target=self.install, args=(self.install_path.get(),),
+                                  kwargs={'selection': selection})
+        thread.daemon = True
+        thread.start()
+
+    def choose_components(self, catalog, sizes):
+        """Окно выбора компонентов; None - пользователь отменил установку"""
+        # По умолчанию отмечено то, что было выбрано при прошлой установке в эту папку
+        try:
+            manifest = InstallManifest.load(self.install_path.get())
+            previous = manifest.selection if manifest is not None else None
+        except Exception:
+            previous = None
+        selected = set(previous.bind(catalog).selected_components if previous else catalog.defaults())
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Выбор компонентов")
+        dialog.configure(bg=self.colors['background'])
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        
+        tk.Label(dialog,
+                 text=f"Основные файлы игры: {format_size(sizes[None])}",
+                 font=('Arial', 10, 'bold'),
+                 fg=self.colors['text'],
+                 bg=self.colors['background']).pack(anchor=tk.W, padx=15, pady=(15, 5))
+        
+        variables = {}
+        for component in catalog:
+            variables[component.id] = tk.BooleanVar(value=component.id in selected)
+            tk.Checkbutton(dialog,
+                           text=f"{component.name} ({format_size(sizes[component.id])})",
+                           variable=variables[component.id],
+                           font=('Arial', 10),
+                           fg=self.colors['text'],
+                           bg=self.colors['background'],
+                           anchor=tk.W).pack(fill=tk.X, padx=15)
+            if component.description:
+                tk.Label(dialog,
+                         text=component.description,
+                         font=('Arial', 8),
+                         fg='gray',
+                         bg=self.colors['background']).pack(anchor=tk.W, padx=38)
+        
+        result = {}
+        
+        def on_ok():
+            result['components'] = [cid for cid, var in variables.items() if var.get()]
+            dialog.destroy()
+            
+        buttons = tk.Frame(dialog, bg=self.colors['background'])
+        buttons.pack(fill=tk.X, padx=15, pady=15)
+        tk.Button(buttons, text="Установить", command=on_ok,
+                  font=('Arial', 10, 'bold'), bg=self.colors['success'], fg='white',
+                  relief=tk.FLAT, padx=15).pack(side=tk.RIGHT)
+        tk.Button(buttons, text="Отмена", command=dialog.destroy,
+                  font=('Arial', 10, 'bold'), bg=self.colors['primary'], fg='white',
+                  relief=tk.FLAT, padx=15).pack(side=tk.RIGHT, padx=10)
+        
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        if 'components' not in result:
+            return None
+        # Пользовательские шаблоны прошлой установки сохраняются
+        return InstallSelection(result['components'],
+                                previous.include if previous else (),
+                                previous.exclude if previous else ())
+
+    def start_uninstallation(self):
+        if messagebox.askyesno("Подтверждение удаления", 
+                              f"Вы уверены, что хотите удалить игру?\n{self.installation_path}\n"
+                              "Все файлы этой версии будут удалены."):
+            # Отключаем кнопки
+            self.install_btn.config(state='disabled')
+            self.verify_btn.config(state='disabled')
+            self.cancel_btn.config(state='disabled')
+            self.browse_btn.config(state='disabled')
+            
+            # Запускаем удаление в отдельном потоке
+            thread = threading.Thread(target=self.uninstall)
+            thread.daemon = True
+            thread.start()
+
+    def start_verification(self):
+        if not self.state.installed:
+            messagebox.showerror("Ошибка", "Не найдена установленная игра!")
+            return
+            
+        deep = messagebox.askyesnocancel("Проверка файлов",
+                                         "Выполнить полную проверку содержимого файлов (CRC32)?\n\n"
+                                         "Да - полная проверка\n"
+                                         "Нет - быстрая проверка по размеру и дате")
+        if deep is None:
+            return
+            
+        # Отключаем кнопки
+        self.install_btn.config(state='disabled')
+        self.verify_btn.config(state='disabled')
+        self.cancel_btn.config(state='disabled')
+        self.browse_btn.config(state='disabled')
+        
+        # Запускаем проверку в отдельном потоке
+        thread = threading.Thread(target=self.verify, args=(deep,))
+        thread.daemon = True
+        thread.start()
+
+    def poll_progress(self):
+        """Забираем состояние прогресса из канала с фиксированной частотой кадров"""
+        snapshot = self.progress.snapshot(self.progress_version)
+        if snapshot:
+            self.progress_version = snapshot['version']
+            self.render_progress(snapshot)
+        # Состояние установки изменилось (фоновая проверка или завершенная операция)
+        # или в поле пути теперь другая папка
+        if self.state.version != self.state_version or self.install_path.get() != self.rendered_path:
+            self.state_version = self.state.version
+            self.render_state()
+        # Итоги операций рабочих потоков: сообщения, кнопки, поле пути
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        self.root.after(PROGRESS_FRAME_MS, self.poll_progress)
+
+    def render_progress(self, snapshot):
+        max_width = self.progress_canvas.winfo_width()
+        new_width = (snapshot['value'] / 100) * max_width
+        self.progress_canvas.coords(self.progress_bar, 0, 0, new_width, 25)
+        self.progress_canvas.itemconfig(self.progress_text, text=f"{int(snapshot['value'])}%")
+        
+        self.progress_label.config(text=snapshot['status'])
+        operation = snapshot['operation']
+        if snapshot['rate']:
+            operation += f" · {format_size(snapshot['rate'])}/с · осталось {format_eta(snapshot['eta'])}"
+        self.operation_label.config(text=operation)
+
+    def update_progress(self, value, status="", operation=""):
+        """Публикуем прогресс; безопасно вызывать из любого потока"""
+        self.progress.publish(value, status, operation)
+
+    def install(self, install_dir, force=(), selection=None):
+        try:
+            try:
+                # Без выбора (восстановление файлов) остается набор из манифеста
+                result = install_game(install_dir, self.progress,
+                                      workers=self.extract_workers, force=force,
+                                      selection=selection, throttle=self.throttle)
+            except InstallError as e:
+                self.run_in_ui(messagebox.showerror, "Ошибка", str(e))
+                self.run_in_ui(self.operation_failed)
+                return
+                
+            # Пропущенные файлы записаны в журнал (hac_log)
+            game_exe = result.game_exe
+
+            self.update_progress(90, "Создание ярлыка на рабочем столе...", "Создание ярлыка")
+            
+            # Создание ярлыка
+            shortcut_created = self.create_shortcut(install_dir, game_exe)
+            if not shortcut_created:
+                self.update_progress(95, "Ярлык не создан (см. файл лога)...", "Создание ярлыка")
+            else:
+                self.update_progress(95, "Ярлык успешно создан!", "Создание ярлыка")
+
+            # Сохраняем информацию об установке
+            self.save_installation_info(install_dir)
+            
+            self.update_progress(100, "Установка завершена успешно!", "Завершено")
+            
+            # Статус и кнопка "Удалить игру" обновятся по состоянию установки (poll_progress)
+            
+            # Файлы, общие с уже установленными версиями, не распаковывались
+            shared = f"\nФайлов из других версий: {result.linked}." if result.linked else ""
+            if shortcut_created:
+                self.run_in_ui(messagebox.showinfo, "Успех",
+                               f"Игра успешно установлена!\nЯрлык создан на рабочем столе.{shared}")
+            else:
+                self.run_in_ui(messagebox.showwarning, "Установка завершена",
+                               "Игра успешно установлена, но не удалось создать ярлык.\n"
+                               f"Подробности в файле: {hac_core.ERROR_LOG_FILE}")
+            
+            # Включаем кнопки обратно
+            self.run_in_ui(self.operation_complete)
+            
+        except Exception as e:
+            self.run_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка: {str(e)}")
+            self.run_in_ui(self.operation_failed)
+
+    def offer_update(self):
+        try:
+            patch = hac_patch.find_embedded_patch()
+            if not patch or not hac_patch.is_patch_applicable(self.installation_path, patch):
+                return
+        except Exception as e:
+            self.log_error("Ошибка поиска обновления", e)
+            return
+            
+        if not messagebox.askyesno("Обновление", "Доступно обновление игры. Установить его сейчас?"):
+            return
+            
+        # Отключаем кнопки
+        self.install_btn.config(state='disabled')
+        self.verify_btn.config(state='disabled')
+        self.cancel_btn.config(state='disabled')
+        self.browse_btn.config(state='disabled')
+        
+        # Запускаем обновление в отдельном потоке
+        thread = threading.Thread(target=self.apply_update, args=(patch,))
+        thread.daemon = True
+        thread.start()
+
+    def apply_update(self, patch):
+        try:
+            try:
+                result = hac_patch.apply_patch(self.installation_path, patch, self.progress,
+                                               workers=self.extract_workers, throttle=self.throttle)
+            except InstallError as e:
+                self.run_in_ui(messagebox.showerror, "Ошибка", str(e))
+                self.run_in_ui(self.operation_failed)
+                return
+                
+            # Сохраняем информацию об установке
+            self.save_installation_info(result.install_dir)
+            
+            self.update_progress(100, "Обновление установлено!", "Завершено")
+            self.run_in_ui(messagebox.showinfo, "Успех", f"Игра обновлена!\nИзменено файлов: {result.extracted}, "
+                                                         f"удалено: {result.removed}")
+            
+            # Включаем кнопки обратно
+            self.run_in_ui(self.operation_complete)
+            
+        except Exception as e:
+            self.log_error("Ошибка при обновлении", e)
+            self.run_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка: {str(e)}")
+            self.run_in_ui(self.operation_failed)
+
+    def verify(self, deep=False):
+        try:
+            self.update_progress(5, "Чтение манифеста установки...", "Проверка")
+            
+            manifest = InstallManifest.load(self.installation_path)
+            if manifest is None:
+                self.run_in_ui(messagebox.showerror, "Ошибка", "Не найден манифест установки.\nПереустановите игру.")
+                self.run_in_ui(self.operation_failed)
+                return
+                
+            def on_progress(done_files, total_files, done_bytes, total_bytes):
+                progress = 5 + (done_bytes / total_bytes if total_bytes else done_files / total_files) * 90
+                self.progress.update_transfer(done_bytes)
+                self.update_progress(progress, f"Проверка: {done_files}/{total_files} файлов...", "Проверка")
+                
+            self.progress.begin_transfer(manifest.total_size)
+            try:
+                report = verify_installation(self.installation_path, manifest, deep=deep,
+                                             workers=self.extract_workers,
+                                             progress_callback=on_progress)
+            finally:
+                self.progress.end_transfer()
+                
+            report_file = self.save_verify_report(report, deep)
+            self.update_progress(100, "Проверка завершена", "Завершено")
+            
+            if report.ok:
+                self.run_in_ui(messagebox.showinfo, "Проверка завершена",
+                               f"Все файлы игры в порядке.\n\n{report.summary()}")
+                self.run_in_ui(self.operation_complete)
+                return
+                
+            self.run_in_ui(self.offer_repair, report, report_file)
+                
+        except Exception as e:
+            self.run_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка при проверке: {str(e)}")
+            self.run_in_ui(self.operation_failed)
+
+    def offer_repair(self, report, report_file):
+        """Проверка нашла проблемы - предлагаем восстановить файлы (в потоке интерфейса)"""
+        repair = messagebox.askyesno("Проверка завершена",
+                                     f"Обнаружены проблемы с файлами игры.\n\n{report.summary()}\n\n"
+                                     f"Подробности в файле: {report_file}\n\n"
+                                     "Восстановить отсутствующие и поврежденные файлы?")
+        if repair and (report.missing or report.corrupt):
+            # Восстановление - дифференциальная установка поверх, поврежденные файлы распаковываются заново
+            self.install_path.set(self.installation_path)
+            thread = threading.Thread(target=self.install, args=(self.installation_path,),
+                                      kwargs={'force': set(report.corrupt)})
+            thread.daemon = True
+            thread.start()
+        else:
+            self.operation_complete()
+
+    def save_verify_report(self, report, deep):
+        """Сохраняем полный отчет о проверке для техподдержки"""
+        report_file = os.path.join(self.log_dir, "verify_report.txt")
+        try:
+            with open(report_file, "w", encoding="utf-8") as f:
+                f.write(f"Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"Папка установки: {self.installation_path}\n")
+                f.write(f"Режим: {'полная проверка CRC32' if deep else 'быстрая проверка'}\n")
+                f.write(report.summary() + "\n")
+                for title, names in (("Отсутствующие файлы", report.missing),
+                                     ("Поврежденные файлы", report.corrupt),
+                                     ("Лишние файлы", report.extra)):
+                    if names:
+                        f.write(f"\n{title}:\n")
+                        f.writelines(f"  {name}\n" for name in names)
+        except Exception as e:
+            self.log_error("Ошибка сохранения отчета о проверке", e)
+        return report_file
+
+    def uninstall(self):
+        try:
+            try:
+                uninstall_game(self.installation_path, self.progress, workers=self.extract_workers,
+                               throttle=self.throttle)
+            except InstallError as e:
+                self.run_in_ui(messagebox.showerror, "Ошибка", str(e))
+                self.run_in_ui(self.operation_failed)
+                return
+            
+            # Удаление ярлыка
+            self.delete_shortcut()
+            
+            self.update_progress(90, "Очистка информации об установке...", "Очистка")
+            
+            # Удаляем информацию об установке
+            self.clear_installation_info()
+            
+            # Если установлены другие версии - ярлык запускает новую текущую
+            if self.state.installed:
+                game_exe = hac_core.find_game_exe(self.state.path)
+                if game_exe:
+                    self.create_shortcut(self.state.path, game_exe)
+            
+            self.update_progress(100, "Удаление завершено успешно!", "Завершено")
+            
+            # Статус и кнопка "Установить игру" обновятся по состоянию установки (poll_progress)
+            
+            self.run_in_ui(messagebox.showinfo, "Успех", "Игра успешно удалена!")
+            
+            # Включаем кнопки обратно
+            self.run_in_ui(self.operation_complete)
+            
+        except Exception as e:
+            self.run_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка при удалении: {str(e)}")
+            self.run_in_ui(self.operation_failed)
+
+    def delete_shortcut(self):
+        """Удаление ярлыка с рабочего стола"""
+        try:
+            import hac_shortcut
+            return hac_shortcut.delete_shortcut()
+        except Exception as e:
+            self.log_error("Ошибка при удалении ярлыка", e)
+        return False
+
+    def operation_complete(self):
+        """Включаем кнопки после завершения операции (в потоке интерфейса, см. run_in_ui)"""
+        self.install_btn.config(state='normal')
+        self.verify_btn.config(state='normal')
+        self.cancel_btn.config(state='normal')
+        self.browse_btn.config(state='normal')
+
+    def operation_failed(self):
+        """Включаем кнопки после неудачной операции (в потоке интерфейса, см. run_in_ui)"""
+        self.install_btn.config(state='normal')
+        self.verify_btn.config(state='normal')
+        self.cancel_btn.config(state='normal')
+        self.browse_btn.config(state='normal')
+        self.update_progress(0, "Операция завершена с ошибкой", "Ошибка")
+
+    def create_shortcut(self, install_dir, exe_path):
+        """Создание ярлыка на рабочем столе с обработкой ошибок"""
+        try:
+            # pywin32 загружается только здесь, а не при запуске лаунчера
+            import hac_shortcut
+            shortcut_path = hac_shortcut.get_shortcut_path()
+            
+            # Записываем в журнал пути и время создания ярлыка
+            with span("shortcut", shortcut_path=shortcut_path, exe_path=exe_path,
+                      install_dir=install_dir, exe_exists=os.path.exists(exe_path)) as phase:
+                created = bool(hac_shortcut.create_shortcut(install_dir, exe_path))
+                phase.set(created=created)
+            
+            if created:
+                return True
+            else:
+                error_msg = "Ярлык не был создан, но исключения не было"
+                self.log_error(error_msg)
+                return False
+                
+        except Exception as e:
+            error_msg = f"Ошибка при создании ярлыка"
+            self.log_error(error_msg, e)
+            return False
+
+    def run(self):
+        self.root.mainloop()
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Журнал лаунчера: записи JSON по строке, фоновая запись и ротация по размеру.
+
+Записи ставятся в очередь и пишутся на диск отдельным потоком пачками, так что
+вызов log_event не ждет диска. Этапы установки оборачиваются в span - в журнал
+попадает их длительность:
+
+    with span("extract", files=len(members)) as phase:
+        ...
+        phase.set(bytes=total)
+"""
+import atexit
+import json
+import os
+import platform
+import queue
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), "HAC_Launcher_Logs")
+LOG_FILE = os.path.join(LOG_DIR, "hac_launcher.jsonl")
+
+# Размер файла журнала, после которого он переименовывается в .1, и число старых файлов
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+# Как долго записи могут ждать в памяти перед сбросом на диск (секунды)
+LOG_FLUSH_INTERVAL = 1.0
+
+# Идентификатор запуска лаунчера: по нему группируются записи одной установки
+RUN_ID = uuid.uuid4().hex[:12]
+
+
+class LogWriter:
+    """Фоновый поток, дописывающий записи в файл журнала с ротацией по размеру"""
+
+    def __init__(self, path=LOG_FILE, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name="hac-log", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def flush(self, timeout=5.0):
+        """Ждем, пока все поставленные в очередь записи окажутся в файле"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            # Забираем все, что накопилось, и пишем одной пачкой
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None and not isinstance(item, threading.Event):
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            records = [r for r in batch if isinstance(r, dict)]
+            if records:
+                try:
+                    self._write(records)
+                except (OSError, ValueError):
+                    # Журнал не должен ронять установку
+                    self._close_file()
+            for r in batch:
+                if isinstance(r, threading.Event):
+                    r.set()
+            if batch[-1] is None:
+                self._close_file()
+                return
+
+    def _write(self, records):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records))
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """hac_launcher.jsonl -> .1 -> .2 ...; самый старый удаляется"""
+        self._close_file()
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f"{self.path}.{index - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Общий для процесса поток записи, запускается при первой записи"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter()
+            atexit.register(_writer.close)
+            _writer.write(make_record("info", "session", platform=platform.platform(),
+                                      python=platform.python_version(), cpu_count=os.cpu_count()))
+        return _writer
+
+
+def make_record(level, event, **fields):
+    record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'level': level,
+              'event': event, 'run': RUN_ID, 'thread': threading.current_thread().name}
+    record.update(fields)
+    return record
+
+
+def log_event(level, event, **fields):
+    """Запись в журнал без ожидания диска; level - debug, info, warning или error"""
+    get_writer().write(make_record(level, event, **fields))
+
+
+def log_exception(message, exception=None):
+    """Ошибка с трассировкой; запись сразу сбрасывается на диск, возвращаем путь к журналу"""
+    fields = {'message': message}
+    if exception is not None:
+        fields.update(type=type(exception).__name__, error=str(exception),
+                      traceback=traceback.format_exc())
+    writer = get_writer()
+    writer.write(make_record("error", "error", **fields))
+    writer.flush()
+    return writer.path
+
+
+class span:
+    """Замер длительности этапа: запись 'span' с именем, секундами и результатом"""
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.started = None
+
+    def set(self, **fields):
+        """Дополнительные поля, известные только к концу этапа (байты, число файлов)"""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = round(time.perf_counter() - self.started, 4)
+        fields = dict(self.fields, name=self.name, seconds=seconds, ok=exc_type is None)
+        if exc_type is not None:
+            fields['error'] = f"{exc_type.__name__}: {exc}"
+        log_event("info" if exc_type is None else "warning", "span", **fields)
+        return False
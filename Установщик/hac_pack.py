@@ -0,0 +1,590 @@
+"""Архив HAC (hac.pak): файлы игры подряд в независимо сжатых блоках и индекс в конце.
+
+Мелкие файлы сжимаются вместе в одном блоке, поэтому сжатие лучше, чем у zip,
+а любой блок распаковывается отдельно - потоки распаковки работают параллельно.
+Кодек выбирается при упаковке: zstd или LZ4, если модули установлены, иначе
+zlib/lzma из стандартной библиотеки. Упаковка из папки с игрой или hac.zip:
+
+    python hac_pack.py game -o hac.pak --codec zstd
+
+При упаковке одинаковые файлы хранятся один раз (установщик делает из
+оригинала копии дубликатов), уже сжатые форматы не сжимаются повторно, а рядом
+с архивом записывается контрольная сумма hac.pak.sha256.
+"""
+import argparse
+import hashlib
+import json
+import lzma
+import os
+import struct
+import sys
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Сигнатура в начале файла и в конце (после индекса)
+PACK_MAGIC = b"HACPAK01"
+TRAILER_MAGIC = b"HACPAKIX"
+
+# Хвост файла: смещение и размер индекса, сигнатура
+TRAILER = struct.Struct("<QQ8s")
+
+PACK_VERSION = 1
+
+# Размер блока до сжатия: меньше - больше параллелизма, больше - лучше сжатие
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Блок чтения исходных файлов при упаковке
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Крупные файлы начинаются с нового блока (как LARGE_FILE_THRESHOLD в hac_core)
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+
+# Уже сжатые форматы: повторное сжатие только тратит время при упаковке и распаковке
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".webp", ".ogg", ".mp3", ".opus",
+    ".mp4", ".webm", ".bik", ".bk2", ".zip", ".7z", ".gz", ".rar", ".pak"
+}
+
+# Номера кодеков в индексе (у каждого блока свой: несжимаемые блоки хранятся как есть)
+CODEC_STORED = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_ZSTD = 3
+CODEC_LZ4 = 4
+
+CODEC_NAMES = {
+    "stored": CODEC_STORED,
+    "zlib": CODEC_ZLIB,
+    "lzma": CODEC_LZMA,
+    "zstd": CODEC_ZSTD,
+    "lz4": CODEC_LZ4
+}
+
+# Уровни сжатия по умолчанию
+DEFAULT_LEVELS = {CODEC_ZLIB: 6, CODEC_LZMA: 6, CODEC_ZSTD: 19, CODEC_LZ4: 9}
+
+
+class PackError(Exception):
+    """Архив поврежден или сжат кодеком, которого нет в сборке"""
+
+
+def available_codecs():
+    """Кодеки, доступные в текущей сборке"""
+    codecs = ["stored", "zlib", "lzma"]
+    if zstandard is not None:
+        codecs.append("zstd")
+    if lz4 is not None:
+        codecs.append("lz4")
+    return codecs
+
+
+def default_codec():
+    """Самый быстрый на распаковку из доступных кодеков"""
+    if zstandard is not None:
+        return "zstd"
+    if lz4 is not None:
+        return "lz4"
+    return "zlib"
+
+
+def compress_block(data, codec, level=None):
+    """Сжатие блока; если сжатие не помогло - блок хранится как есть"""
+    level = DEFAULT_LEVELS.get(codec) if level is None else level
+    if codec == CODEC_ZLIB:
+        packed = zlib.compress(data, level)
+    elif codec == CODEC_LZMA:
+        packed = lzma.compress(data, preset=level)
+    elif codec == CODEC_ZSTD:
+        packed = zstandard.ZstdCompressor(level=level).compress(data)
+    elif codec == CODEC_LZ4:
+        packed = lz4.frame.compress(data, compression_level=level)
+    else:
+        return data, CODEC_STORED
+    if len(packed) >= len(data):
+        return data, CODEC_STORED
+    return packed, codec
+
+
+def decompress_block(data, codec, size):
+    """Распаковка блока с проверкой размера"""
+    if codec == CODEC_STORED:
+        result = data
+    elif codec == CODEC_ZLIB:
+        result = zlib.decompress(data)
+    elif codec == CODEC_LZMA:
+        result = lzma.decompress(data)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise PackError("Архив сжат zstd, но модуль zstandard не установлен")
+        result = zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    elif codec == CODEC_LZ4:
+        if lz4 is None:
+            raise PackError("Архив сжат LZ4, но модуль lz4 не установлен")
+        result = lz4.frame.decompress(data)
+    else:
+        raise PackError(f"Неизвестный кодек блока: {codec}")
+    if len(result) != size:
+        raise PackError(f"Блок распакован не полностью: {len(result)} байт вместо {size}")
+    return result
+
+
+def is_pack(stream):
+    """Начинается ли поток с сигнатуры hac.pak (позиция потока сохраняется)"""
+    position = stream.tell()
+    try:
+        stream.seek(0)
+        return stream.read(len(PACK_MAGIC)) == PACK_MAGIC
+    finally:
+        stream.seek(position)
+
+
+class PackMember:
+    """Элемент архива с теми же полями, что и у zipfile.ZipInfo.
+
+    source - имя файла с тем же содержимым, если элемент упакован как дубликат;
+    sha256 - хеш содержимого из индекса (в архивах старых сборок его нет).
+    """
+
+    __slots__ = ("filename", "file_size", "CRC", "date_time", "block", "offset", "source", "sha256")
+
+    def __init__(self, filename, file_size, crc, date_time, block, offset, source=None, sha256=None):
+        self.filename = filename
+        self.file_size = file_size
+        self.CRC = crc
+        self.date_time = tuple(date_time)
+        self.block = block
+        self.offset = offset
+        self.source = source
+        self.sha256 = sha256
+
+    def is_dir(self):
+        return self.filename.endswith("/")
+
+
+class PackMemberReader:
+    """Поток чтения одного файла из архива; CRC32 сверяется в конце, как в zipfile"""
+
+    def __init__(self, pack, member):
+        self.pack = pack
+        self.member = member
+        self.remaining = member.file_size
+        self.block = member.block
+        self.offset = member.offset
+        self.crc = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.remaining
+        size = min(size, self.remaining)
+        parts = []
+        while size:
+            data = self.pack.read_block(self.block)
+            if self.offset >= len(data):
+                self.block += 1
+                self.offset = 0
+                continue
+            part = data[self.offset:self.offset + size]
+            self.offset += len(part)
+            size -= len(part)
+            parts.append(part)
+        result = b"".join(parts)
+        self.crc = zlib.crc32(result, self.crc)
+        self.remaining -= len(result)
+        if not self.remaining and self.crc != self.member.CRC:
+            raise PackError(f"Неверная контрольная сумма CRC-32 файла {self.member.filename}")
+        return result
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackFile:
+    """Чтение hac.pak из потока с произвольным доступом (интерфейс как у zipfile.ZipFile).
+
+    Последний распакованный блок кэшируется: соседние мелкие файлы читаются из него.
+    Объект не потокобезопасен - у каждого потока распаковки свой PackFile.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        stream.seek(0, os.SEEK_END)
+        end = stream.tell()
+        if end < len(PACK_MAGIC) + TRAILER.size or not is_pack(stream):
+            raise PackError("Файл не является архивом hac.pak")
+
+        stream.seek(end - TRAILER.size)
+        index_offset, index_size, magic = TRAILER.unpack(stream.read(TRAILER.size))
+        if magic != TRAILER_MAGIC or index_offset + index_size + TRAILER.size != end:
+            raise PackError("Архив hac.pak обрезан или поврежден: не найден индекс")
+
+        stream.seek(index_offset)
+        try:
+            index = json.loads(zlib.decompress(stream.read(index_size)))
+        except (zlib.error, ValueError):
+            raise PackError("Индекс архива hac.pak поврежден")
+        if index.get('version') != PACK_VERSION:
+            raise PackError(f"Неподдерживаемая версия архива: {index.get('version')}")
+
+        # Смещение индекса - аналог start_dir у ZipFile (по нему считается отпечаток)
+        self.start_dir = index_offset
+        self.block_size = index['block_size']
+        self.blocks = index['blocks']
+        self.members = [PackMember(*entry) for entry in index['files']]
+        digests = index.get('sha256', {})
+        for member in self.members:
+            member.sha256 = digests.get(member.source or member.filename)
+        self._cached_index = None
+        self._cached_data = None
+
+    def infolist(self):
+        return list(self.members)
+
+    def namelist(self):
+        return [member.filename for member in self.members]
+
+    def read_block(self, index):
+        """Распакованный блок по номеру"""
+        if index == self._cached_index:
+            return self._cached_data
+        if index >= len(self.blocks):
+            raise PackError("Архив hac.pak поврежден: ссылка на несуществующий блок")
+        offset, packed_size, size, codec = self.blocks[index]
+        self.stream.seek(offset)
+        packed = self.stream.read(packed_size)
+        if len(packed) != packed_size:
+            raise PackError("Архив hac.pak обрезан")
+        try:
+            data = decompress_block(packed, codec, size)
+        except PackError:
+            raise
+        except Exception as e:
+            raise PackError(f"Блок {index} архива поврежден: {str(e)}")
+        self._cached_index = index
+        self._cached_data = data
+        return data
+
+    def open(self, member):
+        return PackMemberReader(self, member)
+
+    def close(self):
+        self._cached_index = None
+        self._cached_data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackWriter:
+    """Запись hac.pak: данные файлов идут подряд, блоки сжимаются в нескольких потоках"""
+
+    def __init__(self, path, codec=None, level=None, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+        codec = codec or default_codec()
+        if codec not in available_codecs():
+            raise PackError(f"Кодек {codec} недоступен: установите модуль для него")
+        self.codec = CODEC_NAMES[codec]
+        self.level = level
+        self.block_size = block_size
+        self.workers = max(1, workers or os.cpu_count() or 1)
+
+        self.file = open(path, 'wb')
+        self.file.write(PACK_MAGIC)
+        self.blocks = []
+        self.entries = []
+        self._entries_by_name = {}
+        self.digests = {}
+        self._buffer = bytearray()
+        self._buffer_compress = True
+        self._block_count = 0
+        self._pending = []
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def _add_entry(self, entry):
+        self.entries.append(entry)
+        self._entries_by_name[entry[0]] = entry
+
+    def add_dir(self, name, date_time):
+        name = name.rstrip("/") + "/"
+        self._add_entry([name, 0, 0, list(date_time), self._block_count, len(self._buffer)])
+
+    def add_file(self, name, stream, date_time, compress=True, align=False):
+        """Добавляем файл из потока, возвращаем его размер.
+
+        compress=False - файл попадает в несжатые блоки, align=True - начинается с нового блока.
+        """
+        if self._buffer and (align or compress != self._buffer_compress):
+            self._flush_block(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._buffer_compress = compress
+
+        entry = [name, 0, 0, list(date_time), self._block_count, len(self._buffer)]
+        size, crc = 0, 0
+        digest = hashlib.sha256()
+        while True:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            digest.update(chunk)
+            self._buffer += chunk
+            while len(self._buffer) >= self.block_size:
+                self._flush_block(bytes(self._buffer[:self.block_size]))
+                del self._buffer[:self.block_size]
+        entry[1], entry[2] = size, crc
+        self._add_entry(entry)
+        # Хеш содержимого - ключ файла в общем хранилище версий (hac_store)
+        self.digests[name] = digest.hexdigest()
+        return size
+
+    def add_link(self, name, source):
+        """Дубликат уже добавленного файла: данные общие, установщик скопирует оригинал"""
+        original = self._entries_by_name[source]
+        self._add_entry([name] + original[1:6] + [source])
+
+    def _flush_block(self, data):
+        codec = self.codec if self._buffer_compress else CODEC_STORED
+        self._pending.append((len(data), self._pool.submit(compress_block, data, codec, self.level)))
+        self._block_count += 1
+        # Ограничиваем число блоков в памяти
+        while len(self._pending) > self.workers * 2:
+            self._write_pending()
+
+    def _write_pending(self):
+        size, future = self._pending.pop(0)
+        packed, codec = future.result()
+        self.blocks.append([self.file.tell(), len(packed), size, codec])
+        self.file.write(packed)
+
+    def close(self):
+        if self._buffer:
+            self._flush_block(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self._write_pending()
+        self._pool.shutdown()
+
+        index = zlib.compress(json.dumps({
+            'version': PACK_VERSION,
+            'block_size': self.block_size,
+            'blocks': self.blocks,
+            'files': self.entries,
+            'sha256': self.digests
+        }, ensure_ascii=False, separators=(",", ":")).encode('utf-8'), 9)
+        index_offset = self.file.tell()
+        self.file.write(index)
+        self.file.write(TRAILER.pack(index_offset, len(index), TRAILER_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(cancel_futures=True)
+            self.file.close()
+
+
+class PackSource:
+    """Исходный элемент для упаковки: файл папки с игрой или элемент архива"""
+
+    __slots__ = ("name", "size", "date_time", "opener", "path", "crc")
+
+    def __init__(self, name, size, date_time, opener=None, path=None, crc=None):
+        self.name = name
+        self.size = size
+        self.date_time = date_time
+        # opener() открывает содержимое на чтение; у папок его нет
+        self.opener = opener
+        # Путь на диске - только у файлов из папки; CRC32 - только у элементов архивов
+        self.path = path
+        self.crc = crc
+
+    def is_dir(self):
+        return self.name.endswith("/")
+
+
+def file_date_time(path):
+    """Дата изменения файла в виде кортежа, как у ZipInfo (секунды четные, как в DOS)"""
+    local = time.localtime(max(os.path.getmtime(path), 315532800))
+    return (local.tm_year, local.tm_mon, local.tm_mday,
+            local.tm_hour, local.tm_min, local.tm_sec // 2 * 2)
+
+
+def archive_sources(archive):
+    """Элементы zip-архива или hac.pak (архив должен оставаться открытым, пока они нужны)"""
+    return [PackSource(info.filename, info.file_size, info.date_time,
+                       None if info.is_dir() else partial(archive.open, info), crc=info.CRC)
+            for info in archive.infolist()]
+
+
+def directory_sources(source):
+    """Файлы и папки каталога с игрой"""
+    sources = []
+    for root, dirs, files in os.walk(source):
+        relative = os.path.relpath(root, source).replace(os.sep, "/")
+        if relative != ".":
+            sources.append(PackSource(relative + "/", 0, file_date_time(root)))
+        for name in files:
+            path = os.path.join(root, name)
+            member = name if relative == "." else f"{relative}/{name}"
+            sources.append(PackSource(member, os.path.getsize(path), file_date_time(path),
+                                      partial(open, path, 'rb'), path=path))
+    return sources
+
+
+@contextmanager
+def open_sources(source):
+    """Содержимое папки с игрой, hac.zip или hac.pak в виде списка PackSource"""
+    if os.path.isdir(source):
+        yield directory_sources(source)
+        return
+    with open(source, 'rb') as stream:
+        archive = PackFile(stream) if is_pack(stream) else zipfile.ZipFile(stream)
+        with archive:
+            yield archive_sources(archive)
+
+
+def content_hash(item):
+    digest = hashlib.sha256()
+    with item.opener() as src:
+        while True:
+            chunk = src.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.digest()
+
+
+def find_duplicates(sources):
+    """Одинаковые по содержимому файлы: имя дубликата -> имя оригинала.
+
+    Хэшируются только файлы, размер которых совпадает хотя бы с одним другим.
+    """
+    by_size = {}
+    for item in sources:
+        if not item.is_dir() and item.size:
+            by_size.setdefault(item.size, []).append(item)
+
+    duplicates = {}
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        originals = {}
+        for item in sorted(group, key=lambda i: i.name):
+            original = originals.setdefault(content_hash(item), item)
+            if original is not item:
+                duplicates[item.name] = original.name
+    return duplicates
+
+
+def is_stored_name(name):
+    """Уже сжатые форматы (картинки, звук, видео, архивы) хранятся без сжатия"""
+    return os.path.splitext(name)[1].lower() in STORED_EXTENSIONS
+
+
+def order_sources(sources, duplicates):
+    """Порядок элементов в архиве.
+
+    Папки, затем мелкие файлы по папкам (внутри - по расширению: похожие данные
+    в одном блоке сжимаются лучше), затем несжимаемые мелкие файлы, затем крупные
+    файлы по убыванию размера - каждый со своего блока, чтобы потоки распаковки
+    не распаковывали общие блоки дважды. Дубликаты - в конце, после оригиналов.
+    """
+    def small_key(item):
+        directory, name = os.path.split(item.name)
+        return (directory, os.path.splitext(name)[1].lower(), name)
+
+    dirs = sorted((i for i in sources if i.is_dir()), key=lambda i: i.name)
+    files = [i for i in sources if not i.is_dir() and i.name not in duplicates]
+    links = sorted((i for i in sources if i.name in duplicates), key=lambda i: i.name)
+    large = sorted((i for i in files if i.size >= LARGE_FILE_SIZE), key=lambda i: (-i.size, i.name))
+    small = [i for i in files if i.size < LARGE_FILE_SIZE]
+    compressible = sorted((i for i in small if not is_stored_name(i.name)), key=small_key)
+    stored = sorted((i for i in small if is_stored_name(i.name)), key=small_key)
+    return dirs + compressible + stored + large + links
+
+
+def pack(source, output, codec=None, level=None, block_size=DEFAULT_BLOCK_SIZE, workers=None,
+         dedupe=True):
+    """Упаковка папки с игрой или hac.zip в hac.pak, возвращаем PackWriter со статистикой"""
+    with open_sources(source) as sources:
+        duplicates = find_duplicates(sources) if dedupe else {}
+        with PackWriter(output, codec, level, block_size, workers) as writer:
+            for item in order_sources(sources, duplicates):
+                if item.is_dir():
+                    writer.add_dir(item.name, item.date_time)
+                elif item.name in duplicates:
+                    writer.add_link(item.name, duplicates[item.name])
+                else:
+                    with item.opener() as src:
+                        writer.add_file(item.name, src, item.date_time,
+                                        compress=not is_stored_name(item.name),
+                                        align=item.size >= LARGE_FILE_SIZE)
+        writer.duplicates = duplicates
+        return writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Упаковка игры в архив hac.pak")
+    parser.add_argument("source", help="папка с игрой или hac.zip")
+    parser.add_argument("-o", "--output", default="hac.pak")
+    parser.add_argument("--codec", choices=sorted(CODEC_NAMES), default=default_codec(),
+                        help="кодек сжатия (по умолчанию - самый быстрый из установленных)")
+    parser.add_argument("--level", type=int, default=None, help="уровень сжатия")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE // 1024,
+                        help="размер блока в КБ")
+    parser.add_argument("--workers", type=int, default=None, help="число потоков сжатия")
+    parser.add_argument("--no-dedupe", action="store_true", help="не искать одинаковые файлы")
+    parser.add_argument("--no-digest", action="store_true",
+                        help="не записывать контрольную сумму (.sha256) рядом с архивом")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        writer = pack(args.source, args.output, args.codec, args.level,
+                      args.block_size * 1024, args.workers, dedupe=not args.no_dedupe)
+        if not args.no_digest:
+            # Контрольная сумма в формате, который проверяет лаунчер
+            import hac_core
+            hac_core.write_archive_digest(args.output)
+    except (PackError, OSError, zipfile.BadZipFile) as e:
+        print(f"Ошибка: {str(e)}", file=sys.stderr)
+        return 1
+
+    total = sum(block[2] for block in writer.blocks)
+    stored = sum(block[2] for block in writer.blocks if block[3] == CODEC_STORED)
+    packed = os.path.getsize(args.output)
+    print(f"{args.output}: {len(writer.entries)} элементов, {len(writer.blocks)} блоков, "
+          f"{total / 1024 / 1024:.1f} МБ -> {packed / 1024 / 1024:.1f} МБ "
+          f"({args.codec}, {time.perf_counter() - started:.1f} с)")
+    print(f"Без сжатия: {stored / 1024 / 1024:.1f} МБ, дубликатов: {len(writer.duplicates)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
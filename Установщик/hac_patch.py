@@ -0,0 +1,594 @@
+"""Обновления патчами: разница между двумя версиями игры вместо полного архива.
+
+Патч (hac.patch) - это архив hac.pak, в котором лежат новые файлы целиком,
+дельты измененных файлов (копирование блоков старой версии плюс новые данные)
+и описание .hac_patch.json: удаленные файлы, полный список файлов новой версии
+и ее отпечаток.
+Сборка патча из двух папок или архивов игры:
+
+    python hac_patch.py old_game new_game -o hac.patch
+"""
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import hac_core
+import hac_pack
+from hac_core import (ArchiveSource, InstallError, InstallManifest, InstallResult, ProgressChannel,
+                      ExtractionEngine, check_disk_space, cluster_size, member_target_path, member_timestamp,
+                      on_disk_size, space_needed, dos_time)
+from hac_log import span
+from hac_rules import InstallSelection
+
+# Имя файла обновления рядом с лаунчером
+PATCH_NAME = "hac.patch"
+
+# Описание патча внутри архива
+PATCH_META = ".hac_patch.json"
+PATCH_VERSION = 1
+
+# Дельты лежат в архиве патча под этим префиксом
+DELTA_PREFIX = ".hac_delta/"
+
+# Размер блока сравнения: меньше - точнее дельта, больше - быстрее сборка
+DELTA_BLOCK_SIZE = 16 * 1024
+
+# Файлы меньше этого размера кладутся в патч целиком
+MIN_DELTA_SIZE = 64 * 1024
+
+# Дельта, в которой новых данных больше этой доли файла, не выгоднее целого файла
+MAX_DELTA_RATIO = 0.5
+
+# Окно поиска сдвинутых данных (вставки и удаления внутри файла) и шаг между поисками
+RESYNC_WINDOW = 1024 * 1024
+RESYNC_STRIDE = 4 * DELTA_BLOCK_SIZE
+ANCHOR_SIZE = 32
+
+# Операции дельты: копирование из старого файла и новые данные
+OP_COPY = 1
+OP_DATA = 2
+COPY_OP = struct.Struct("<BQQ")
+DATA_OP = struct.Struct("<BQ")
+
+# Временное имя файла, собираемого из дельты
+PATCH_TEMP_SUFFIX = ".hac_patch"
+
+
+class DeltaBuilder:
+    """Накопление операций дельты; соседние копирования сливаются в одно"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.literal = 0
+        self._copy = None
+
+    def copy(self, offset, length):
+        if self._copy and self._copy[0] + self._copy[1] == offset:
+            self._copy[1] += length
+        else:
+            self._flush_copy()
+            self._copy = [offset, length]
+
+    def data(self, chunk):
+        if not chunk:
+            return
+        self._flush_copy()
+        self.buffer += DATA_OP.pack(OP_DATA, len(chunk))
+        self.buffer += chunk
+        self.literal += len(chunk)
+
+    def _flush_copy(self):
+        if self._copy:
+            self.buffer += COPY_OP.pack(OP_COPY, *self._copy)
+            self._copy = None
+
+    def finish(self):
+        self._flush_copy()
+        return bytes(self.buffer)
+
+
+def block_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def find_resync(base, target, pos, anchors, block_size):
+    """Ищем в новом файле после pos блок старого файла, начинающийся с одного из смещений anchors"""
+    for offset in anchors:
+        anchor = base[offset:offset + ANCHOR_SIZE]
+        if len(anchor) < ANCHOR_SIZE:
+            continue
+        found = target.find(anchor, pos + 1, pos + RESYNC_WINDOW)
+        if found >= 0 and target[found:found + block_size] == base[offset:offset + block_size]:
+            return found, offset
+    return None
+
+
+def compute_delta(base_path, target_path, block_size=DELTA_BLOCK_SIZE, max_literal=None):
+    """Дельта target относительно base или None, если новых данных больше max_literal.
+
+    Блоки нового файла ищутся среди блоков старого по хэшу. После потери
+    совпадения данные ищутся в окне RESYNC_WINDOW с обеих сторон - так
+    находятся вставки и удаления, сдвигающие остаток файла.
+    """
+    with open(base_path, 'rb') as base_file, open(target_path, 'rb') as target_file:
+        with mmap.mmap(base_file.fileno(), 0, access=mmap.ACCESS_READ) as base, \
+                mmap.mmap(target_file.fileno(), 0, access=mmap.ACCESS_READ) as target:
+            index = {}
+            for offset in range(0, len(base) - block_size + 1, block_size):
+                index.setdefault(block_hash(base[offset:offset + block_size]), offset)
+
+            delta = DeltaBuilder()
+            size = len(target)
+            pos = literal_start = 0
+            expected = 0
+            next_search = 0
+            while pos + block_size <= size:
+                block = target[pos:pos + block_size]
+                if base[expected:expected + block_size] == block:
+                    base_offset = expected
+                else:
+                    base_offset = index.get(block_hash(block))
+
+                if base_offset is None and pos >= next_search:
+                    next_search = pos + RESYNC_STRIDE
+                    # Удаление: текущие данные встречаются в старом файле дальше
+                    found = base.find(block[:ANCHOR_SIZE], expected, expected + RESYNC_WINDOW)
+                    if found >= 0 and base[found:found + block_size] == block:
+                        base_offset = found
+                    else:
+                        # Вставка или замена: ожидаемый или следующий блок старого файла
+                        # встречается в новом дальше; все до него - новые данные
+                        resync = find_resync(base, target, pos, (expected, expected + block_size),
+                                             block_size)
+                        if resync:
+                            pos, expected = resync
+                            continue
+
+                if base_offset is None:
+                    pos += block_size
+                    if max_literal is not None and delta.literal + pos - literal_start > max_literal:
+                        return None
+                    continue
+
+                delta.data(target[literal_start:pos])
+                delta.copy(base_offset, block_size)
+                pos += block_size
+                literal_start = pos
+                expected = base_offset + block_size
+
+            # Хвост короче блока: копируем, если он совпадает с продолжением старого файла
+            tail = target[literal_start:size]
+            if literal_start == pos and tail and base[expected:expected + len(tail)] == tail:
+                delta.copy(expected, len(tail))
+            else:
+                delta.data(tail)
+            if max_literal is not None and delta.literal > max_literal:
+                return None
+            return delta.finish()
+
+
+def read_exact(stream, size):
+    data = stream.read(size)
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise InstallError("Дельта обновления обрезана")
+        data += chunk
+    return data
+
+
+def apply_delta(base_path, delta_stream, target_path):
+    """Собираем новый файл из старого и дельты, возвращаем (размер, CRC32)"""
+    size, crc = 0, 0
+    with open(base_path, 'rb') as base, open(target_path, 'wb') as dst:
+        while True:
+            op = delta_stream.read(1)
+            if not op:
+                break
+            if op[0] == OP_COPY:
+                offset, length = struct.unpack("<QQ", read_exact(delta_stream, 16))
+                base.seek(offset)
+                remaining = length
+                while remaining:
+                    chunk = base.read(min(hac_core.COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise InstallError(f"Старая версия файла короче ожидаемого: {base_path}")
+                    dst.write(chunk)
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                size += length
+            elif op[0] == OP_DATA:
+                (length,) = struct.unpack("<Q", read_exact(delta_stream, 8))
+                remaining = length
+                while remaining:
+                    chunk = read_exact(delta_stream, min(hac_core.COPY_CHUNK_SIZE, remaining))
+                    dst.write(chunk)
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                size += length
+            else:
+                raise InstallError("Дельта обновления повреждена")
+    return size, crc
+
+
+def source_crc(item):
+    """CRC32 исходного файла: у элементов архивов он уже известен"""
+    if item.crc is not None:
+        return item.crc
+    crc = 0
+    with item.opener() as src:
+        while True:
+            chunk = src.read(hac_pack.READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def local_path(item, temp_dir):
+    """Путь к файлу на диске: элементы архивов копируются во временную папку"""
+    if item.path:
+        return item.path
+    path = os.path.join(temp_dir, hashlib.sha1(item.name.encode('utf-8')).hexdigest())
+    if not os.path.exists(path):
+        os.makedirs(temp_dir, exist_ok=True)
+        with item.opener() as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, hac_core.COPY_CHUNK_SIZE)
+    return path
+
+
+def source_fingerprint(source):
+    """Отпечаток архива новой версии - такой же, как запишет полная установка из него"""
+    if os.path.isdir(source):
+        return None
+    archive = ArchiveSource(source)
+    with archive.open_zip() as zip_ref:
+        return archive.fingerprint(zip_ref)
+
+
+def files_fingerprint(files):
+    """Отпечаток новой версии по ее составу: SHA-256 отсортированных записей (имя, размер, CRC32).
+
+    Есть у любого патча, в том числе собранного из папок, где отпечатка архива нет.
+    """
+    digest = hashlib.sha256()
+    for name, size, crc, date_time in sorted(files):
+        digest.update(f"{name}\0{size}\0{crc}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def target_fingerprint(meta):
+    """Отпечаток, который патч записывает в манифест: архива новой версии, если он есть, иначе состава"""
+    return meta['fingerprint'] or meta.get('target') or ''
+
+
+def build_patch(old, new, output, codec=None, workers=None):
+    """Сборка патча из old в new (папки, hac.zip или hac.pak), возвращаем статистику"""
+    stats = {'added': 0, 'delta': 0, 'deleted': 0, 'unchanged': 0}
+    with hac_pack.open_sources(old) as old_items, hac_pack.open_sources(new) as new_items, \
+            tempfile.TemporaryDirectory() as temp_dir:
+        old_files = {i.name: i for i in old_items if not i.is_dir()}
+        old_records = {name: (item.size, source_crc(item)) for name, item in old_files.items()}
+        by_content = {}
+        for name, record in sorted(old_records.items()):
+            by_content.setdefault(record, name)
+
+        meta = {'version': PATCH_VERSION, 'base': {}, 'deltas': [], 'files': [],
+                'deleted': sorted(set(old_files) - {i.name for i in new_items}),
+                'fingerprint': source_fingerprint(new)}
+        stats['deleted'] = len(meta['deleted'])
+
+        full, deltas = [], []
+        for item in new_items:
+            if item.is_dir():
+                meta['files'].append([item.name, 0, 0, list(item.date_time)])
+                full.append(item)
+                continue
+            record = (item.size, source_crc(item))
+            meta['files'].append([item.name, record[0], record[1], list(item.date_time)])
+            if old_records.get(item.name) == record:
+                stats['unchanged'] += 1
+                continue
+
+            base_name = by_content.get(record)
+            delta = None
+            if base_name is not None:
+                # Файл переименован или скопирован - одна операция копирования
+                builder = DeltaBuilder()
+                builder.copy(0, record[0])
+                delta = builder.finish()
+            elif item.name in old_files and min(item.size, old_files[item.name].size) >= MIN_DELTA_SIZE:
+                base_name = item.name
+                delta = compute_delta(local_path(old_files[base_name], os.path.join(temp_dir, "old")),
+                                      local_path(item, os.path.join(temp_dir, "new")),
+                                      max_literal=int(item.size * MAX_DELTA_RATIO))
+            if delta is None:
+                full.append(item)
+                stats['added'] += 1
+            else:
+                deltas.append((item.name, base_name, delta))
+                meta['base'][base_name] = list(old_records[base_name])
+                stats['delta'] += 1
+        meta['target'] = files_fingerprint(meta['files'])
+
+        with hac_pack.PackWriter(output, codec, workers=workers) as writer:
+            for item in hac_pack.order_sources(full, {}):
+                if item.is_dir():
+                    writer.add_dir(item.name, item.date_time)
+                    continue
+                with item.opener() as src:
+                    writer.add_file(item.name, src, item.date_time,
+                                    compress=not hac_pack.is_stored_name(item.name),
+                                    align=item.size >= hac_pack.LARGE_FILE_SIZE)
+            for name, base_name, delta in deltas:
+                writer.add_file(DELTA_PREFIX + name, io.BytesIO(delta), time.localtime()[:6])
+                meta['deltas'].append([name, base_name])
+            writer.add_file(PATCH_META, io.BytesIO(json.dumps(meta, ensure_ascii=False).encode('utf-8')),
+                            time.localtime()[:6])
+    hac_core.write_archive_digest(output)
+    return stats
+
+
+def find_embedded_patch():
+    """Файл обновления рядом с лаунчером, None - если его нет"""
+    path = hac_core.find_embedded_file((PATCH_NAME,))
+    return ArchiveSource(path) if path else None
+
+
+def load_patch_meta(pack):
+    """Описание патча из открытого архива"""
+    for member in pack.infolist():
+        if member.filename == PATCH_META:
+            with pack.open(member) as src:
+                meta = json.loads(src.read())
+            if meta.get('version') != PATCH_VERSION:
+                raise InstallError(f"Неподдерживаемая версия обновления: {meta.get('version')}")
+            return meta
+    raise InstallError("Файл не является обновлением игры")
+
+
+def select_patch(meta, selection):
+    """Часть патча для установленных компонентов: (файлы, дельты, исходные файлы дельт)"""
+    files = [entry for entry in meta['files'] if selection.is_selected(entry[0])]
+    names = {entry[0] for entry in files}
+    deltas = [entry for entry in meta['deltas'] if entry[0] in names]
+    base = {base_name: meta['base'][base_name] for name, base_name in deltas}
+    return files, deltas, base
+
+
+def check_patch_base(install_dir, manifest, base):
+    """Патч применим, только если исходные файлы дельт совпадают с установленными.
+
+    base - исходные файлы дельт для установленных компонентов (select_patch).
+    """
+    for name, (size, crc) in base.items():
+        record = manifest.get(name)
+        path = member_target_path(install_dir, name)
+        if record is None or tuple(record[:2]) != (size, crc) or \
+                not os.path.isfile(path) or os.path.getsize(path) != size:
+            raise InstallError("Обновление предназначено для другой версии игры. "
+                               "Переустановите игру полностью.")
+
+
+def is_patch_applicable(install_dir, patch):
+    """Подходит ли патч к установленной игре (для предложения обновиться при запуске)"""
+    try:
+        manifest = InstallManifest.load(install_dir)
+        if manifest is None:
+            return False
+        with patch.open_zip() as pack:
+            meta = load_patch_meta(pack)
+        # Уже обновлено этим патчем или установлено из архива новой версии
+        if manifest.fingerprint and manifest.fingerprint in (meta['fingerprint'], meta.get('target')):
+            return False
+        files, deltas, base = select_patch(meta, manifest.selection or InstallSelection())
+        check_patch_base(install_dir, manifest, base)
+        return True
+    except Exception:
+        return False
+
+
+def apply_patch(install_dir, patch=None, progress=None, workers=None, io_backend=None, throttle=None):
+    """Обновление установленной игры патчем.
+
+    Дельты собираются во временные файлы рядом с целевыми, новые файлы
+    распаковываются на место, затем временные файлы подменяют старые,
+    удаленные файлы стираются, и записывается манифест новой версии.
+    Запись в реестр версий и ярлык остаются за вызывающим кодом.
+    """
+    progress = progress or ProgressChannel()
+    progress.publish(5, "Подготовка обновления...", "Обновление")
+
+    patch = patch or find_embedded_patch()
+    if not patch:
+        raise InstallError("Не найден файл обновления!")
+    patch.check_size()
+
+    manifest = InstallManifest.load(install_dir) if install_dir and os.path.exists(install_dir) else None
+    if manifest is None:
+        raise InstallError("Не найден манифест установки. Переустановите игру.")
+
+    # SHA-256 патча сверяется по данным, которые читает обновление, начиная с его метаданных
+    verifier = patch.start_verifier()
+    stop_event = verifier.failed if verifier else None
+    try:
+        with patch.open_zip() as pack:
+            meta = load_patch_meta(pack)
+            members = pack.infolist()
+        # Обновляются только установленные компоненты - выбор берется из манифеста;
+        # исходные файлы дельт невыбранных компонентов не установлены и не проверяются
+        selection = manifest.selection or InstallSelection()
+        files, deltas, base = select_patch(meta, selection)
+        check_patch_base(install_dir, manifest, base)
+        targets = {entry[0]: hac_pack.PackMember(*entry, block=0, offset=0) for entry in files}
+        # Новые файлы целиком - обычной распаковкой
+        full = [m for m in members if m.filename in targets]
+
+        # Временные файлы дельт лежат рядом со старыми до подмены - на диске одновременно обе версии
+        with span("preflight") as phase:
+            cluster = cluster_size(install_dir)
+            needed = sum(on_disk_size(targets[name].file_size, cluster) for name, base_name in deltas)
+            needed += space_needed(install_dir, full, in_place=True, cluster=cluster)
+            phase.set(needed=needed, cluster=cluster)
+            check_disk_space(install_dir, max(0, needed))
+    except Exception as e:
+        # Индекс или описание не читаются из-за повреждения - сообщаем о повреждении
+        if verifier:
+            verifier.wait()
+        if isinstance(e, InstallError):
+            raise
+        raise InstallError(f"Ошибка чтения обновления: {str(e)}")
+
+    workers = max(1, workers or hac_core.get_extract_workers())
+    throttle = throttle or hac_core.Throttle()
+
+    # Дельты: собираем новые версии файлов во временные файлы
+    members_by_name = {m.filename: m for m in members}
+    temp_files = []
+    temp_lock = threading.Lock()
+    done = [0]
+
+    def build(name, base_name):
+        if stop_event is not None and stop_event.is_set():
+            raise InstallError("Обновление остановлено")
+        target = member_target_path(install_dir, name)
+        temp = target + PATCH_TEMP_SUFFIX
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with temp_lock:
+            temp_files.append((temp, target, name))
+        with patch.open_zip() as pack, pack.open(members_by_name[DELTA_PREFIX + name]) as delta:
+            size, crc = apply_delta(member_target_path(install_dir, base_name), delta, temp)
+        throttle.consume(size, files=1, stop_event=stop_event)
+        member = targets[name]
+        if (size, crc) != (member.file_size, member.CRC):
+            raise InstallError(f"Файл {base_name} изменен после установки - проверьте файлы игры")
+        timestamp = member_timestamp(member)
+        os.utime(temp, (timestamp, timestamp))
+        with temp_lock:
+            done[0] += 1
+            progress.publish(10 + done[0] / len(deltas) * 40,
+                             f"Применение изменений: {done[0]}/{len(deltas)} файлов", "Обновление")
+
+    def discard_temp_files():
+        for temp, target, name in temp_files:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    try:
+        with span("apply_deltas", files=len(deltas), workers=workers), \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build, name, base_name) for name, base_name in deltas]
+            for future in as_completed(futures):
+                future.result()
+
+        def on_progress(done_files, total_files, done_bytes, total_bytes):
+            value = 50 + (done_bytes / total_bytes if total_bytes else done_files / total_files) * 30
+            progress.update_transfer(done_bytes)
+            progress.publish(value, f"Новые файлы: {done_files}/{total_files}, "
+                                    f"{hac_core.format_size(done_bytes)} из {hac_core.format_size(total_bytes)}",
+                             "Обновление")
+
+        io_backend = io_backend or hac_core.IOBackend()
+        engine = ExtractionEngine(patch, install_dir, workers=workers, progress_callback=on_progress,
+                                  stop_event=stop_event, io_backend=io_backend,
+                                  fsync_policy=io_backend.fsync_policy or hac_core.FSYNC_NONE,
+                                  throttle=throttle)
+        total_bytes = sum(m.file_size for m in full)
+        progress.begin_transfer(total_bytes)
+        try:
+            with span("extract", files=len(full), bytes=total_bytes, workers=workers) as phase:
+                extracted = engine.run(full)
+                phase.set(errors=len(engine.errors))
+        finally:
+            progress.end_transfer()
+
+        if verifier:
+            progress.publish(80, "Проверка целостности обновления...", "Проверка архива")
+            verifier.wait()
+    except Exception as e:
+        discard_temp_files()
+        # Остановка или ошибка распаковки из-за поврежденного патча - сообщаем о повреждении.
+        # wait() дочитывает блоки, прочитанные не целиком: повреждение в них иначе не найти
+        if verifier:
+            verifier.wait()
+        if isinstance(e, InstallError):
+            raise
+        raise InstallError(f"Ошибка при обновлении: {str(e)}")
+
+    progress.publish(85, "Замена измененных файлов...", "Обновление")
+    for temp, target, name in temp_files:
+        hac_core.unlink_hardlink(target)
+        os.replace(temp, target)
+    removed = hac_core.remove_orphans(install_dir, meta['deleted'])
+
+    # Неизмененным файлам ставим дату новой версии, иначе быстрая проверка сочтет их измененными
+    for name, member in targets.items():
+        record = manifest.get(name)
+        if not member.is_dir() and record and tuple(record[:2]) == (member.file_size, member.CRC) \
+                and record[2] != dos_time(member.date_time):
+            timestamp = member_timestamp(member)
+            try:
+                os.utime(member_target_path(install_dir, name), (timestamp, timestamp))
+            except OSError:
+                pass
+
+    failed = {file for file, error in engine.errors}
+    game_exe_name = hac_core.pick_game_exe((m.filename, m.file_size) for m in targets.values()
+                                           if not m.is_dir())
+    new_manifest = InstallManifest.from_members([m for m in targets.values() if m.filename not in failed],
+                                                target_fingerprint(meta), selection, game_exe_name)
+    new_manifest.save(install_dir)
+
+    progress.publish(90, "Проверка обновленных файлов...", "Проверка")
+    report = hac_core.verify_installation(install_dir, new_manifest, workers=workers)
+    if report.missing or report.corrupt:
+        raise InstallError("Обновление установлено с ошибками:\n" + report.summary())
+
+    # Новые версии файлов - в общее хранилище; прежние удаляются из него, если не нужны другим версиям
+    written = [targets[name] for temp, target, name in temp_files]
+    written += [m for m in full if m.filename not in failed]
+    hac_core.update_store(hac_core.open_store(install_dir), install_dir, new_manifest, written)
+
+    game_exe = hac_core.find_game_exe(install_dir)
+    if not game_exe:
+        raise InstallError("Не найден исполняемый файл игры!")
+    return InstallResult(install_dir, game_exe, extracted + len(deltas), removed, engine.errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка патча между двумя версиями игры")
+    parser.add_argument("old", help="прошлая версия: папка, hac.zip или hac.pak")
+    parser.add_argument("new", help="новая версия: папка, hac.zip или hac.pak")
+    parser.add_argument("-o", "--output", default=PATCH_NAME)
+    parser.add_argument("--codec", choices=hac_pack.available_codecs(), default=hac_pack.default_codec())
+    parser.add_argument("--workers", type=int, default=None, help="число потоков сжатия")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        stats = build_patch(args.old, args.new, args.output, args.codec, args.workers)
+    except (hac_pack.PackError, OSError, ValueError) as e:
+        print(f"Ошибка: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(f"{args.output}: {os.path.getsize(args.output) / 1024 / 1024:.1f} МБ, "
+          f"новых файлов {stats['added']}, дельт {stats['delta']}, удалено {stats['deleted']}, "
+          f"без изменений {stats['unchanged']} ({time.perf_counter() - started:.1f} с)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Выбор устанавливаемых файлов: шаблоны include/exclude и именованные компоненты.
+
+Компоненты (HD-текстуры, озвучка, локализации) описываются в архиве игры
+файлом .hac_components.json:
+
+    {"components": [
+        {"id": "hd", "name": "HD-текстуры", "include": ["textures/hd/"], "default": false},
+        {"id": "voice_en", "name": "Английская озвучка", "include": ["sound/voice/en/**"]}
+    ]}
+
+Файлы, не попавшие ни в один компонент, относятся к основной части игры
+и устанавливаются всегда.
+"""
+import json
+import re
+
+# Описание компонентов внутри архива игры (само не распаковывается)
+COMPONENTS_NAME = ".hac_components.json"
+
+# Прежний встроенный фильтр: элементы, в имени которых есть и "phone", и "button", не нужны
+DEFAULT_EXCLUDE = ("re:^(?=.*phone)(?=.*button)",)
+
+
+def glob_to_regex(pattern):
+    """Шаблон glob в регулярное выражение: ** - любые папки, * и ? - в пределах имени.
+
+    Шаблон без "/" сравнивается с именем файла в любой папке (как в .gitignore).
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    anchor = "^" if "/" in pattern.rstrip("/") else "(?:^|/)"
+    return anchor + "".join(parts) + "$"
+
+
+def is_directory_rule(pattern):
+    """Правило вида "папка/" или "папка/**" без других подстановок - проверяется по префиксу"""
+    prefix = pattern[:-2] if pattern.endswith("/**") else pattern
+    return prefix.endswith("/") and not any(c in prefix for c in "*?[")
+
+
+class RuleSet:
+    """Набор шаблонов, скомпилированный один раз (регистр не учитывается).
+
+    Шаблоны: glob ("textures/*.dds", "*.pdb"), папка ("sound/voice/en/")
+    или регулярное выражение с префиксом "re:". Правила-папки хранятся
+    в индексе префиксов: проверка имени - по одной операции на уровень вложенности.
+    """
+
+    def __init__(self, patterns=()):
+        self.patterns = [p.strip().replace("\\", "/") for p in patterns if p and p.strip()]
+        self.prefixes = set()
+        expressions = []
+        for pattern in self.patterns:
+            if pattern.startswith("re:"):
+                expressions.append(pattern[3:])
+            elif is_directory_rule(pattern):
+                prefix = pattern[:-2] if pattern.endswith("/**") else pattern
+                self.prefixes.add(prefix.lstrip("/").lower())
+            else:
+                expressions.append(glob_to_regex(pattern.lstrip("/")))
+        self.regex = None
+        if expressions:
+            self.regex = re.compile("|".join(f"(?:{e})" for e in expressions), re.IGNORECASE)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def matches(self, name):
+        if self.prefixes:
+            lowered = name.lower()
+            position = lowered.find("/")
+            while position >= 0:
+                if lowered[:position + 1] in self.prefixes:
+                    return True
+                position = lowered.find("/", position + 1)
+        return bool(self.regex and self.regex.search(name))
+
+
+class Component:
+    """Именованная часть игры, которую можно не устанавливать"""
+
+    def __init__(self, component_id, name=None, include=(), default=True, description=""):
+        self.id = component_id
+        self.name = name or component_id
+        self.include = list(include)
+        self.default = default
+        self.description = description
+        self.rules = RuleSet(include)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'include': self.include,
+                'default': self.default, 'description': self.description}
+
+
+class ComponentCatalog:
+    """Компоненты игры из .hac_components.json; файл относится к первому подходящему"""
+
+    def __init__(self, components=()):
+        self.components = list(components)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(Component(item['id'], item.get('name'), item.get('include', ()),
+                             item.get('default', True), item.get('description', ""))
+                   for item in (data or {}).get('components', ()))
+
+    @classmethod
+    def from_archive(cls, zip_ref):
+        """Каталог из открытого архива (zip или hac.pak); пустой, если описания нет"""
+        for member in zip_ref.infolist():
+            if member.filename == COMPONENTS_NAME:
+                with zip_ref.open(member) as src:
+                    return cls.from_dict(json.loads(src.read()))
+        return cls()
+
+    def to_dict(self):
+        return {'components': [component.to_dict() for component in self.components]}
+
+    def __bool__(self):
+        return bool(self.components)
+
+    def __iter__(self):
+        return iter(self.components)
+
+    def ids(self):
+        return [component.id for component in self.components]
+
+    def defaults(self):
+        return [component.id for component in self.components if component.default]
+
+    def component_of(self, name):
+        """id компонента файла или None - основная часть игры"""
+        for component in self.components:
+            if component.rules.matches(name):
+                return component.id
+        return None
+
+    def sizes(self, members):
+        """Размер каждого компонента (и основной части под ключом None) по элементам архива"""
+        sizes = dict.fromkeys([None] + self.ids(), 0)
+        for member in members:
+            if not member.is_dir() and member.filename != COMPONENTS_NAME:
+                sizes[self.component_of(member.filename)] += member.file_size
+        return sizes
+
+
+class InstallSelection:
+    """Что устанавливать: компоненты и пользовательские шаблоны include/exclude.
+
+    Сохраняется в манифесте, чтобы переустановка, обновление и проверка
+    работали с тем же набором файлов.
+    """
+
+    def __init__(self, components=None, include=(), exclude=(), catalog=None):
+        # None - компоненты по умолчанию из каталога
+        self.components = None if components is None else list(components)
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.catalog = catalog or ComponentCatalog()
+        self._include = RuleSet(self.include)
+        self._exclude = RuleSet(list(DEFAULT_EXCLUDE) + self.exclude)
+
+    def bind(self, catalog):
+        """Привязываем к каталогу компонентов архива; неизвестные компоненты отбрасываются"""
+        self.catalog = catalog
+        if self.components is not None:
+            known = set(catalog.ids())
+            self.components = [c for c in self.components if c in known]
+        return self
+
+    @property
+    def selected_components(self):
+        if self.components is None:
+            return self.catalog.defaults()
+        return self.components
+
+    def is_selected(self, name):
+        if name == COMPONENTS_NAME or self._exclude.matches(name):
+            return False
+        if self._include and not self._include.matches(name):
+            return False
+        component = self.catalog.component_of(name) if self.catalog else None
+        return component is None or component in self.selected_components
+
+    def to_json(self):
+        return json.dumps({'components': self.selected_components, 'include': self.include,
+                           'exclude': self.exclude, 'catalog': self.catalog.to_dict()},
+                          ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        """Выбор из манифеста; None, если его там нет (установка до появления компонентов)"""
+        if not text:
+            return None
+        data = json.loads(text)
+        return cls(data.get('components'), data.get('include', ()), data.get('exclude', ()),
+                   ComponentCatalog.from_dict(data.get('catalog')))
+
+    def component_filter(self, ids):
+        """Отбор файлов выбранных компонентов (для проверки части игры); "core" - основная часть"""
+        ids = set(ids)
+        return lambda name: (self.catalog.component_of(name) or "core") in ids
@@ -0,0 +1,42 @@
+"""Ярлык игры на рабочем столе (Windows). pywin32 и winshell загружаются только при вызове"""
+import os
+
+SHORTCUT_NAME = "HAC Game.lnk"
+
+
+def get_shortcut_path():
+    """Путь к ярлыку игры на рабочем столе"""
+    import winshell
+    return os.path.join(winshell.desktop(), SHORTCUT_NAME)
+
+
+def create_shortcut(install_dir, exe_path):
+    """Создание ярлыка, возвращает путь к ярлыку или None, если он не появился"""
+    import pythoncom
+    from win32com.client import Dispatch
+
+    # Инициализация COM для текущего потока
+    pythoncom.CoInitialize()
+    try:
+        shortcut_path = get_shortcut_path()
+        shell = Dispatch('WScript.Shell')
+        shortcut = shell.CreateShortCut(shortcut_path)
+        shortcut.TargetPath = exe_path
+        shortcut.WorkingDirectory = install_dir
+        shortcut.IconLocation = exe_path
+        shortcut.save()
+
+        # Проверяем, что ярлык создан
+        return shortcut_path if os.path.exists(shortcut_path) else None
+    finally:
+        # Деинициализация COM
+        pythoncom.CoUninitialize()
+
+
+def delete_shortcut():
+    """Удаление ярлыка с рабочего стола"""
+    shortcut_path = get_shortcut_path()
+    if os.path.exists(shortcut_path):
+        os.remove(shortcut_path)
+        return True
+    return False
@@ -0,0 +1,450 @@
+"""Несколько версий игры рядом: общее хранилище файлов и реестр установленных версий.
+
+Хранилище включается явно (HAC_STORE=1, --store). Файлы хранятся в нем
+один раз, по SHA-256 содержимого, а в папки версий попадают их клоны
+copy-on-write (ReFS, Btrfs, XFS, APFS): общие данные занимают место на
+диске один раз, а игра может менять свои файлы на месте, не задевая
+другие версии. На томах без клонов (NTFS, ext4) хранилище не ведется:
+обычные копии только удвоили бы занятое место. Перед выдачей новой версии
+файл хранилища сверяется со своим хешем. Хранилище лежит рядом с папками
+версий (клоны работают только в пределах тома):
+
+    D:\\Games\\HAC 1.0\\...   D:\\Games\\HAC 1.1\\...   D:\\Games\\.hac_store\\objects\\...
+
+В индексе хранилища записано, какие файлы есть в каждой версии; файлы,
+которых после удаления версии нет ни в одной из них, удаляются.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import uuid
+from datetime import datetime
+
+from hac_log import LOG_DIR, log_event
+
+# Папка хранилища рядом с папками версий
+STORE_DIR_NAME = ".hac_store"
+
+# Индекс хранилища: файлы и ссылки версий на них
+STORE_INDEX_NAME = "store.db"
+STORE_VERSION = 2
+
+# Мелкие файлы (настройки, скрипты) не разделяются между версиями: выигрыш меньше затрат на индекс
+STORE_MIN_SIZE = 64 * 1024
+
+# Реестр установленных версий (заменил installation_info.txt с единственным путем)
+REGISTRY_FILE = os.path.join(LOG_DIR, "installations.json")
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Linux: ioctl FICLONE (Btrfs, XFS); Windows: FSCTL_DUPLICATE_EXTENTS_TO_FILE (ReFS)
+FICLONE = 0x40049409
+FSCTL_DUPLICATE_EXTENTS_TO_FILE = 0x00098344
+CLONE_CHUNK_SIZE = 1024 * 1024 * 1024
+
+
+def is_storable(size):
+    return size >= STORE_MIN_SIZE
+
+
+def version_id(path):
+    """Версия в индексе и реестре - нормализованный путь ее папки"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _clone_windows(source, target):
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    class DuplicateExtentsData(ctypes.Structure):
+        _fields_ = [("FileHandle", wintypes.HANDLE), ("SourceFileOffset", ctypes.c_longlong),
+                    ("TargetFileOffset", ctypes.c_longlong), ("ByteCount", ctypes.c_longlong)]
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.DeviceIoControl.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.LPVOID, wintypes.DWORD,
+                                         wintypes.LPVOID, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD),
+                                         wintypes.LPVOID]
+    sectors, sector_size = ctypes.c_ulong(), ctypes.c_ulong()
+    root = os.path.splitdrive(os.path.abspath(target))[0] + "\\"
+    if not kernel32.GetDiskFreeSpaceW(root, ctypes.byref(sectors), ctypes.byref(sector_size), None, None):
+        return False
+    cluster = sectors.value * sector_size.value
+    size = os.path.getsize(source)
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        # Размер копии задается заранее, диапазоны выравниваются по кластеру
+        dst.truncate(size)
+        dst.flush()
+        data = DuplicateExtentsData(msvcrt.get_osfhandle(src.fileno()), 0, 0, 0)
+        returned = wintypes.DWORD()
+        aligned, offset = -(-size // cluster) * cluster, 0
+        while offset < aligned:
+            data.SourceFileOffset = data.TargetFileOffset = offset
+            data.ByteCount = min(CLONE_CHUNK_SIZE, aligned - offset)
+            if not kernel32.DeviceIoControl(msvcrt.get_osfhandle(dst.fileno()), FSCTL_DUPLICATE_EXTENTS_TO_FILE,
+                                            ctypes.byref(data), ctypes.sizeof(data), None, 0,
+                                            ctypes.byref(returned), None):
+                return False
+            offset += data.ByteCount
+    return True
+
+
+def clone_file(source, target):
+    """Копия файла без копирования данных (copy-on-write); False, если файловая система так не умеет.
+
+    Изменения копии не затрагивают исходный файл. Неудачная попытка не оставляет target.
+    """
+    try:
+        if sys.platform == "win32":
+            cloned = _clone_windows(source, target)
+        elif sys.platform == "darwin":
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            cloned = libc.clonefile(os.fsencode(source), os.fsencode(target), 0) == 0
+        elif sys.platform.startswith("linux"):
+            import fcntl
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    cloned = True
+                except OSError:
+                    cloned = False
+        else:
+            cloned = False
+    except (OSError, AttributeError, ValueError):
+        cloned = False
+    if not cloned:
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+    return cloned
+
+
+class ContentStore:
+    """Хранилище файлов игры: objects/<2 символа хеша>/<SHA-256> и индекс SQLite"""
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, STORE_INDEX_NAME)
+        # Умеет ли том клонировать файлы: None - еще не пробовали
+        self.cloning = None
+
+    @classmethod
+    def for_install(cls, install_dir):
+        """Хранилище для папки установки; None, если папка - корень диска (хранилищу негде лежать)"""
+        install_dir = os.path.abspath(install_dir)
+        parent = os.path.dirname(install_dir)
+        if not parent or parent == install_dir:
+            return None
+        return cls(os.path.join(parent, STORE_DIR_NAME))
+
+    def exists(self):
+        return os.path.isfile(self.index_path)
+
+    def object_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def _connect(self):
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.index_path)
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+            if row is not None and row[0] != str(STORE_VERSION):
+                # Хранилище прежнего формата (ключи по CRC32) - собираем заново
+                conn.execute("DROP TABLE IF EXISTS objects")
+                conn.execute("DROP TABLE IF EXISTS refs")
+                shutil.rmtree(self.objects_dir, ignore_errors=True)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('format_version', ?)", (str(STORE_VERSION),))
+            conn.execute("CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, size INTEGER) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS refs (version TEXT, name TEXT, key TEXT, "
+                         "PRIMARY KEY (version, name)) WITHOUT ROWID")
+            conn.execute("CREATE INDEX IF NOT EXISTS refs_key ON refs (key)")
+        return conn
+
+    def _clone(self, source, target):
+        """Клон файла; SHA-256 полученной копии или None, если клонировать не удалось"""
+        if not clone_file(source, target):
+            return None
+        return file_sha256(target)
+
+    def can_clone(self):
+        """Пробный клон на томе хранилища: без клонов хранилище не ведется"""
+        if self.cloning is None:
+            # Пробуем рядом с хранилищем, если его еще нет: на томе без клонов оно и не появится
+            probe_dir = self.root if os.path.isdir(self.root) else os.path.dirname(self.root)
+            os.makedirs(probe_dir, exist_ok=True)
+            probe = os.path.join(probe_dir, f".hac-probe-{uuid.uuid4().hex}")
+            try:
+                with open(probe, 'wb') as f:
+                    f.write(b"hac")
+                self.cloning = clone_file(probe, probe + ".clone")
+            finally:
+                for path in (probe, probe + ".clone"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            log_event("info", "store_clone", root=self.root, supported=self.cloning)
+        return self.cloning
+
+    def remove(self):
+        """Удаляем хранилище целиком: папки версий своих файлов с ним не делят"""
+        shutil.rmtree(self.root, ignore_errors=True)
+        log_event("info", "store_removed", root=self.root)
+
+    def available(self, keys):
+        """Какие из ключей есть в индексе хранилища; содержимое сверяется при выдаче (checkout)"""
+        if not self.exists():
+            return set()
+        conn = self._connect()
+        try:
+            stored = {row[0] for row in conn.execute("SELECT key FROM objects")}
+        finally:
+            conn.close()
+        return stored & set(keys)
+
+    def checkout(self, key, target):
+        """Клон файла хранилища в папку версии; False, если файла нет, он поврежден
+        или клонировать не удалось (тогда распакуем из архива).
+
+        Хеш полученной копии сверяется с ключом: испорченный файл удаляется из хранилища.
+        """
+        source = self.object_path(key)
+        if not os.path.isfile(source):
+            return False
+        if os.path.lexists(target):
+            os.remove(target)
+        digest = self._clone(source, target)
+        if digest is None:
+            return False
+        if digest != key:
+            os.remove(target)
+            log_event("warning", "store_corrupt", root=self.root, key=key)
+            self.discard([key])
+            return False
+        return True
+
+    def add_files(self, version, items):
+        """Добавляем файлы версии (имя, путь, ожидаемый SHA-256 или None); возвращаем число добавленных.
+
+        Файл, который не совпал с ожидаемым хешем или не клонировался, в версии больше не числится.
+        На томе без клонов ничего не добавляется.
+        """
+        if not self.can_clone():
+            return 0
+        added, refs, dropped = [], [], []
+        version = version_id(version)
+        for name, path, expected in items:
+            try:
+                key = expected or file_sha256(path)
+                target = self.object_path(key)
+                if not os.path.exists(target):
+                    size = os.path.getsize(path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    incoming = f"{target}.{uuid.uuid4().hex}.tmp"
+                    try:
+                        digest = self._clone(path, incoming)
+                        if digest is None:
+                            dropped.append((version, name))
+                            continue
+                        if digest != key:
+                            log_event("warning", "store_mismatch", root=self.root, name=name)
+                            dropped.append((version, name))
+                            continue
+                        os.replace(incoming, target)
+                    finally:
+                        if os.path.exists(incoming):
+                            os.remove(incoming)
+                    added.append((key, size))
+                refs.append((version, name, key))
+            except FileNotFoundError:
+                dropped.append((version, name))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO objects VALUES (?, ?)", added)
+                conn.executemany("INSERT OR REPLACE INTO refs VALUES (?, ?, ?)", refs)
+                conn.executemany("DELETE FROM refs WHERE version = ? AND name = ?", dropped)
+        finally:
+            conn.close()
+        return len(added)
+
+    def add_refs(self, version, refs):
+        """Файлы (имя, ключ), которые версия получила из хранилища"""
+        version = version_id(version)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO refs VALUES (?, ?, ?)",
+                                 ((version, name, key) for name, key in refs))
+        finally:
+            conn.close()
+
+    def retain_refs(self, version, names):
+        """Оставляем у версии только файлы с этими именами (остальных в ней больше нет)"""
+        version = version_id(version)
+        names = set(names)
+        conn = self._connect()
+        try:
+            with conn:
+                stale = [(version, row[0]) for row in conn.execute("SELECT name FROM refs WHERE version = ?",
+                                                                   (version,)) if row[0] not in names]
+                conn.executemany("DELETE FROM refs WHERE version = ? AND name = ?", stale)
+        finally:
+            conn.close()
+
+    def discard(self, keys):
+        """Убираем из хранилища поврежденные файлы: новые версии их не получат"""
+        keys = list(keys)
+        if not keys or not self.exists():
+            return
+        for key in keys:
+            try:
+                os.remove(self.object_path(key))
+            except FileNotFoundError:
+                pass
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM objects WHERE key = ?", ((key,) for key in keys))
+        finally:
+            conn.close()
+
+    def release(self, version):
+        """Версия удалена - ее файлы больше не удерживаются в хранилище"""
+        if not self.exists():
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM refs WHERE version = ?", (version_id(version),))
+        finally:
+            conn.close()
+
+    def collect(self, live=None):
+        """Удаляем файлы, которых нет ни в одной версии; возвращаем (файлов, байт).
+
+        live(путь версии) - проверка, что версия еще на месте: ссылки папок,
+        удаленных вручную, снимаются. Пустое хранилище удаляется целиком.
+        """
+        if not self.exists():
+            return 0, 0
+        removed, freed = [], 0
+        conn = self._connect()
+        try:
+            with conn:
+                if live is not None:
+                    versions = [row[0] for row in conn.execute("SELECT DISTINCT version FROM refs")]
+                    dead = [(version,) for version in versions if not live(version)]
+                    conn.executemany("DELETE FROM refs WHERE version = ?", dead)
+                garbage = conn.execute("SELECT key, size FROM objects "
+                                       "WHERE key NOT IN (SELECT key FROM refs)").fetchall()
+                for key, size in garbage:
+                    try:
+                        os.remove(self.object_path(key))
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        continue
+                    freed += size
+                    removed.append((key,))
+                conn.executemany("DELETE FROM objects WHERE key = ?", removed)
+                empty = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM objects) "
+                                     "AND NOT EXISTS (SELECT 1 FROM refs)").fetchone()[0]
+        finally:
+            conn.close()
+        if empty:
+            shutil.rmtree(self.root, ignore_errors=True)
+        log_event("info", "store_gc", root=self.root, removed=len(removed), freed=freed)
+        return len(removed), freed
+
+    def stats(self):
+        """Число файлов в хранилище, их объем и число версий, в которых они есть"""
+        if not self.exists():
+            return {'objects': 0, 'bytes': 0, 'versions': 0}
+        conn = self._connect()
+        try:
+            objects, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            versions = conn.execute("SELECT COUNT(DISTINCT version) FROM refs").fetchone()[0]
+        finally:
+            conn.close()
+        return {'objects': objects, 'bytes': size, 'versions': versions}
+
+
+class VersionRegistry:
+    """Установленные версии игры и текущая (та, что запускается ярлыком и обслуживается окном)"""
+
+    def __init__(self, versions=None, active=None, path=REGISTRY_FILE):
+        self.versions = versions or []
+        self.active = active
+        self.path = path
+
+    @classmethod
+    def load(cls, path=REGISTRY_FILE):
+        """Читаем реестр; пустой, если файла нет или он поврежден"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(list(data.get('versions', [])), data.get('active'), path)
+        except (OSError, ValueError, AttributeError):
+            return cls(path=path)
+
+    def save(self):
+        """Записываем реестр атомарно: во временный файл и переименование"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'active': self.active, 'versions': self.versions}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def paths(self):
+        return [entry['path'] for entry in self.versions]
+
+    def find(self, path):
+        for entry in self.versions:
+            if version_id(entry['path']) == version_id(path):
+                return entry
+        return None
+
+    def add(self, path, **info):
+        """Добавляем или обновляем версию и делаем ее текущей"""
+        entry = self.find(path)
+        if entry is None:
+            entry = {'path': path, 'name': os.path.basename(os.path.normpath(path))}
+            self.versions.append(entry)
+        entry.update(info, installed_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        self.active = entry['path']
+        return entry
+
+    def remove(self, path):
+        """Убираем версию; если она была текущей - текущей становится последняя установленная"""
+        entry = self.find(path)
+        if entry is not None:
+            self.versions.remove(entry)
+        if self.active and version_id(self.active) == version_id(path):
+            self.active = self.versions[-1]['path'] if self.versions else None
+        return entry
+
+    def set_active(self, path):
+        entry = self.find(path)
+        if entry is None:
+            raise KeyError(path)
+        self.active = entry['path']
+        return entry
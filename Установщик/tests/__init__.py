@@ -0,0 +1,18 @@
+"""Регрессионные тесты ядра лаунчера (без интерфейса).
+
+Запуск из папки лаунчера:
+
+    python -m unittest discover -s tests -t .
+
+Журнал, реестр версий и отметку незавершенной установки лаунчер хранит
+в профиле пользователя (~/HAC_Launcher_Logs): на время тестов профиль
+подменяется временной папкой - до импорта модулей лаунчера.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+HOME_DIR = tempfile.mkdtemp(prefix="hac-tests-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = HOME_DIR
+atexit.register(shutil.rmtree, HOME_DIR, True)
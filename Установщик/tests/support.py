@@ -0,0 +1,82 @@
+"""Общее для тестов: папки с игрой, упаковка в hac.pak и подсчет места на диске"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import hac_core
+import hac_pack
+
+# Кодек из стандартной библиотеки: тесты не зависят от zstandard и lz4
+TEST_CODEC = "zlib"
+
+# Мелкие блоки: даже небольшая игра занимает в архиве несколько блоков
+TEST_BLOCK_SIZE = 64 * 1024
+
+
+def write_files(root, files):
+    """Папка с игрой: files - {имя: данные}; имя с "/" на конце - пустая папка"""
+    for name, data in files.items():
+        path = os.path.join(root, *name.rstrip("/").split("/"))
+        if name.endswith("/"):
+            os.makedirs(path, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return root
+
+
+def read_files(root):
+    """Содержимое папки: {имя через "/": данные}, без служебных файлов лаунчера"""
+    files = {}
+    for dirpath, dirs, names in os.walk(root):
+        for name in names:
+            if name.startswith(".hac_"):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return files
+
+
+def pack_game(source, output):
+    """hac.pak из папки с игрой и контрольная сумма рядом - как в build.bat"""
+    hac_pack.pack(source, output, codec=TEST_CODEC, block_size=TEST_BLOCK_SIZE)
+    hac_core.write_archive_digest(output)
+    return hac_core.ArchiveSource(output)
+
+
+def disk_usage(*roots):
+    """Объем файлов в папках; данные, общие для нескольких имен (жесткие ссылки), считаются один раз"""
+    seen, total = set(), 0
+    for root in roots:
+        for dirpath, dirs, names in os.walk(root):
+            for name in names:
+                stat = os.lstat(os.path.join(dirpath, name))
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    total += stat.st_size
+    return total
+
+
+class LauncherTestCase(unittest.TestCase):
+    """Тест во временной папке; общее хранилище версий выключено, пока тест не включит его сам"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="hac-test-")
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        previous = os.environ.pop("HAC_STORE", None)
+        if previous is not None:
+            self.addCleanup(os.environ.__setitem__, "HAC_STORE", previous)
+        self.addCleanup(os.environ.pop, "HAC_STORE", None)
+        self.addCleanup(hac_core.clear_pending_install)
+
+    def path(self, *parts):
+        return os.path.join(self.work_dir, *parts)
+
+    def assertInstalled(self, install_dir, files):
+        """Установка совпадает с файлами игры и проходит полную проверку CRC32"""
+        self.assertEqual(read_files(install_dir), {n: d for n, d in files.items() if not n.endswith("/")})
+        report = hac_core.verify_installation(install_dir, hac_core.InstallManifest.load(install_dir), deep=True)
+        self.assertTrue(report.ok, report.summary())
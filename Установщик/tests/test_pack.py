@@ -0,0 +1,141 @@
+"""hac.pak: упаковка, установка с полной проверкой, восстановление и продолжение после сбоя"""
+import os
+import stat
+import subprocess
+import sys
+import time
+import unittest
+
+import hac_core
+import hac_pack
+from tests.support import LauncherTestCase, pack_game, write_files
+
+LAUNCHER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Установка в отдельном процессе, которую тест прерывает, как сбой питания или снятие задачи
+INSTALL_SCRIPT = ("import sys, hac_core\n"
+                  "hac_core.install_game(sys.argv[1], archive=hac_core.ArchiveSource(sys.argv[2]), workers=1)\n")
+
+
+def game_files():
+    """Мелкие файлы, файл на несколько блоков, несжимаемые данные, дубликаты и пустая папка"""
+    shared = os.urandom(100 * 1024)
+    files = {
+        "HAC.exe": b"MZ" + os.urandom(300 * 1024),
+        "data/config.ini": b"[game]\r\nfullscreen=1\r\n",
+        "data/big.bin": b"".join(b"chunk %d\n" % i for i in range(40000)),
+        "textures/grass.png": os.urandom(200 * 1024),
+        "dups/a.bin": shared,
+        "dups/b.bin": shared,
+        "sounds/c.bin": shared,
+        "saves/": b"",
+    }
+    for i in range(30):
+        files[f"data/levels/{i}.txt"] = b"level %d\r\n" % i * 200
+    return files
+
+
+class PackInstallTest(LauncherTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.files = game_files()
+        self.archive = pack_game(write_files(self.path("game"), self.files), self.path("hac.pak"))
+        self.install_dir = self.path("games", "HAC")
+
+    def test_install_matches_game(self):
+        result = hac_core.install_game(self.install_dir, archive=self.archive)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(os.path.normcase(result.game_exe),
+                         os.path.normcase(os.path.join(self.install_dir, "HAC.exe")))
+        self.assertInstalled(self.install_dir, self.files)
+        self.assertTrue(os.path.isdir(os.path.join(self.install_dir, "saves")))
+
+    def test_duplicates_are_stored_once_and_installed_as_separate_files(self):
+        with open(self.archive.path, 'rb') as stream:
+            sources = {m.filename: m.source for m in hac_pack.PackFile(stream).infolist() if m.source}
+        self.assertEqual(len(sources), 2)
+
+        hac_core.install_game(self.install_dir, archive=self.archive)
+        for name in ("dups/a.bin", "dups/b.bin", "sounds/c.bin"):
+            self.assertEqual(os.stat(os.path.join(self.install_dir, name)).st_nlink, 1)
+        # Игра меняет один файл на месте - второй остается прежним
+        with open(os.path.join(self.install_dir, "dups", "b.bin"), 'r+b') as f:
+            f.write(b"changed")
+        with open(os.path.join(self.install_dir, "sounds", "c.bin"), 'rb') as f:
+            self.assertEqual(f.read(), self.files["sounds/c.bin"])
+
+    @unittest.skipIf(sys.platform == "win32", "права POSIX")
+    def test_extracted_files_are_not_executable(self):
+        hac_core.install_game(self.install_dir, archive=self.archive)
+        for name in ("data/config.ini", "data/big.bin", "textures/grass.png"):
+            mode = os.stat(os.path.join(self.install_dir, name)).st_mode
+            self.assertFalse(stat.S_IMODE(mode) & 0o111, name)
+
+    def test_corrupted_archive_is_rejected(self):
+        with open(self.archive.path, 'r+b') as f:
+            f.seek(self.archive.size // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with self.assertRaises(hac_core.ArchiveIntegrityError):
+            hac_core.install_game(self.install_dir, archive=hac_core.ArchiveSource(self.archive.path))
+        self.assertFalse(os.path.exists(self.install_dir))
+        self.assertFalse(os.path.exists(hac_core.staging_path(self.install_dir)))
+
+    def test_repair_extracts_only_damaged_files(self):
+        hac_core.install_game(self.install_dir, archive=self.archive)
+        with open(os.path.join(self.install_dir, "data", "levels", "7.txt"), 'r+b') as f:
+            f.write(b"XX")
+        report = hac_core.verify_installation(self.install_dir, hac_core.InstallManifest.load(self.install_dir),
+                                              deep=True)
+        self.assertEqual(report.corrupt, ["data/levels/7.txt"])
+
+        result = hac_core.install_game(self.install_dir, archive=self.archive, force=set(report.corrupt))
+        self.assertEqual(result.extracted, 1)
+        self.assertInstalled(self.install_dir, self.files)
+
+    def test_uninstall_removes_everything(self):
+        hac_core.install_game(self.install_dir, archive=self.archive)
+        hac_core.uninstall_game(self.install_dir)
+        self.assertFalse(os.path.exists(self.install_dir))
+
+
+class ResumeTest(LauncherTestCase):
+
+    def test_resume_after_killed_install(self):
+        files = {"HAC.exe": b"MZ" + os.urandom(1024)}
+        for i in range(300):
+            files[f"data/{i}.bin"] = os.urandom(2048)
+        archive = pack_game(write_files(self.path("game"), files), self.path("hac.pak"))
+        install_dir = self.path("games", "HAC")
+        journal = hac_core.InstallJournal(hac_core.staging_path(install_dir))
+
+        # Ограничение по числу файлов растягивает установку на несколько секунд
+        env = dict(os.environ, HAC_LIMIT_FILES="50")
+        process = subprocess.Popen([sys.executable, "-c", INSTALL_SCRIPT, install_dir, archive.path],
+                                   cwd=LAUNCHER_DIR, env=env)
+        try:
+            deadline = time.monotonic() + 60
+            while len(journal.load()) < hac_core.SMALL_BATCH_FILES and process.poll() is None:
+                self.assertLess(time.monotonic(), deadline, "установка не записала журнал")
+                time.sleep(0.05)
+            self.assertIsNone(process.poll(), "установка завершилась раньше, чем ее прервали")
+        finally:
+            process.kill()
+            process.wait()
+        self.assertFalse(os.path.exists(install_dir))
+        done = len(journal.load())
+
+        with archive.open_zip() as pack:
+            members = len(pack.infolist())
+        # Продолжение распаковывает только то, чего нет в журнале
+        result = hac_core.install_game(install_dir, archive=archive)
+        self.assertLessEqual(result.extracted, members - done)
+        self.assertInstalled(install_dir, files)
+        self.assertFalse(os.path.exists(hac_core.staging_path(install_dir)))
+        self.assertIsNone(hac_core.read_pending_install())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Патчи: сборка из папок и архивов, применение к установленной игре и повторное предложение"""
+import os
+import shutil
+import unittest
+
+import hac_core
+import hac_patch
+from tests.support import TEST_CODEC, LauncherTestCase, pack_game, read_files, write_files
+
+
+def versions():
+    """Две версии игры: измененный крупный файл (дельта), новый, удаленный и переименованный"""
+    big = os.urandom(1024 * 1024)
+    old = {
+        "HAC.exe": b"MZ" + os.urandom(100 * 1024),
+        "data/big.bin": big,
+        "data/gone.txt": b"removed in 1.1",
+        "data/same.txt": b"same" * 100,
+        "data/ren_a.bin": os.urandom(100 * 1024),
+    }
+    changed = bytearray(big)
+    changed[500000:500100] = b"X" * 100
+    changed[700000:700000] = b"inserted" * 50
+    new = dict(old, **{"data/big.bin": bytes(changed), "newdir/new.txt": b"added in 1.1",
+                       "data/ren_b.bin": old["data/ren_a.bin"]})
+    del new["data/gone.txt"], new["data/ren_a.bin"]
+    return old, new
+
+
+class PatchTest(LauncherTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old, self.new = versions()
+        self.old_dir = write_files(self.path("old"), self.old)
+        self.new_dir = write_files(self.path("new"), self.new)
+        self.old_archive = pack_game(self.old_dir, self.path("old.pak"))
+        self.install_dir = self.path("games", "HAC")
+
+    def build(self, old, new):
+        stats = hac_patch.build_patch(old, new, self.path("hac.patch"), codec=TEST_CODEC)
+        return stats, hac_core.ArchiveSource(self.path("hac.patch"))
+
+    def test_folder_patch_updates_installed_game(self):
+        stats, patch = self.build(self.old_dir, self.new_dir)
+        self.assertEqual((stats['delta'], stats['deleted']), (2, 2))
+        hac_core.install_game(self.install_dir, archive=self.old_archive)
+        self.assertTrue(hac_patch.is_patch_applicable(self.install_dir, patch))
+
+        hac_patch.apply_patch(self.install_dir, patch)
+        self.assertInstalled(self.install_dir, self.new)
+        self.assertFalse(hac_patch.is_patch_applicable(self.install_dir, patch))
+
+    def test_add_only_folder_patch_is_not_offered_again(self):
+        new_dir = write_files(self.path("added"), dict(self.old, **{"data/extra.txt": b"extra"}))
+        stats, patch = self.build(self.old_dir, new_dir)
+        self.assertEqual((stats['added'], stats['delta']), (1, 0))
+        hac_core.install_game(self.install_dir, archive=self.old_archive)
+
+        hac_patch.apply_patch(self.install_dir, patch)
+        self.assertTrue(hac_core.InstallManifest.load(self.install_dir).fingerprint)
+        self.assertFalse(hac_patch.is_patch_applicable(self.install_dir, patch))
+
+    def test_archive_patch_matches_full_install_of_new_version(self):
+        new_archive = pack_game(self.new_dir, self.path("new.pak"))
+        stats, patch = self.build(self.old_archive.path, new_archive.path)
+        hac_core.install_game(self.install_dir, archive=self.old_archive)
+
+        hac_patch.apply_patch(self.install_dir, patch)
+        self.assertInstalled(self.install_dir, self.new)
+        # После патча установка та же, что из архива новой версии: распаковывать нечего
+        self.assertEqual(hac_core.install_game(self.install_dir, archive=new_archive).extracted, 0)
+
+    def test_patch_for_other_version_is_refused(self):
+        other = self.path("other")
+        shutil.copytree(self.old_dir, other)
+        with open(os.path.join(other, "data", "big.bin"), 'r+b') as f:
+            f.write(b"other build")
+        stats, patch = self.build(other, self.new_dir)
+        hac_core.install_game(self.install_dir, archive=self.old_archive)
+        self.assertFalse(hac_patch.is_patch_applicable(self.install_dir, patch))
+
+        installed = hac_core.InstallManifest.load(self.install_dir).files
+        with self.assertRaises(hac_core.InstallError):
+            hac_patch.apply_patch(self.install_dir, patch)
+        self.assertEqual(hac_core.InstallManifest.load(self.install_dir).files, installed)
+        self.assertEqual(read_files(self.install_dir), self.old)
+
+    def test_corrupted_patch_reports_integrity_error(self):
+        stats, patch = self.build(self.old_dir, self.new_dir)
+        hac_core.install_game(self.install_dir, archive=self.old_archive)
+        with open(patch.path, 'r+b') as f:
+            f.seek(patch.size // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        with self.assertRaises(hac_core.ArchiveIntegrityError):
+            hac_patch.apply_patch(self.install_dir, hac_core.ArchiveSource(patch.path))
+        # Игра остается прежней версии, без временных файлов патча
+        self.assertEqual(read_files(self.install_dir), self.old)
+
+
+if __name__ == "__main__":
+    unittest.main()
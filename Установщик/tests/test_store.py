@@ -0,0 +1,77 @@
+"""Общее хранилище версий: установка второй версии и место на диске"""
+import os
+import unittest
+from unittest import mock
+
+import hac_core
+import hac_store
+from tests.support import LauncherTestCase, disk_usage, pack_game, write_files
+
+
+def hardlink_clone(source, target):
+    """Замена клона copy-on-write для тома без клонов: данные общие, как у настоящего клона"""
+    try:
+        os.link(source, target)
+    except OSError:
+        return False
+    return True
+
+
+def versions():
+    """Две версии: из двадцати крупных файлов во второй изменены два; в каждой есть дубликаты из пакета"""
+    shared = [os.urandom(200 * 1024) for i in range(20)]
+    dup = os.urandom(100 * 1024)
+    old = {"HAC.exe": b"MZ" + os.urandom(1024), "cfg.ini": b"fullscreen=1",
+           "dups/a.bin": dup, "dups/b.bin": dup}
+    old.update({f"data/{i}.bin": data for i, data in enumerate(shared)})
+    new = dict(old, **{"data/3.bin": os.urandom(200 * 1024), "data/4.bin": os.urandom(200 * 1024)})
+    return old, new
+
+
+class StoreTest(LauncherTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old, self.new = versions()
+        self.archives = [pack_game(write_files(self.path(name), files), self.path(name + ".pak"))
+                         for name, files in (("v1", self.old), ("v2", self.new))]
+        self.games = self.path("games")
+        self.dirs = [os.path.join(self.games, "v1"), os.path.join(self.games, "v2")]
+        os.environ["HAC_STORE"] = "1"
+
+    def install_both(self):
+        results = []
+        for install_dir, archive in zip(self.dirs, self.archives):
+            results.append(hac_core.install_game(install_dir, archive=archive))
+        self.assertInstalled(self.dirs[0], self.old)
+        self.assertInstalled(self.dirs[1], self.new)
+        return results
+
+    def test_no_store_without_clones(self):
+        if hac_store.ContentStore(os.path.join(self.games, hac_store.STORE_DIR_NAME)).can_clone():
+            self.skipTest("том умеет клонировать файлы")
+        first, second = self.install_both()
+        self.assertEqual(second.linked, 0)
+        # Обычные копии в хранилище только удвоили бы место - его нет вовсе
+        self.assertFalse(os.path.exists(os.path.join(self.games, hac_store.STORE_DIR_NAME)))
+        self.assertEqual(disk_usage(self.games), disk_usage(self.dirs[0]) + disk_usage(self.dirs[1]))
+
+    @mock.patch.object(hac_store, "clone_file", hardlink_clone)
+    def test_second_version_shares_unchanged_files(self):
+        first, second = self.install_both()
+        self.assertEqual(first.linked, 0)
+        # 18 неизмененных файлов и первый из двух одинаковых; второй распаковывает сам установщик
+        self.assertEqual(second.linked, 19)
+        self.assertEqual(os.stat(os.path.join(self.dirs[1], "dups", "b.bin")).st_nlink, 1)
+
+        version = disk_usage(self.dirs[0])
+        changed = 2 * 200 * 1024
+        self.assertLess(disk_usage(self.games), version + changed + 512 * 1024)
+
+        for install_dir in self.dirs:
+            hac_core.uninstall_game(install_dir)
+        self.assertEqual(os.listdir(self.games), [])
+
+
+if __name__ == "__main__":
+    unittest.main()